@@ -0,0 +1,321 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+from pynamodb.transactions import TransactWrite
+
+from .aio import run_sync
+from .evaluations import one_per_rubric
+from .metrics import phase
+from .models import EvaluationModel, get_transaction_connection
+from ml_evaluator.backends import get_backend
+from ml_evaluator.evaluator import (
+    get_ai_evaluation, aget_ai_evaluation, stream_ai_evaluation, astream_ai_evaluation, criterion_key, PROMPT_VERSION
+)
+from ml_evaluator.streaming import CriterionStream
+
+logger = logging.getLogger(__name__)
+
+# (submission_id, input_hash) -> Future for AI evaluations currently running in this process.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def score_value(value):
+    """Returns the numeric score from an AI result entry, which may be a number or {'value': number}."""
+    if isinstance(value, dict):
+        value = value.get('value')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def feedback_value(value):
+    if isinstance(value, dict):
+        value = value.get('value')
+    return value if isinstance(value, str) else None
+
+
+def total_ml_score(ml_results):
+    return sum(score_value(value) or 0 for key, value in ml_results.items() if key.endswith('_score'))
+
+
+def evaluation_input_hash(text_content, rubrics, model_name=None):
+    """
+    Identifies one AI evaluation: the report text, the rubric set and the model/prompt used.
+    Stored results are only reused while this hash is unchanged.
+    """
+    payload = json.dumps({
+        'text': text_content,
+        'rubrics': sorted(
+            [r.rubric_id, r.criterion, float(r.max_points), r.description or ''] for r in rubrics
+        ),
+        'model': model_name or get_backend().model_name,
+        'prompt_version': PROMPT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_stored_results(evaluations, rubrics, input_hash):
+    """
+    Rebuilds an AI result from the per-rubric ML fields of `evaluations`.
+    Returns None unless every rubric has a stored result for `input_hash`.
+    """
+    by_rubric = {e.rubric_id: e for e in one_per_rubric(evaluations)}
+    results = {}
+    for rubric in rubrics:
+        evaluation = by_rubric.get(rubric.rubric_id)
+        if evaluation is None or evaluation.ml_input_hash != input_hash or evaluation.ml_points_awarded is None:
+            return None
+        key = criterion_key(rubric)
+        results[f"{key}_score"] = {'value': evaluation.ml_points_awarded}
+        results[f"{key}_feedback"] = {'value': evaluation.ml_feedback or ''}
+    return results
+
+
+def store_results(submission_id, rubrics, input_hash, ml_results):
+    """
+    Writes the per-rubric AI scores and feedback onto the submission's evaluation
+    items in one transaction. Items are upserted by key, so the manual fields of
+    existing items are left untouched and missing items are created without them.
+    """
+    now = datetime.utcnow()
+    with TransactWrite(connection=get_transaction_connection()) as transaction:
+        for rubric in rubrics:
+            key = criterion_key(rubric)
+            transaction.update(
+                EvaluationModel(EvaluationModel.key_for(submission_id, rubric.rubric_id)),
+                actions=[
+                    EvaluationModel.submission_id.set(submission_id),
+                    EvaluationModel.rubric_id.set(rubric.rubric_id),
+                    EvaluationModel.ml_points_awarded.set(score_value(ml_results.get(f"{key}_score"))),
+                    EvaluationModel.ml_feedback.set(feedback_value(ml_results.get(f"{key}_feedback"))),
+                    EvaluationModel.ml_input_hash.set(input_hash),
+                    EvaluationModel.ml_evaluated_at.set(now),
+                ]
+            )
+
+
+def normalize_results(ml_results, rubrics):
+    """Returns AI results in the {'<criterion>_score': {'value': ...}} shape the evaluate page reads."""
+    normalized = {}
+    for rubric in rubrics:
+        key = criterion_key(rubric)
+        normalized[f"{key}_score"] = {'value': score_value(ml_results.get(f"{key}_score"))}
+        normalized[f"{key}_feedback"] = {'value': feedback_value(ml_results.get(f"{key}_feedback")) or ''}
+    if 'token_usage' in ml_results:
+        normalized['token_usage'] = ml_results['token_usage']
+    return normalized
+
+
+INTERRUPTED = "The AI evaluation was interrupted before it finished."
+
+
+def stored_evaluation(submission, rubrics, evaluations):
+    """
+    Returns (input_hash, results stored for it or None) for `submission`, given
+    its evaluation items.
+    """
+    input_hash = evaluation_input_hash(submission.report_content_summary, rubrics)
+    return input_hash, load_stored_results(evaluations, rubrics, input_hash)
+
+
+def submission_evaluations(submission_id):
+    return list(EvaluationModel.submission_index.query(submission_id))
+
+
+@contextmanager
+def single_flight(submission_id, input_hash):
+    """
+    Shares one AI evaluation per submission and inputs among the callers in this
+    process. Yields (leader, future): the leader runs the evaluation and sets the
+    future's result; the others wait on the future.
+
+    If the leader's block raises, the followers get the exception. If it ends
+    without a result (cancelled, or a streaming client went away), they get
+    {"error": INTERRUPTED}.
+    """
+    flight_key = (submission_id, input_hash)
+    with _in_flight_lock:
+        future = _in_flight.get(flight_key)
+        leader = future is None
+        if leader:
+            future = _in_flight[flight_key] = Future()
+    if not leader:
+        logger.info(f"Joining in-flight AI evaluation for submission {submission_id}")
+        yield False, future
+        return
+
+    try:
+        yield True, future
+    except Exception as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        if not future.done():
+            future.set_result({"error": INTERRUPTED})
+        with _in_flight_lock:
+            _in_flight.pop(flight_key, None)
+
+
+def get_or_create_ai_evaluation(submission, rubrics, evaluations=None, evaluate=get_ai_evaluation):
+    """
+    Returns the AI evaluation of `submission` against `rubrics`, calling the model
+    only if no stored result exists for the current report text, rubric set and model.
+
+    Concurrent calls for the same submission and inputs share a single model call.
+    Errors are returned as {"error": ...} like get_ai_evaluation and are not stored.
+    """
+    if evaluations is None:
+        evaluations = submission_evaluations(submission.submission_id)
+    input_hash, stored = stored_evaluation(submission, rubrics, evaluations)
+    if stored is not None:
+        return stored
+
+    with single_flight(submission.submission_id, input_hash) as (leader, future):
+        if not leader:
+            return future.result()
+        with phase('ml'):
+            ml_results = evaluate(submission.report_content_summary, rubrics)
+        if "error" not in ml_results:
+            ml_results = normalize_results(ml_results, rubrics)
+            store_results(submission.submission_id, rubrics, input_hash, ml_results)
+        future.set_result(ml_results)
+        return ml_results
+
+
+async def aget_or_create_ai_evaluation(submission, rubrics, evaluations=None, evaluate=aget_ai_evaluation):
+    """
+    Async get_or_create_ai_evaluation, sharing its in-flight calls. Pass the
+    submission's `evaluations` when they were already read (e.g. concurrently
+    with the rubrics); otherwise they are queried here. `evaluate` gets the
+    bounded pool's run_sync for its blocking work.
+    """
+    if evaluations is None:
+        evaluations = await run_sync(submission_evaluations, submission.submission_id)
+    input_hash, stored = stored_evaluation(submission, rubrics, evaluations)
+    if stored is not None:
+        return stored
+
+    with single_flight(submission.submission_id, input_hash) as (leader, future):
+        if not leader:
+            return await asyncio.wrap_future(future)
+        with phase('ml'):
+            ml_results = await evaluate(submission.report_content_summary, rubrics, run_sync=run_sync)
+        if "error" not in ml_results:
+            ml_results = normalize_results(ml_results, rubrics)
+            await run_sync(store_results, submission.submission_id, rubrics, input_hash, ml_results)
+        future.set_result(ml_results)
+        return ml_results
+
+
+def start_event(rubrics):
+    """First event of a streamed evaluation: the criteria that will follow."""
+    return 'start', {'criteria': [
+        {'key': criterion_key(r), 'criterion': r.criterion, 'rubric_id': r.rubric_id, 'max_points': r.max_points}
+        for r in rubrics
+    ]}
+
+
+def replay_events(ml_results, rubrics):
+    """Events for results that are already complete (stored, or computed by another request)."""
+    if "error" in ml_results:
+        return [('error', {'detail': ml_results['error']})]
+    events = []
+    for rubric in rubrics:
+        key = criterion_key(rubric)
+        events.append(('criterion', CriterionStream.criterion(
+            key, rubric, score_value(ml_results.get(f"{key}_score")), feedback_value(ml_results.get(f"{key}_feedback"))
+        )))
+    events.append(('result', ml_results))
+    return events
+
+
+def stream_or_create_ai_evaluation(submission, rubrics, evaluations=None, stream=stream_ai_evaluation):
+    """
+    Streaming get_or_create_ai_evaluation, for server-sent events. Yields
+    ('start', criteria), then ('criterion', dict) for each criterion as soon as
+    the model has produced it, and finally ('result', results) with what
+    get_or_create_ai_evaluation returns, or ('error', {'detail': ...}).
+
+    Stored results, and those of an evaluation already running for the same
+    inputs, are replayed as the same events.
+    """
+    yield start_event(rubrics)
+    if evaluations is None:
+        evaluations = submission_evaluations(submission.submission_id)
+    input_hash, stored = stored_evaluation(submission, rubrics, evaluations)
+    if stored is not None:
+        yield from replay_events(stored, rubrics)
+        return
+
+    ml_results = {"error": INTERRUPTED}
+    with single_flight(submission.submission_id, input_hash) as (leader, future):
+        if not leader:
+            try:
+                ml_results = future.result()
+            except Exception as e:
+                ml_results = {"error": f"AI evaluation failed: {e}"}
+            yield from replay_events(ml_results, rubrics)
+            return
+        try:
+            for event, data in stream(submission.report_content_summary, rubrics):
+                if event == 'criterion':
+                    yield event, data
+                elif event == 'result':
+                    ml_results = normalize_results(data, rubrics)
+                    store_results(submission.submission_id, rubrics, input_hash, ml_results)
+                else:
+                    ml_results = {"error": data}
+            future.set_result(ml_results)
+        except Exception as e:
+            # Headers are already sent, so the failure is reported as an event.
+            logger.error(f"Streamed AI evaluation of submission {submission.submission_id} failed: {e}")
+            future.set_exception(e)
+            ml_results = {"error": f"AI evaluation failed: {e}"}
+    yield replay_events(ml_results, rubrics)[-1]
+
+
+async def astream_or_create_ai_evaluation(submission, rubrics, evaluations=None, stream=astream_ai_evaluation):
+    """Async stream_or_create_ai_evaluation; `stream` gets the bounded pool's run_sync as `evaluate` does above."""
+    yield start_event(rubrics)
+    if evaluations is None:
+        evaluations = await run_sync(submission_evaluations, submission.submission_id)
+    input_hash, stored = stored_evaluation(submission, rubrics, evaluations)
+    if stored is not None:
+        for event in replay_events(stored, rubrics):
+            yield event
+        return
+
+    ml_results = {"error": INTERRUPTED}
+    with single_flight(submission.submission_id, input_hash) as (leader, future):
+        if not leader:
+            try:
+                ml_results = await asyncio.wrap_future(future)
+            except Exception as e:
+                ml_results = {"error": f"AI evaluation failed: {e}"}
+            for event in replay_events(ml_results, rubrics):
+                yield event
+            return
+        try:
+            async for event, data in stream(submission.report_content_summary, rubrics, run_sync=run_sync):
+                if event == 'criterion':
+                    yield event, data
+                elif event == 'result':
+                    ml_results = normalize_results(data, rubrics)
+                    await run_sync(store_results, submission.submission_id, rubrics, input_hash, ml_results)
+                else:
+                    ml_results = {"error": data}
+            future.set_result(ml_results)
+        except Exception as e:
+            # Headers are already sent, so the failure is reported as an event.
+            logger.error(f"Streamed AI evaluation of submission {submission.submission_id} failed: {e}")
+            future.set_exception(e)
+            ml_results = {"error": f"AI evaluation failed: {e}"}
+    yield replay_events(ml_results, rubrics)[-1]
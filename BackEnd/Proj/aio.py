@@ -0,0 +1,69 @@
+"""
+Support for the async views in Proj/async_views.py.
+
+Blocking work (PynamoDB calls, file storage, token verification) is run with
+`run_sync` on one bounded thread pool per process, so a burst of slow requests
+queues for ASYNC_VIEW_THREADS threads instead of starting a thread each. The
+event loop itself only waits, which is what lets one ASGI process hold many
+model calls open at once.
+"""
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.views import APIView
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix='async-view')
+    return _executor
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Awaits `func(*args, **kwargs)` run on the bounded pool. Context variables
+    (request phase timings, DynamoDB attribution) are carried into the thread.
+    """
+    return await sync_to_async(func, thread_sensitive=False, executor=get_executor())(*args, **kwargs)
+
+
+async def gather_sync(*calls):
+    """Runs independent blocking calls, given as zero-argument callables, concurrently on the pool."""
+    return await asyncio.gather(*(run_sync(call) for call in calls))
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines. Django serves it without a thread
+    under ASGI; authentication and permission checks, which may fetch JWKS or
+    write the user mirror, run on the pool. Under WSGI the view still works
+    but each request gets its own event loop, so there is nothing to gain.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_sync(self.initial, request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
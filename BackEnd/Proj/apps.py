@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProjConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Proj'
+
+    def ready(self):
+        from .dynamodb_metrics import install
+        install()
@@ -0,0 +1,189 @@
+"""
+Async versions of the endpoints that spend most of their time waiting on the
+model or DynamoDB: submission create, AI evaluation, finalize and the
+leaderboard. They answer exactly like their counterparts in Proj/views.py and
+are routed instead of them when settings.ASYNC_VIEWS is on (serve
+ProjectFlow.asgi with an ASGI server such as uvicorn).
+
+Blocking calls go through the bounded pool of Proj/aio.py; reads that do not
+depend on each other are made concurrently.
+"""
+import logging
+from datetime import date
+
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.response import Response
+
+from .aio import AsyncAPIView, gather_sync, run_sync
+from .ai_evaluation import aget_or_create_ai_evaluation, astream_or_create_ai_evaluation, total_ml_score
+from .catalog_cache import get_catalog_cache
+from .evaluations import one_per_rubric
+from .leaderboard import query_leaderboard, record_score, to_representation
+from .loaders import get_loaders
+from .models import EvaluationModel, SubmissionModel
+from .notifications import submission_evaluated, submission_received
+from .pagination import page_params, paginated_response
+from .serializers import SubmissionSerializer
+from .sse import STREAMING_RENDERER_CLASSES, event_stream_response, wants_event_stream
+from .tasks import process_submission
+from .versioning import check_can_submit, load_counter
+from .views import get_submission_and_check_permission
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubmissionListCreateView(AsyncAPIView):
+    """Create a new submission. (Students only)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request):
+        if request.user.is_staff:
+            raise PermissionDenied("Only students can create submissions.")
+
+        def validate():
+            # Reading request.data parses the multipart body, which may spool files to disk.
+            serializer = SubmissionSerializer(data=request.data, context={'request': request})
+            serializer.is_valid()
+            return serializer
+
+        serializer = await run_sync(validate)
+        if serializer.errors:
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        project_id = serializer.validated_data['project_id']
+        project, counter = await gather_sync(
+            lambda: get_catalog_cache().get_project(project_id),
+            lambda: load_counter(project_id, request.user.username),
+        )
+        if project is None:
+            raise NotFound(detail="Project not found.")
+        if project.end_date < date.today():
+            raise ValidationError("The submission deadline for this project has passed.")
+        check_can_submit(counter)
+
+        submission = await run_sync(
+            serializer.save,
+            student_username=request.user.username,
+            student_email=request.user.email or None,
+            status='Processing',
+            _counter=counter
+        )
+        await gather_sync(
+            lambda: process_submission.delay(submission_id=submission.submission_id),
+            lambda: submission_received(request.user.email, project.title, submission.version),
+        )
+        return Response(SubmissionSerializer(submission).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AsyncTriggerAIEvaluationView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = STREAMING_RENDERER_CLASSES
+
+    async def post(self, request, submission_id):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only faculty can trigger AI evaluation.")
+        submission, evaluations = await gather_sync(
+            lambda: get_loaders(request)[SubmissionModel].load_or_404(submission_id, "Submission not found."),
+            lambda: list(EvaluationModel.submission_index.query(submission_id)),
+        )
+        if not submission.report_content_summary:
+            return Response(
+                {"detail": "Submission has no text content to analyze. PDF extraction might have failed."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rubrics = await run_sync(get_catalog_cache().get_rubrics, submission.project_id)
+        if not rubrics:
+            return Response(
+                {"detail": "This project has no rubrics defined. AI evaluation cannot proceed."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if wants_event_stream(request):
+            return event_stream_response(astream_or_create_ai_evaluation(submission, rubrics, evaluations=evaluations))
+        ml_results = await aget_or_create_ai_evaluation(submission, rubrics, evaluations=evaluations)
+        if "error" in ml_results:
+            return Response({"detail": ml_results["error"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(ml_results, status=status.HTTP_200_OK)
+
+
+class AsyncFinalizeEvaluationView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request, submission_id):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only faculty can finalize evaluations.")
+        submission, all_evaluations = await gather_sync(
+            lambda: get_submission_and_check_permission(submission_id, request),
+            lambda: list(EvaluationModel.submission_index.query(submission_id)),
+        )
+        evaluations = [e for e in one_per_rubric(all_evaluations) if e.points_awarded is not None]
+        if not evaluations:
+            raise ValidationError("Cannot finalize. No manual evaluations found.")
+        total_manual_score = sum(e.points_awarded for e in evaluations)
+
+        catalog = get_catalog_cache()
+        rubrics, project = await gather_sync(
+            lambda: catalog.get_rubrics(submission.project_id),
+            lambda: catalog.get_project(submission.project_id),
+        )
+        if not rubrics:
+            return Response(
+                {"detail": "This project has no rubrics defined. AI evaluation cannot proceed."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not submission.report_content_summary:
+            return Response(
+                {"detail": "Cannot finalize. Submission has no text content for AI evaluation."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ml_results = await aget_or_create_ai_evaluation(submission, rubrics, evaluations=all_evaluations)
+        if "error" in ml_results:
+            return Response({"detail": ml_results["error"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        ml_score = total_ml_score(ml_results)
+        weight = settings.ML_SCORE_WEIGHT
+        final_score = (total_manual_score * (1 - weight)) + (ml_score * weight)
+
+        await run_sync(submission.update, actions=[
+            SubmissionModel.manual_score.set(total_manual_score),
+            SubmissionModel.ml_score.set(ml_score),
+            SubmissionModel.overall_score.set(round(final_score, 2)),
+            SubmissionModel.status.set('Evaluated')
+        ])
+        project_title = project.title if project else None
+        await gather_sync(
+            lambda: record_score(submission, project_title=project_title),
+            lambda: submission_evaluated(submission, project_title or submission.title),
+        )
+
+        return Response({
+            "status": "Evaluation finalized",
+            "manual_score": total_manual_score,
+            "ml_score": ml_score,
+            "final_score": final_score
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncLeaderboardView(AsyncAPIView):
+    """
+    Ranked latest evaluated submissions, highest score first.
+    Query params: project_id (per-project board), limit (top K), cursor (next page, see X-Next-Cursor).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    async def get(self, request):
+        limit, last_evaluated_key = page_params(request, settings.LEADERBOARD_PAGE_SIZE)
+        try:
+            entries, next_key = await run_sync(
+                query_leaderboard,
+                project_id=request.query_params.get('project_id'),
+                limit=limit,
+                last_evaluated_key=last_evaluated_key
+            )
+        except ValidationError:
+            raise
+        except Exception:
+            logger.exception("Error generating leaderboard")
+            return Response({"detail": "Error generating leaderboard."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return paginated_response([to_representation(e) for e in entries], next_key)
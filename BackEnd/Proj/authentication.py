@@ -1,59 +1,22 @@
 # BackEnd/Proj/authentication.py
 
+import hashlib
+import json
+import logging
+import threading
 import jwt
-import requests
 import time
+from collections import OrderedDict
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
 from rest_framework import authentication, exceptions
 
-# A simple in-memory cache for the JSON Web Key Set (JWKS)
-# In a distributed system, consider using a shared cache like Redis.
-jwks_cache = {
-    'keys': [],
-    'last_fetched': 0,
-    'cache_ttl': 3600  # Cache for 1 hour
-}
-
-def get_jwks():
-    """
-    Fetches the JSON Web Key Set (JWKS) from the Cognito User Pool.
-    Caches the keys to avoid fetching them on every request.
-    """
-    global jwks_cache
-    now = time.time()
-
-    # Check if cache is still valid
-    if jwks_cache['keys'] and (now - jwks_cache['last_fetched']) < jwks_cache['cache_ttl']:
-        return jwks_cache['keys']
-
-    # Construct the JWKS URL from settings
-    if not hasattr(settings, 'COGNITO_USER_POOL_ID') or not hasattr(settings, 'COGNITO_REGION'):
-        raise exceptions.AuthenticationFailed(
-            'COGNITO_USER_POOL_ID and COGNITO_REGION must be set in Django settings.'
-        )
-
-    url = f"https://cognito-idp.{settings.COGNITO_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}/.well-known/jwks.json"
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        jwks = response.json()['keys']
-        
-        # Update cache
-        jwks_cache['keys'] = jwks
-        jwks_cache['last_fetched'] = now
-        
-        return jwks
-    except requests.exceptions.RequestException as e:
-        # Could not fetch JWKS. Log this error and fail authentication.
-        print(f"Error fetching JWKS: {e}")
-        raise exceptions.AuthenticationFailed('Could not fetch public keys for token validation.')
-    except (KeyError, TypeError):
-        # The JWKS format is unexpected.
-        print("Error: JWKS format is invalid.")
-        raise exceptions.AuthenticationFailed('Invalid public key format.')
+from .jwks import get_jwks_provider, JWKSUnavailable
+from .metrics import phase
 
+logger = logging.getLogger(__name__)
 
 def get_public_key(token):
     """
@@ -68,13 +31,213 @@ def get_public_key(token):
     if not kid:
         raise exceptions.AuthenticationFailed('Token is missing "kid" in the header.')
 
-    jwks = get_jwks()
-    for key in jwks:
-        if key.get('kid') == kid:
-            # Construct and return the public key
-            return jwt.algorithms.RSAAlgorithm.from_jwk(key)
-    
-    raise exceptions.AuthenticationFailed('Public key for token "kid" not found.')
+    try:
+        key = get_jwks_provider().get_key(kid)
+    except JWKSUnavailable:
+        raise exceptions.AuthenticationFailed('Could not fetch public keys for token validation.')
+    if key is None:
+        raise exceptions.AuthenticationFailed('Public key for token "kid" not found.')
+    return _public_key_for(kid, key)
+
+
+# kid -> (serialized JWK, public key object). Parsing the RSA key is kept out of the
+# request path; the entry is rebuilt if the JWKS ever serves different key material for a kid.
+_public_keys = {}
+_public_keys_lock = threading.Lock()
+
+def _public_key_for(kid, jwk):
+    material = json.dumps(jwk, sort_keys=True)
+    cached = _public_keys.get(kid)
+    if cached is not None and cached[0] == material:
+        return cached[1]
+    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
+    with _public_keys_lock:
+        _public_keys[kid] = (material, public_key)
+    return public_key
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of sha256(token) -> decoded claims for tokens that passed full
+    verification. Entries are served until the token's `exp`, so repeated requests
+    with the same ID token skip the RS256 signature check.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.verifications = 0
+        self.verify_seconds_total = 0.0
+        self.verify_seconds_max = 0.0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, digest):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def set(self, digest, claims):
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)) or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (claims, exp)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_verification(self, seconds):
+        with self._lock:
+            self.verifications += 1
+            self.verify_seconds_total += seconds
+            self.verify_seconds_max = max(self.verify_seconds_max, seconds)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'verifications': self.verifications,
+                'verify_ms_avg': round(self.verify_seconds_total / self.verifications * 1000, 3) if self.verifications else None,
+                'verify_ms_max': round(self.verify_seconds_max * 1000, 3),
+                'public_keys_cached': len(_public_keys),
+            }
+
+
+verified_tokens = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def verify_token(token):
+    """
+    Returns the verified claims of a Cognito ID token, from the verified-token
+    cache when possible. Raises jwt.PyJWTError or AuthenticationFailed.
+    """
+    digest = VerifiedTokenCache.digest(token)
+    claims = verified_tokens.get(digest)
+    if claims is not None:
+        return claims
+
+    started = time.perf_counter()
+    public_key = get_public_key(token)
+
+    # --- DECODE AND VALIDATE THE TOKEN ---
+    # This is the crucial step where the token's signature, expiration,
+    # issuer, and audience are all verified.
+    claims = jwt.decode(
+        token,
+        public_key,
+        algorithms=['RS256'],
+        audience=settings.COGNITO_APP_CLIENT_ID, # Your app client ID
+        issuer=f"https://cognito-idp.{settings.COGNITO_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}"
+    )
+
+    # --- TOKEN CLAIMS VALIDATION ---
+    # Ensure the token is an ID token
+    if claims.get('token_use') != 'id':
+        raise exceptions.AuthenticationFailed('Token is not an ID token.')
+    verified_tokens.record_verification(time.perf_counter() - started)
+    verified_tokens.set(digest, claims)
+    return claims
+
+
+class CognitoPrincipal:
+    """
+    The authenticated user, built from verified token claims on every request
+    without touching the database. Exposes the parts of the Django user API the
+    views and DRF permissions use.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, username, email=None, role='student'):
+        self.username = username
+        self.email = email
+        self.role = role
+        # Map Cognito role to Django's is_staff and is_superuser
+        self.is_staff = role in ('faculty', 'administrator')
+        self.is_superuser = role == 'administrator'
+
+    @classmethod
+    def from_claims(cls, claims):
+        # Default to 'student' if the custom:role attribute is missing (e.g., for existing users)
+        return cls(
+            username=claims['cognito:username'],
+            email=claims.get('email'),
+            role=claims.get('custom:role', 'student'),
+        )
+
+    @property
+    def pk(self):
+        return self.username
+
+    def get_username(self):
+        return self.username
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser
+
+    def __str__(self):
+        return self.username
+
+
+def sync_user(principal):
+    """
+    Mirrors the principal into django.contrib.auth's User table (used by the admin
+    site). Runs only the first time a (username, role) pair is seen within
+    AUTH_USER_SYNC_TTL seconds, so the request path does not hit the database.
+    """
+    if not settings.AUTH_USER_SYNC_ENABLED:
+        return
+    cache_key = f"auth:user-synced:{principal.username}:{principal.role}"
+    if cache.get(cache_key):
+        return
+    User = get_user_model()
+    try:
+        user, created = User.objects.get_or_create(
+            username=principal.username,
+            defaults={
+                'email': principal.email or '',
+                'is_staff': principal.is_staff,
+                'is_superuser': principal.is_superuser,
+            }
+        )
+        # If the user already exists, ensure their staff/superuser status is up-to-date
+        if not created and (user.is_staff != principal.is_staff or user.is_superuser != principal.is_superuser):
+            user.is_staff = principal.is_staff
+            user.is_superuser = principal.is_superuser
+            user.save(update_fields=['is_staff', 'is_superuser'])
+    except DatabaseError as e:
+        # The mirror is not needed to serve the request; retry after a short back-off.
+        logger.warning(f"Could not sync user {principal.username}: {e}")
+        cache.set(cache_key, True, min(60, settings.AUTH_USER_SYNC_TTL))
+        return
+    cache.set(cache_key, True, settings.AUTH_USER_SYNC_TTL)
 
 
 class CognitoAuthentication(authentication.BaseAuthentication):
@@ -90,55 +253,17 @@ class CognitoAuthentication(authentication.BaseAuthentication):
         token = auth_header.split(' ')[1]
         
         try:
-            public_key = get_public_key(token)
-
-            # --- DECODE AND VALIDATE THE TOKEN ---
-            # This is the crucial step where the token's signature, expiration,
-            # issuer, and audience are all verified.
-            decoded_token = jwt.decode(
-                token,
-                public_key,
-                algorithms=['RS256'],
-                audience=settings.COGNITO_APP_CLIENT_ID, # Your app client ID
-                issuer=f"https://cognito-idp.{settings.COGNITO_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}"
-            )
-
-            # --- TOKEN CLAIMS VALIDATION ---
-            # Ensure the token is an ID token
-            if decoded_token.get('token_use') != 'id':
-                raise exceptions.AuthenticationFailed('Token is not an ID token.')
-            
-            # --- GET OR CREATE USER ---
+            with phase('auth'):
+                decoded_token = verify_token(token)
+
+            # --- BUILD THE PRINCIPAL ---
             # Identify the user by their unique Cognito username or sub
             cognito_username = decoded_token.get('cognito:username')
             if not cognito_username:
                 raise exceptions.AuthenticationFailed('Token does not contain a username.')
-            
-            User = get_user_model()
-
-            # Get the custom:role attribute from the Cognito token
-            # Default to 'student' if the attribute is missing (e.g., for existing users)
-            cognito_role = decoded_token.get('custom:role', 'student')
-
-            # Map Cognito role to Django's is_staff and is_superuser
-            is_staff_bool = (cognito_role == 'faculty' or cognito_role == 'administrator')
-            is_superuser_bool = (cognito_role == 'administrator')
-
-            user, created = User.objects.get_or_create(
-                username=cognito_username,
-                defaults={
-                    'email': decoded_token.get('email'),
-                    'is_staff': is_staff_bool,
-                    'is_superuser': is_superuser_bool,
-                }
-            )
-            
-            # If the user already exists, ensure their staff/superuser status is up-to-date
-            if not created and (user.is_staff != is_staff_bool or user.is_superuser != is_superuser_bool):
-                user.is_staff = is_staff_bool
-                user.is_superuser = is_superuser_bool
-                user.save(update_fields=['is_staff', 'is_superuser'])
 
+            user = CognitoPrincipal.from_claims(decoded_token)
+            sync_user(user)
 
             return (user, decoded_token)
 
@@ -0,0 +1,168 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+from .ai_evaluation import get_or_create_ai_evaluation
+from .catalog_cache import get_catalog_cache
+from .jobs import task, report_progress
+from .models import SubmissionModel
+from ml_evaluator.evaluator import get_ai_evaluation
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` acquisitions per second on average,
+    with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _positive(data, name, cast, maximum):
+    value = data.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Must be a positive number."})
+    if not math.isfinite(value) or value <= 0:
+        raise ValidationError({name: "Must be a positive number."})
+    return min(value, maximum)
+
+
+def batch_options(data):
+    """
+    Reads the optional `concurrency` and `rate` of a batch request, capped at
+    BATCH_AI_EVALUATION_MAX_CONCURRENCY / BATCH_AI_EVALUATION_MAX_RATE.
+    Returns (concurrency, rate); None means the default. Raises ValidationError.
+    """
+    return (
+        _positive(data, 'concurrency', int, settings.BATCH_AI_EVALUATION_MAX_CONCURRENCY),
+        _positive(data, 'rate', float, settings.BATCH_AI_EVALUATION_MAX_RATE),
+    )
+
+
+def latest_submissions(project_id):
+    """The latest submission of every student in the project, via project_student_index."""
+    return list(SubmissionModel.project_student_index.query(
+        project_id,
+        filter_condition=SubmissionModel.is_latest == True
+    ))
+
+
+def run_batch_evaluation(project_id, concurrency=None, rate=None, evaluate=None, on_progress=None):
+    """
+    Runs the AI evaluation for the latest submission of every student in a project.
+
+    Submissions that already have stored results for their current inputs are
+    skipped without a model call, so re-running a batch after a crash or an
+    interruption only evaluates what is missing.
+
+    Args:
+        project_id (str): The project to evaluate.
+        concurrency (int, optional): Number of submissions evaluated at the same time.
+        rate (float, optional): Maximum model calls per second.
+        evaluate (callable, optional): Replacement for get_ai_evaluation, e.g. a local fake model.
+        on_progress (callable, optional): Called with the progress dict after each submission.
+
+    Returns:
+        dict: Counts of evaluated, skipped and failed submissions.
+    """
+    concurrency = concurrency or settings.BATCH_AI_EVALUATION_CONCURRENCY
+    rate = rate or settings.BATCH_AI_EVALUATION_RATE
+    evaluate = evaluate or get_ai_evaluation
+    bucket = TokenBucket(rate, capacity=concurrency)
+    # Set in the calling thread when get_or_create_ai_evaluation actually calls the model.
+    called = threading.local()
+
+    def rate_limited_evaluate(text_content, rubrics):
+        bucket.acquire()
+        called.model = True
+        return evaluate(text_content, rubrics)
+
+    rubrics = get_catalog_cache().get_rubrics(project_id)
+    submissions = latest_submissions(project_id)
+    progress = {
+        'project_id': project_id,
+        'total': len(submissions),
+        'processed': 0,
+        'evaluated': 0,
+        'skipped': 0,
+        'failed': 0,
+        'no_content': 0,
+        'errors': {},
+    }
+    if not rubrics:
+        progress['errors']['project'] = "This project has no rubrics defined."
+        if on_progress:
+            on_progress(dict(progress))
+        return progress
+
+    def evaluate_one(submission):
+        if not submission.report_content_summary:
+            return 'no_content', None
+        called.model = False
+        ml_results = get_or_create_ai_evaluation(submission, rubrics, evaluate=rate_limited_evaluate)
+        if "error" in ml_results:
+            return 'failed', ml_results['error']
+        # No model call means the stored result was still valid.
+        return ('evaluated' if called.model else 'skipped'), None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(evaluate_one, s): s for s in submissions}
+        for future in as_completed(futures):
+            submission = futures[future]
+            try:
+                outcome, error = future.result()
+            except Exception as e:
+                outcome, error = 'failed', str(e)
+            progress['processed'] += 1
+            progress[outcome] += 1
+            if error:
+                progress['errors'][submission.submission_id] = error
+            if on_progress:
+                on_progress(dict(progress))
+    if on_progress and not submissions:
+        on_progress(dict(progress))
+    logger.info(f"Batch AI evaluation of project {project_id} finished: {progress}")
+    return progress
+
+
+@task(name='batch_ai_evaluation', max_attempts=3)
+def batch_ai_evaluation(project_id, concurrency=None, rate=None, evaluator=None):
+    """Background job wrapper around run_batch_evaluation; progress is stored on the job."""
+    run_batch_evaluation(
+        project_id,
+        concurrency=concurrency,
+        rate=rate,
+        evaluate=import_string(evaluator) if evaluator else None,
+        on_progress=report_progress
+    )
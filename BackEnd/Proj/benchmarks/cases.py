@@ -0,0 +1,326 @@
+"""
+The benchmarks run by `python manage.py benchmark`. Everything runs in-process
+against the local stand-ins from Proj/benchmarks/fixtures.py.
+"""
+import os
+from datetime import datetime
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, RequestFactory
+
+from ml_evaluator.backends import get_backend
+from ml_evaluator.evaluator import build_prompt
+from ..authentication import CognitoAuthentication, verified_tokens
+from ..models import EvaluationModel, RubricModel, SubmissionModel
+from ..pdf_extractor import extract_text_from_local_pdf
+from ..serializers import EvaluationSerializer, SubmissionSerializer
+from .fixtures import make_pdf, make_text
+from .suite import BenchmarkError, benchmark
+
+# --- PDF extraction ----------------------------------------------------------
+
+PDF_SIZES = {'small': 3, 'medium': 30, 'large': 120}
+
+
+def _write_pdf(pages):
+    relative_path = os.path.join('benchmarks', f"report-{pages}p.pdf")
+    absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    if not os.path.exists(absolute_path):
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        with open(absolute_path, 'wb') as pdf_file:
+            pdf_file.write(make_pdf(pages, seed=pages))
+    return relative_path
+
+
+def _extraction(pages, cached):
+    def setup(context):
+        path = _write_pdf(pages)
+
+        def operation():
+            # A fresh content hash misses the extraction cache, so the PDF is parsed.
+            text = extract_text_from_local_pdf(path, content_sha256=None if cached else uuid4().hex)
+            if not text:
+                raise BenchmarkError(f"No text extracted from {path}.")
+        return operation
+    return setup
+
+
+for _size, _pages in PDF_SIZES.items():
+    benchmark(f"pdf.extract.{_size}", repeat=10 if _pages < 100 else 3)(_extraction(_pages, cached=False))
+benchmark('pdf.extract.medium.cached')(_extraction(PDF_SIZES['medium'], cached=True))
+
+# --- Authentication ----------------------------------------------------------
+
+
+def _authenticate(cached):
+    def setup(context):
+        issuer = context.environment.issuer
+        request = RequestFactory().get('/api/projects/', HTTP_AUTHORIZATION=f"Bearer {issuer.token('student0001')}")
+        authenticator = CognitoAuthentication()
+
+        def operation():
+            if not cached:
+                verified_tokens.clear()
+            if authenticator.authenticate(request) is None:
+                raise BenchmarkError("Token was not authenticated.")
+        return operation
+    return setup
+
+
+benchmark('auth.authenticate.verify')(_authenticate(cached=False))
+benchmark('auth.authenticate.cached')(_authenticate(cached=True))
+
+# --- Serialization -----------------------------------------------------------
+
+
+def _submissions(n):
+    now = datetime.utcnow()
+    summary = make_text(200)
+    return [
+        SubmissionModel(
+            submission_id=str(uuid4()),
+            project_id='project-1',
+            student_username=f"student{i:05d}",
+            title=f"Submission {i}",
+            report_file_path=f"reports/{i}.pdf",
+            report_content_summary=summary,
+            github_link='https://github.com/example/project',
+            submitted_at=now,
+            status='Evaluated',
+            version=1 + i % 3,
+            manual_score=40,
+            ml_score=35.5,
+            overall_score=38.5,
+        )
+        for i in range(n)
+    ]
+
+
+def _evaluations(n):
+    now = datetime.utcnow()
+    rubrics = [
+        RubricModel(rubric_id=f"rubric-{r}", project_id='project-1', criterion=f"Criterion {r}", max_points=10,
+                    description=make_text(20, seed=r))
+        for r in range(5)
+    ]
+    evaluations = []
+    for i in range(n):
+        rubric = rubrics[i % len(rubrics)]
+        evaluation = EvaluationModel(
+            evaluation_id=EvaluationModel.key_for(f"submission-{i // 5}", rubric.rubric_id),
+            submission_id=f"submission-{i // 5}",
+            rubric_id=rubric.rubric_id,
+            evaluated_by_username='faculty0',
+            points_awarded=i % 11,
+            feedback=make_text(30, seed=i % 7),
+            evaluated_at=now,
+            ml_points_awarded=7.5,
+            ml_feedback=make_text(30, seed=i % 5),
+        )
+        evaluation.rubric = rubric
+        evaluations.append(evaluation)
+    return evaluations
+
+
+def _serialization(serializer_class, build, n):
+    def setup(context):
+        instances = build(n)
+
+        def operation():
+            data = serializer_class(instances, many=True).data
+            if len(data) != n:
+                raise BenchmarkError("Serializer dropped items.")
+        return operation
+    return setup
+
+
+for _n in (1000, 10000):
+    benchmark(f"serialize.submissions.{_n}", repeat=10, items=_n)(_serialization(SubmissionSerializer, _submissions, _n))
+    benchmark(f"serialize.evaluations.{_n}", repeat=10, items=_n)(_serialization(EvaluationSerializer, _evaluations, _n))
+
+# --- AI evaluation prompt ----------------------------------------------------
+
+
+def _prompt(words):
+    def setup(context):
+        rubrics = [
+            RubricModel(rubric_id=f"rubric-{r}", project_id='project-1', criterion=f"Criterion {r}", max_points=10,
+                        description=make_text(25, seed=r))
+            for r in range(6)
+        ]
+        text = make_text(words)
+        backend = get_backend()
+
+        def operation():
+            build_prompt(backend, text, rubrics)
+        return operation
+    return setup
+
+
+# The long report is over ML_PROMPT_TOKEN_BUDGET, so it is summarized chunk by chunk
+# (by the deterministic LocalBackend, whose own cost is negligible).
+benchmark('ml.prompt.short')(_prompt(2000))
+benchmark('ml.prompt.long', repeat=10)(_prompt(20000))
+
+# --- Views -------------------------------------------------------------------
+
+
+class ViewCase:
+    """Requests to one endpoint as a given user, checked against the expected status code."""
+
+    def __init__(self, context, role='faculty', username=None):
+        self.client = Client()
+        self.data = context.data
+        username = username or (self.data.faculty[0] if role == 'faculty' else self.data.students[0])
+        self.token = context.environment.issuer.token(username, role=role)
+
+    def request(self, method, path, expected, token=None, **kwargs):
+        response = getattr(self.client, method)(path, HTTP_AUTHORIZATION=f"Bearer {token or self.token}", **kwargs)
+        if response.status_code != expected:
+            raise BenchmarkError(
+                f"{method.upper()} {path} returned {response.status_code}, expected {expected}: "
+                f"{response.content[:200]!r}"
+            )
+        return response
+
+
+def view(name, role='faculty', repeat=None):
+    """Registers `views.<name>`; the decorated function gets (case, context) and returns the operation."""
+    def decorator(func):
+        def setup(context):
+            return func(ViewCase(context, role), context)
+        benchmark(f"views.{name}", repeat=repeat)(setup)
+        return func
+    return decorator
+
+
+@view('projects.list.faculty')
+def _projects_faculty(case, context):
+    return lambda: case.request('get', '/api/projects/', 200)
+
+
+@view('projects.list.open', role='student')
+def _projects_open(case, context):
+    return lambda: case.request('get', '/api/projects/?open=true', 200)
+
+
+@view('projects.detail', role='student')
+def _project_detail(case, context):
+    path = f"/api/projects/{case.data.projects[0]}/"
+    return lambda: case.request('get', path, 200)
+
+
+@view('projects.create')
+def _project_create(case, context):
+    body = {'title': 'Benchmark project', 'description': make_text(60), 'start_date': '2025-01-01', 'end_date': '2099-01-01'}
+    return lambda: case.request('post', '/api/projects/', 201, data=body, content_type='application/json')
+
+
+@view('rubrics.list')
+def _rubrics(case, context):
+    path = f"/api/projects/{case.data.projects[0]}/rubrics/"
+    return lambda: case.request('get', path, 200)
+
+
+@view('submissions.create', role='student', repeat=20)
+def _submission_create(case, context):
+    # Every run is a new student's first version, so the attempt limit is never hit.
+    issuer = context.environment.issuer
+    tokens = iter([issuer.token(f"bench-student-{uuid4().hex[:8]}") for _ in range(context.iterations)])
+    report = make_pdf(5)
+    project_id = case.data.projects[0]
+
+    def operation():
+        body = {
+            'project_id': project_id,
+            'title': 'Benchmark submission',
+            'github_link': 'https://github.com/example/project',
+            'report_file': SimpleUploadedFile('report.pdf', report, content_type='application/pdf'),
+        }
+        case.request('post', '/api/submissions/', 202, token=next(tokens), data=body)
+    return operation
+
+
+@view('submissions.mine.student', role='student')
+def _my_submissions_student(case, context):
+    return lambda: case.request('get', '/api/submissions/my-submissions/', 200)
+
+
+@view('submissions.mine.faculty')
+def _my_submissions_faculty(case, context):
+    return lambda: case.request('get', '/api/submissions/my-submissions/', 200)
+
+
+@view('submissions.detail')
+def _submission_detail(case, context):
+    path = f"/api/submissions/{case.data.submissions[0]}/"
+    return lambda: case.request('get', path, 200)
+
+
+@view('evaluations.list')
+def _evaluations_list(case, context):
+    path = f"/api/submissions/{case.data.evaluated[0]}/evaluations/"
+    return lambda: case.request('get', path, 200)
+
+
+@view('evaluations.create')
+def _evaluation_create(case, context):
+    submission_id = case.data.submissions[-1]
+    project_id = SubmissionModel.get(submission_id).project_id
+    body = {'rubric_id': case.data.rubrics[project_id][0], 'points_awarded': 7, 'feedback': 'Solid work.'}
+    path = f"/api/submissions/{submission_id}/evaluations/"
+    return lambda: case.request('post', path, 201, data=body, content_type='application/json')
+
+
+@view('evaluations.bulk')
+def _evaluation_bulk(case, context):
+    submission_id = case.data.submissions[-1]
+    project_id = SubmissionModel.get(submission_id).project_id
+    body = [
+        {'rubric_id': rubric_id, 'points_awarded': 5, 'feedback': 'Bulk score.'}
+        for rubric_id in case.data.rubrics[project_id]
+    ]
+    path = f"/api/submissions/{submission_id}/evaluations/bulk/"
+    return lambda: case.request('post', path, 200, data=body, content_type='application/json')
+
+
+@view('ai.trigger.evaluate')
+def _trigger_evaluate(case, context):
+    # A different submission every run, so no stored AI results can be reused.
+    submissions = iter(case.data.submissions[-context.iterations:])
+
+    def operation():
+        case.request('post', f"/api/submissions/{next(submissions)}/trigger_ai_evaluation/", 200)
+    return operation
+
+
+@view('ai.trigger.stored')
+def _trigger_stored(case, context):
+    path = f"/api/submissions/{case.data.submissions[0]}/trigger_ai_evaluation/"
+    return lambda: case.request('post', path, 200)
+
+
+@view('ai.finalize')
+def _finalize(case, context):
+    path = f"/api/submissions/{case.data.evaluated[0]}/finalize_evaluation/"
+    return lambda: case.request('post', path, 200)
+
+
+@view('leaderboard.global', role='student')
+def _leaderboard(case, context):
+    return lambda: case.request('get', '/api/leaderboard/', 200)
+
+
+@view('leaderboard.project', role='student')
+def _leaderboard_project(case, context):
+    path = f"/api/leaderboard/?project_id={case.data.projects[0]}"
+    return lambda: case.request('get', path, 200)
+
+
+@view('profiles.detail', role='student')
+def _profile(case, context):
+    path = f"/api/profiles/{case.data.students[0]}/"
+    return lambda: case.request('get', path, 200)
+
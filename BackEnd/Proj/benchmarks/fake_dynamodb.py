@@ -0,0 +1,979 @@
+"""
+In-memory stand-in for DynamoDB, for offline benchmarks and load tests.
+
+It answers botocore's signed requests instead of sending them (the
+'before-send' event), so the PynamoDB models, botocore's serialization,
+retries and error parsing, and the instrumentation in
+Proj/dynamodb_metrics.py all run unchanged.
+Condition, key-condition, filter, projection and update expressions are
+evaluated; capacity is estimated the way DynamoDB bills it, and optional
+provisioned capacity turns overload into throttling errors.
+"""
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+from decimal import Decimal
+
+from botocore.awsrequest import AWSResponse
+
+_active = None
+_install_lock = threading.Lock()
+
+
+class FakeDynamoDBError(Exception):
+    def __init__(self, code, message, **extra):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.extra = extra
+
+
+# --- Expressions -------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'\s*(?:(<>|<=|>=|[=<>(),.\[\]+-])|(#[A-Za-z0-9_]+)|(:[A-Za-z0-9_]+)|([A-Za-z_][A-Za-z0-9_]*)|(\d+))')
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+
+
+def _tokenize(expression):
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise FakeDynamoDBError('ValidationException', f"Invalid expression near: {expression[position:]!r}")
+        symbol, name, value, word, number = match.groups()
+        if symbol:
+            tokens.append(('sym', symbol))
+        elif name:
+            tokens.append(('name', name))
+        elif value:
+            tokens.append(('value', value))
+        elif word:
+            upper = word.upper()
+            tokens.append(('kw', upper) if upper in _KEYWORDS else ('word', word))
+        else:
+            tokens.append(('int', int(number)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression, names, values):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, text=None):
+        token = self.peek()
+        if (kind and token[0] != kind) or (text is not None and token[1] != text):
+            raise FakeDynamoDBError('ValidationException', f"Unexpected token {token[1]!r}, expected {text or kind}")
+        self.position += 1
+        return token
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self.position += 1
+            return True
+        return False
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    # Operands
+    def path(self):
+        kind, text = self.take()
+        if kind == 'name':
+            if text not in self.names:
+                raise FakeDynamoDBError('ValidationException', f"Undefined attribute name placeholder {text}")
+            parts = [self.names[text]]
+        elif kind == 'word':
+            parts = [text]
+        else:
+            raise FakeDynamoDBError('ValidationException', f"Expected an attribute path, got {text!r}")
+        while True:
+            if self.accept('sym', '.'):
+                kind, text = self.take()
+                parts.append(self.names[text] if kind == 'name' else text)
+            elif self.accept('sym', '['):
+                parts.append(self.take('int')[1])
+                self.take('sym', ']')
+            else:
+                return ('path', tuple(parts))
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            if text not in self.values:
+                raise FakeDynamoDBError('ValidationException', f"Undefined attribute value placeholder {text}")
+            return ('value', self.values[text])
+        if kind == 'word' and self.peek(1) == ('sym', '('):
+            function = text.lower()
+            self.position += 2
+            args = [self.operand()]
+            while self.accept('sym', ','):
+                args.append(self.operand())
+            self.take('sym', ')')
+            return ('call', function, args)
+        return self.path()
+
+    # Conditions
+    def condition(self):
+        node = self.and_condition()
+        while self.accept('kw', 'OR'):
+            node = ('or', node, self.and_condition())
+        return node
+
+    def and_condition(self):
+        node = self.not_condition()
+        while self.accept('kw', 'AND'):
+            node = ('and', node, self.not_condition())
+        return node
+
+    def not_condition(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.not_condition())
+        return self.comparison()
+
+    def comparison(self):
+        if self.peek() == ('sym', '('):
+            self.position += 1
+            node = self.condition()
+            self.take('sym', ')')
+            return node
+        left = self.operand()
+        if left[0] == 'call' and left[1] != 'size':
+            return left
+        kind, text = self.peek()
+        if kind == 'sym' and text in ('=', '<>', '<', '<=', '>', '>='):
+            self.position += 1
+            return ('cmp', text, left, self.operand())
+        if self.accept('kw', 'BETWEEN'):
+            low = self.operand()
+            self.take('kw', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('kw', 'IN'):
+            self.take('sym', '(')
+            options = [self.operand()]
+            while self.accept('sym', ','):
+                options.append(self.operand())
+            self.take('sym', ')')
+            return ('in', left, options)
+        raise FakeDynamoDBError('ValidationException', f"Expected a comparison, got {text!r}")
+
+    # Updates
+    def update_actions(self):
+        actions = []
+        while not self.done():
+            clause = self.take('kw')[1]
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.take('sym', '=')
+                    value = self.operand()
+                    if self.peek() in (('sym', '+'), ('sym', '-')):
+                        operator = self.take()[1]
+                        value = ('arith', operator, value, self.operand())
+                    actions.append(('SET', path, value))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path, None))
+                elif clause in ('ADD', 'DELETE'):
+                    actions.append((clause, path, self.operand()))
+                else:
+                    raise FakeDynamoDBError('ValidationException', f"Unknown update clause {clause}")
+                if not self.accept('sym', ','):
+                    break
+        return actions
+
+
+def _parse_condition(expression, names, values):
+    parser = _Parser(expression, names, values)
+    node = parser.condition()
+    if not parser.done():
+        raise FakeDynamoDBError('ValidationException', f"Unexpected trailing tokens in {expression!r}")
+    return node
+
+
+def _parse_projection(expression, names):
+    parser = _Parser(expression, names, {})
+    paths = [parser.path()[1]]
+    while parser.accept('sym', ','):
+        paths.append(parser.path()[1])
+    return paths
+
+
+def _get_path(item, parts):
+    node = {'M': item}
+    for part in parts:
+        if isinstance(part, int):
+            values = node.get('L')
+            if values is None or part >= len(values):
+                return None
+            node = values[part]
+        else:
+            values = node.get('M')
+            if values is None or part not in values:
+                return None
+            node = values[part]
+    return node
+
+
+def _parent_of(item, parts):
+    parent = _get_path(item, parts[:-1]) if len(parts) > 1 else {'M': item}
+    if parent is None:
+        raise FakeDynamoDBError('ValidationException', "The document path provided in the update expression is invalid for update")
+    return parent
+
+
+def _set_path(item, parts, value):
+    parent, last = _parent_of(item, parts), parts[-1]
+    if isinstance(last, int):
+        values = parent['L']
+        if last < len(values):
+            values[last] = value
+        else:
+            values.append(value)
+    else:
+        parent['M'][last] = value
+
+
+def _remove_path(item, parts):
+    parent = _get_path(item, parts[:-1]) if len(parts) > 1 else {'M': item}
+    if parent is None:
+        return
+    last = parts[-1]
+    if isinstance(last, int):
+        if 'L' in parent and last < len(parent['L']):
+            del parent['L'][last]
+    else:
+        parent.get('M', {}).pop(last, None)
+
+
+def _scalar(value):
+    """Comparable Python value of a typed attribute value, or None if it is not a scalar."""
+    if value is None:
+        return None
+    if 'N' in value:
+        return ('N', Decimal(value['N']))
+    if 'S' in value:
+        return ('S', value['S'])
+    if 'B' in value:
+        return ('B', value['B'])
+    return None
+
+
+def _equal(a, b):
+    if a is None or b is None:
+        return False
+    sa, sb = _scalar(a), _scalar(b)
+    if sa is not None or sb is not None:
+        return sa == sb
+    if 'NS' in a and 'NS' in b:
+        return {Decimal(n) for n in a['NS']} == {Decimal(n) for n in b['NS']}
+    return a == b
+
+
+def _size(value):
+    if value is None:
+        return None
+    for kind in ('S', 'B'):
+        if kind in value:
+            return len(value[kind])
+    for kind in ('L', 'M', 'SS', 'NS', 'BS'):
+        if kind in value:
+            return len(value[kind])
+    return None
+
+
+def _evaluate_operand(node, item):
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return _get_path(item, node[1])
+    if kind == 'call' and node[1] == 'size':
+        size = _size(_evaluate_operand(node[2][0], item))
+        return None if size is None else {'N': str(size)}
+    if kind == 'call' and node[1] == 'if_not_exists':
+        existing = _evaluate_operand(node[2][0], item)
+        return existing if existing is not None else _evaluate_operand(node[2][1], item)
+    if kind == 'call' and node[1] == 'list_append':
+        first, second = (_evaluate_operand(arg, item) for arg in node[2])
+        return {'L': list((first or {}).get('L', [])) + list((second or {}).get('L', []))}
+    if kind == 'arith':
+        left, right = _evaluate_operand(node[2], item), _evaluate_operand(node[3], item)
+        if not left or not right or 'N' not in left or 'N' not in right:
+            raise FakeDynamoDBError('ValidationException', "An operand in the update expression has an incorrect data type")
+        result = Decimal(left['N']) + Decimal(right['N']) if node[1] == '+' else Decimal(left['N']) - Decimal(right['N'])
+        return {'N': _number(result)}
+    raise FakeDynamoDBError('ValidationException', f"Unsupported operand {node!r}")
+
+
+def _number(value):
+    text = format(value.normalize(), 'f') if isinstance(value, Decimal) else str(value)
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def _matches(node, item):
+    kind = node[0]
+    if kind == 'and':
+        return _matches(node[1], item) and _matches(node[2], item)
+    if kind == 'or':
+        return _matches(node[1], item) or _matches(node[2], item)
+    if kind == 'not':
+        return not _matches(node[1], item)
+    if kind == 'cmp':
+        left, right = _evaluate_operand(node[2], item), _evaluate_operand(node[3], item)
+        operator = node[1]
+        if operator == '=':
+            return _equal(left, right)
+        if operator == '<>':
+            return left is not None and not _equal(left, right)
+        a, b = _scalar(left), _scalar(right)
+        if a is None or b is None or a[0] != b[0]:
+            return False
+        return {'<': a < b, '<=': a <= b, '>': a > b, '>=': a >= b}[operator]
+    if kind == 'between':
+        value, low, high = (_scalar(_evaluate_operand(n, item)) for n in node[1:])
+        return None not in (value, low, high) and value[0] == low[0] == high[0] and low <= value <= high
+    if kind == 'in':
+        value = _evaluate_operand(node[1], item)
+        return any(_equal(value, _evaluate_operand(option, item)) for option in node[2])
+    if kind == 'call':
+        function, args = node[1], node[2]
+        value = _evaluate_operand(args[0], item)
+        if function == 'attribute_exists':
+            return value is not None
+        if function == 'attribute_not_exists':
+            return value is None
+        if function == 'attribute_type':
+            return value is not None and next(iter(_evaluate_operand(args[1], item).values())) in value
+        if function == 'begins_with':
+            prefix = _evaluate_operand(args[1], item)
+            a, b = _scalar(value), _scalar(prefix)
+            return a is not None and b is not None and a[0] == b[0] and a[1].startswith(b[1])
+        if function == 'contains':
+            needle = _evaluate_operand(args[1], item)
+            if value is None or needle is None:
+                return False
+            if 'S' in value:
+                return 'S' in needle and needle['S'] in value['S']
+            for kind_ in ('SS', 'NS', 'BS'):
+                if kind_ in value:
+                    return next(iter(needle.values())) in value[kind_]
+            if 'L' in value:
+                return any(_equal(element, needle) for element in value['L'])
+            return False
+    raise FakeDynamoDBError('ValidationException', f"Unsupported condition {node!r}")
+
+
+def _apply_update(item, actions):
+    for clause, path, operand in actions:
+        parts = path[1]
+        if clause == 'SET':
+            _set_path(item, parts, _evaluate_operand(operand, item))
+        elif clause == 'REMOVE':
+            _remove_path(item, parts)
+        elif clause == 'ADD':
+            value, existing = _evaluate_operand(operand, item), _get_path(item, parts)
+            if 'N' in value:
+                total = Decimal(value['N']) + (Decimal(existing['N']) if existing else 0)
+                _set_path(item, parts, {'N': _number(total)})
+            else:
+                set_kind = next(iter(value))
+                merged = list((existing or {}).get(set_kind, []))
+                merged += [member for member in value[set_kind] if member not in merged]
+                _set_path(item, parts, {set_kind: merged})
+        elif clause == 'DELETE':
+            value, existing = _evaluate_operand(operand, item), _get_path(item, parts)
+            if existing:
+                set_kind = next(iter(value))
+                remaining = [member for member in existing.get(set_kind, []) if member not in value[set_kind]]
+                if remaining:
+                    _set_path(item, parts, {set_kind: remaining})
+                else:
+                    _remove_path(item, parts)
+
+
+def _project(item, projection):
+    if projection is None:
+        return item
+    result = {}
+    for parts in projection:
+        value = _get_path(item, parts)
+        if value is not None:
+            # Nested paths are returned under their top-level attribute, as DynamoDB does.
+            if len(parts) == 1:
+                result[parts[0]] = value
+            else:
+                result.setdefault(parts[0], item[parts[0]])
+    return result
+
+
+# --- Tables --------------------------------------------------------------------
+
+def _key_value(value):
+    scalar = _scalar(value)
+    if scalar is None:
+        raise FakeDynamoDBError('ValidationException', "Key attributes must be scalars")
+    return scalar
+
+
+def _item_size(item):
+    return len(json.dumps(item, separators=(',', ':')))
+
+
+class _KeySchema:
+    def __init__(self, hash_key, range_key=None):
+        self.hash_key = hash_key
+        self.range_key = range_key
+
+    @classmethod
+    def from_definition(cls, key_schema):
+        keys = {entry['KeyType']: entry['AttributeName'] for entry in key_schema}
+        return cls(keys['HASH'], keys.get('RANGE'))
+
+    def covers(self, item):
+        return self.hash_key in item and (self.range_key is None or self.range_key in item)
+
+    def sort_value(self, item):
+        return _key_value(item[self.range_key]) if self.range_key else ()
+
+    def names(self):
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+
+class FakeTable:
+    def __init__(self, name, key_schema, indexes=None, capacity=None, burst_seconds=0.0):
+        self.name = name
+        self.schema = key_schema
+        self.indexes = indexes or {}  # index name -> _KeySchema (projection ALL)
+        self.items = {}  # primary key -> item
+        self.index_partitions = {name: {} for name in self.indexes}
+        self.partitions = {}
+        self.definition = None
+        self.set_capacity(capacity, burst_seconds)
+
+    def set_capacity(self, capacity, burst_seconds=0.0):
+        self.buckets = None
+        if capacity:
+            self.buckets = {kind: _TokenBucket(units, burst_seconds) for kind, units in zip(('read', 'write'), capacity)}
+
+    def primary_key(self, item):
+        if not self.schema.covers(item):
+            raise FakeDynamoDBError('ValidationException', "The provided key element does not match the schema")
+        key = (_key_value(item[self.schema.hash_key]),)
+        if self.schema.range_key:
+            key += (_key_value(item[self.schema.range_key]),)
+        return key
+
+    def get(self, key_attributes):
+        return self.items.get(self.primary_key(key_attributes))
+
+    def put(self, item):
+        key = self.primary_key(item)
+        self.delete(key)
+        self.items[key] = item
+        self.partitions.setdefault(key[0], {})[key] = item
+        for index_name, schema in self.indexes.items():
+            if schema.covers(item):
+                self.index_partitions[index_name].setdefault(_key_value(item[schema.hash_key]), {})[key] = item
+
+    def delete(self, key):
+        item = self.items.pop(key, None)
+        if item is None:
+            return None
+        self.partitions.get(key[0], {}).pop(key, None)
+        for index_name, schema in self.indexes.items():
+            if schema.covers(item):
+                self.index_partitions[index_name].get(_key_value(item[schema.hash_key]), {}).pop(key, None)
+        return item
+
+    def key_of(self, item, index_name=None):
+        names = list(self.schema.names())
+        if index_name:
+            names += [name for name in self.indexes[index_name].names() if name not in names]
+        return {name: item[name] for name in names}
+
+    def consume(self, kind, units):
+        if self.buckets and not self.buckets[kind].take(units):
+            raise FakeDynamoDBError(
+                'ProvisionedThroughputExceededException',
+                "The level of configured provisioned throughput for the table was exceeded."
+            )
+
+
+class _TokenBucket:
+    def __init__(self, rate, burst_seconds):
+        self.rate = rate
+        self.capacity = max(rate * burst_seconds, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, units):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < units:
+            return False
+        self.tokens -= units
+        return True
+
+
+def _read_units(size_bytes, consistent=False):
+    units = max(1, math.ceil(size_bytes / 4096))
+    return units if consistent else units / 2
+
+
+def _write_units(size_bytes):
+    return max(1, math.ceil(size_bytes / 1024))
+
+
+# --- The fake service ----------------------------------------------------------
+
+class FakeDynamoDB:
+    """
+    Args:
+        latency (float): Seconds added to every call, to imitate network round trips.
+        capacity (tuple, optional): (read, write) capacity units per second for
+            every table. Requests beyond it fail with
+            ProvisionedThroughputExceededException. Unlimited by default.
+        burst_seconds (float): Seconds of unused capacity a table may bank, like
+            DynamoDB's burst capacity.
+    """
+
+    def __init__(self, latency=0.0, capacity=None, burst_seconds=0.0):
+        self.latency = latency
+        self.capacity = capacity
+        self.burst_seconds = burst_seconds
+        self.tables = {}
+        self.calls = {}
+        self._lock = threading.RLock()
+
+    # Setup
+    def create_table(self, name, key_schema, indexes=None):
+        table = FakeTable(
+            name,
+            _KeySchema.from_definition(key_schema),
+            {index_name: _KeySchema.from_definition(schema) for index_name, schema in (indexes or {}).items()},
+            capacity=self.capacity,
+            burst_seconds=self.burst_seconds,
+        )
+        self.tables[name] = table
+        return table
+
+    def create_tables_for(self, models):
+        for model in models:
+            schema = model._get_schema()
+            indexes = {
+                index['index_name']: index['key_schema']
+                for index in schema.get('global_secondary_indexes', []) + schema.get('local_secondary_indexes', [])
+            }
+            self.create_table(model.Meta.table_name, schema['key_schema'], indexes)
+        return self
+
+    def set_capacity(self, capacity, burst_seconds=0.0):
+        """Changes the provisioned capacity of every table, e.g. once seeding is done."""
+        with self._lock:
+            self.capacity = capacity
+            self.burst_seconds = burst_seconds
+            for table in self.tables.values():
+                table.set_capacity(capacity, burst_seconds)
+
+    def install(self):
+        """Routes every PynamoDB call in this process to this fake until uninstall()."""
+        global _active
+        with _install_lock:
+            _patch_connection_client()
+            # Without credentials PynamoDB recreates its botocore client on every call.
+            os.environ.setdefault('AWS_ACCESS_KEY_ID', 'fake')
+            os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'fake')
+            _active = self
+        return self
+
+    def uninstall(self):
+        global _active
+        with _install_lock:
+            if _active is self:
+                _active = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    # Dispatch
+    def _table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            raise FakeDynamoDBError('ResourceNotFoundException', f"Requested resource not found: Table: {name} not found")
+        return table
+
+    def handle(self, operation, params):
+        if self.latency:
+            time.sleep(self.latency)
+        handler = getattr(self, f"_op_{operation}", None)
+        if handler is None:
+            raise FakeDynamoDBError('ValidationException', f"{operation} is not supported by the fake DynamoDB.")
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            return handler(params)
+
+    @staticmethod
+    def _capacity(params, table_name, units):
+        if params.get('ReturnConsumedCapacity', 'NONE') == 'NONE':
+            return {}
+        return {'ConsumedCapacity': {'TableName': table_name, 'CapacityUnits': units}}
+
+    @staticmethod
+    def _check(params, item, expression_key='ConditionExpression'):
+        expression = params.get(expression_key)
+        if expression and not _matches(
+            _parse_condition(expression, params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues')),
+            item or {}
+        ):
+            raise FakeDynamoDBError('ConditionalCheckFailedException', "The conditional request failed")
+
+    # Item operations
+    def _op_GetItem(self, params):
+        table = self._table(params['TableName'])
+        item = table.get(params['Key'])
+        units = _read_units(_item_size(item) if item else 1, params.get('ConsistentRead', False))
+        table.consume('read', units)
+        response = self._capacity(params, table.name, units)
+        if item is not None:
+            projection = params.get('ProjectionExpression')
+            names = params.get('ExpressionAttributeNames')
+            response['Item'] = _project(item, _parse_projection(projection, names) if projection else None)
+        return response
+
+    def _op_PutItem(self, params):
+        table = self._table(params['TableName'])
+        item = params['Item']
+        old = table.get(item)
+        units = _write_units(max(_item_size(item), _item_size(old) if old else 0))
+        table.consume('write', units)
+        self._check(params, old)
+        table.put(json.loads(json.dumps(item)))
+        response = self._capacity(params, table.name, units)
+        if params.get('ReturnValues') == 'ALL_OLD' and old:
+            response['Attributes'] = old
+        return response
+
+    def _op_UpdateItem(self, params):
+        table = self._table(params['TableName'])
+        old = table.get(params['Key'])
+        self._check(params, old)
+        item = json.loads(json.dumps(old)) if old else json.loads(json.dumps(params['Key']))
+        if params.get('UpdateExpression'):
+            parser = _Parser(params['UpdateExpression'], params.get('ExpressionAttributeNames'),
+                             params.get('ExpressionAttributeValues'))
+            _apply_update(item, parser.update_actions())
+        units = _write_units(max(_item_size(item), _item_size(old) if old else 0))
+        table.consume('write', units)
+        table.put(item)
+        response = self._capacity(params, table.name, units)
+        return_values = params.get('ReturnValues', 'NONE')
+        if return_values in ('ALL_NEW', 'UPDATED_NEW'):
+            response['Attributes'] = item
+        elif return_values in ('ALL_OLD', 'UPDATED_OLD') and old:
+            response['Attributes'] = old
+        return response
+
+    def _op_DeleteItem(self, params):
+        table = self._table(params['TableName'])
+        old = table.get(params['Key'])
+        units = _write_units(_item_size(old) if old else 1)
+        table.consume('write', units)
+        self._check(params, old)
+        if old is not None:
+            table.delete(table.primary_key(params['Key']))
+        response = self._capacity(params, table.name, units)
+        if params.get('ReturnValues') == 'ALL_OLD' and old:
+            response['Attributes'] = old
+        return response
+
+    # Reads of many items
+    def _page(self, params, table, candidates, index_name):
+        """Applies ExclusiveStartKey, Limit, FilterExpression, projection and Select to sorted candidates."""
+        start_key = params.get('ExclusiveStartKey')
+        if start_key:
+            start = table.primary_key(start_key)
+            keys = [table.primary_key(item) for item in candidates]
+            candidates = candidates[keys.index(start) + 1:] if start in keys else candidates
+        limit = params.get('Limit')
+        evaluated = candidates[:limit] if limit else candidates
+        names, values = params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues')
+        matched = evaluated
+        if params.get('FilterExpression'):
+            condition = _parse_condition(params['FilterExpression'], names, values)
+            matched = [item for item in evaluated if _matches(condition, item)]
+        units = _read_units(sum(_item_size(item) for item in evaluated) or 1, params.get('ConsistentRead', False))
+        table.consume('read', units)
+
+        response = self._capacity(params, table.name, units)
+        response.update({'Count': len(matched), 'ScannedCount': len(evaluated)})
+        if params.get('Select') != 'COUNT':
+            projection = params.get('ProjectionExpression')
+            paths = _parse_projection(projection, names) if projection else None
+            response['Items'] = [_project(item, paths) for item in matched]
+        if limit and len(candidates) > limit:
+            response['LastEvaluatedKey'] = table.key_of(evaluated[-1], index_name)
+        return response
+
+    def _op_Query(self, params):
+        table = self._table(params['TableName'])
+        index_name = params.get('IndexName')
+        schema = table.indexes[index_name] if index_name else table.schema
+        names, values = params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues')
+        condition = _parse_condition(params['KeyConditionExpression'], names, values)
+        hash_value = _hash_value_of(condition, schema.hash_key)
+        if hash_value is None:
+            raise FakeDynamoDBError('ValidationException', "Query condition missed key schema element")
+        partition = (table.index_partitions[index_name] if index_name else table.partitions).get(_key_value(hash_value), {})
+        candidates = [item for item in partition.values() if _matches(condition, item)]
+        candidates.sort(key=lambda item: (schema.sort_value(item), table.primary_key(item)),
+                        reverse=not params.get('ScanIndexForward', True))
+        return self._page(params, table, candidates, index_name)
+
+    def _op_Scan(self, params):
+        table = self._table(params['TableName'])
+        index_name = params.get('IndexName')
+        items = list(table.items.values())
+        if index_name:
+            items = [item for item in items if table.indexes[index_name].covers(item)]
+        if 'TotalSegments' in params:
+            segments, segment = params['TotalSegments'], params['Segment']
+            items = [item for item in items if hash(table.primary_key(item)) % segments == segment]
+        return self._page(params, table, items, index_name)
+
+    def _op_BatchGetItem(self, params):
+        responses, consumed = {}, []
+        for table_name, request in params['RequestItems'].items():
+            table = self._table(table_name)
+            projection = request.get('ProjectionExpression')
+            paths = _parse_projection(projection, request.get('ExpressionAttributeNames')) if projection else None
+            found = [item for item in (table.get(key) for key in request['Keys']) if item is not None]
+            units = sum(_read_units(_item_size(item), request.get('ConsistentRead', False)) for item in found) or 0.5
+            table.consume('read', units)
+            responses[table_name] = [_project(item, paths) for item in found]
+            consumed.append({'TableName': table_name, 'CapacityUnits': units})
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        if params.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+            response['ConsumedCapacity'] = consumed
+        return response
+
+    def _op_BatchWriteItem(self, params):
+        consumed, unprocessed, processed = [], {}, 0
+        for table_name, requests in params['RequestItems'].items():
+            table = self._table(table_name)
+            units = 0
+            for request in requests:
+                item = request['PutRequest']['Item'] if 'PutRequest' in request else None
+                request_units = _write_units(_item_size(item)) if item else 1
+                try:
+                    table.consume('write', request_units)
+                except FakeDynamoDBError:
+                    # Throttled writes come back as unprocessed items for the caller to retry.
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                units += request_units
+                processed += 1
+                if item:
+                    table.put(json.loads(json.dumps(item)))
+                else:
+                    table.delete(table.primary_key(request['DeleteRequest']['Key']))
+            consumed.append({'TableName': table_name, 'CapacityUnits': units})
+        if unprocessed and not processed:
+            raise FakeDynamoDBError(
+                'ProvisionedThroughputExceededException',
+                "The level of configured provisioned throughput for the table was exceeded."
+            )
+        response = {'UnprocessedItems': unprocessed}
+        if params.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+            response['ConsumedCapacity'] = consumed
+        return response
+
+    # Transactions
+    def _op_TransactWriteItems(self, params):
+        operations = []
+        reasons, failed = [], False
+        for entry in params['TransactItems']:
+            (kind, request), = entry.items()
+            table = self._table(request['TableName'])
+            key = request.get('Key') or request.get('Item')
+            current = table.get(key)
+            try:
+                self._check(request, current)
+                reasons.append({'Code': 'None'})
+            except FakeDynamoDBError as e:
+                reasons.append({'Code': 'ConditionalCheckFailed', 'Message': e.message})
+                failed = True
+            operations.append((kind, request, table, current))
+        if failed:
+            raise FakeDynamoDBError(
+                'TransactionCanceledException',
+                "Transaction cancelled, please refer cancellation reasons for specific reasons "
+                f"[{', '.join(reason['Code'] for reason in reasons)}]",
+                CancellationReasons=reasons,
+            )
+        # Work out every write and charge for all of them before applying any:
+        # a throttled transaction changes nothing.
+        writes, consumed = [], {}
+        for kind, request, table, current in operations:
+            item = None
+            if kind == 'Put':
+                item = json.loads(json.dumps(request['Item']))
+                units = 2 * _write_units(_item_size(item))
+            elif kind == 'Update':
+                item = json.loads(json.dumps(current)) if current else json.loads(json.dumps(request['Key']))
+                parser = _Parser(request['UpdateExpression'], request.get('ExpressionAttributeNames'),
+                                 request.get('ExpressionAttributeValues'))
+                _apply_update(item, parser.update_actions())
+                units = 2 * _write_units(_item_size(item))
+            elif kind == 'Delete':
+                units = 2 * _write_units(_item_size(current) if current else 1)
+            else:  # ConditionCheck
+                units = 2 * _read_units(_item_size(current) if current else 1, True)
+            table.consume('write', units)
+            consumed[table.name] = consumed.get(table.name, 0) + units
+            writes.append((kind, request, table, item))
+        for kind, request, table, item in writes:
+            if item is not None:
+                table.put(item)
+            elif kind == 'Delete':
+                table.delete(table.primary_key(request['Key']))
+        response = {}
+        if params.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+            response['ConsumedCapacity'] = [{'TableName': name, 'CapacityUnits': units} for name, units in consumed.items()]
+        return response
+
+    def _op_TransactGetItems(self, params):
+        responses = []
+        for entry in params['TransactItems']:
+            request = entry['Get']
+            item = self._table(request['TableName']).get(request['Key'])
+            projection = request.get('ProjectionExpression')
+            paths = _parse_projection(projection, request.get('ExpressionAttributeNames')) if projection else None
+            responses.append({'Item': _project(item, paths)} if item else {})
+        return {'Responses': responses}
+
+    # Tables
+    def _op_DescribeTable(self, params):
+        table = self._table(params['TableName'])
+        description = dict(table.definition or {}, TableName=table.name, TableStatus='ACTIVE',
+                           ItemCount=len(table.items))
+        description.setdefault('KeySchema', [{'AttributeName': name, 'KeyType': kind}
+                                             for name, kind in zip(table.schema.names(), ('HASH', 'RANGE'))])
+        description.setdefault('GlobalSecondaryIndexes', [
+            {'IndexName': name, 'IndexStatus': 'ACTIVE', 'KeySchema': [
+                {'AttributeName': attr, 'KeyType': kind} for attr, kind in zip(schema.names(), ('HASH', 'RANGE'))
+            ], 'Projection': {'ProjectionType': 'ALL'}}
+            for name, schema in table.indexes.items()
+        ])
+        return {'Table': description}
+
+    def _op_CreateTable(self, params):
+        if params['TableName'] in self.tables:
+            raise FakeDynamoDBError('ResourceInUseException', f"Table already exists: {params['TableName']}")
+        indexes = {index['IndexName']: index['KeySchema']
+                   for index in params.get('GlobalSecondaryIndexes', []) + params.get('LocalSecondaryIndexes', [])}
+        table = self.create_table(params['TableName'], params['KeySchema'], indexes)
+        table.definition = {key: value for key, value in params.items() if key != 'TableName'}
+        return self._op_DescribeTable({'TableName': table.name})
+
+    def _op_DeleteTable(self, params):
+        description = self._op_DescribeTable(params)
+        del self.tables[params['TableName']]
+        return {'TableDescription': description['Table']}
+
+    def _op_ListTables(self, params):
+        return {'TableNames': sorted(self.tables)}
+
+    def _op_UpdateTable(self, params):
+        table = self._table(params['TableName'])
+        for update in params.get('GlobalSecondaryIndexUpdates', []):
+            if 'Create' in update:
+                create = update['Create']
+                table.indexes[create['IndexName']] = _KeySchema.from_definition(create['KeySchema'])
+                table.index_partitions[create['IndexName']] = {}
+                for item in list(table.items.values()):
+                    table.put(item)
+        return self._op_DescribeTable(params)
+
+
+def _hash_value_of(condition, hash_key):
+    """Finds the `hash_key = :value` term of a key condition."""
+    kind = condition[0]
+    if kind == 'and':
+        return _hash_value_of(condition[1], hash_key) or _hash_value_of(condition[2], hash_key)
+    if kind == 'cmp' and condition[1] == '=':
+        left, right = condition[2], condition[3]
+        if left[0] == 'path' and left[1] == (hash_key,) and right[0] == 'value':
+            return right[1]
+        if right[0] == 'path' and right[1] == (hash_key,) and left[0] == 'value':
+            return left[1]
+    return None
+
+
+class _RawResponse(io.BytesIO):
+    """The raw body of an AWSResponse, as urllib3 would provide it."""
+
+    def stream(self, **kwargs):
+        contents = self.read()
+        while contents:
+            yield contents
+            contents = self.read()
+
+
+def _before_send(request=None, **kwargs):
+    """
+    botocore 'before-send' handler: answers the signed request from the active
+    fake, if any, with the JSON body DynamoDB would send. botocore then parses
+    it and retries throttled calls as it does for real responses.
+    """
+    fake = _active
+    if fake is None:
+        return None
+    target = request.headers['X-Amz-Target']
+    operation = (target.decode() if isinstance(target, bytes) else target).rpartition('.')[2]
+    body = request.body or b'{}'
+    params = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+    try:
+        response = fake.handle(operation, params)
+        status = 200
+    except FakeDynamoDBError as e:
+        response = {'__type': f"com.amazonaws.dynamodb.v20120810#{e.code}", 'message': e.message, **e.extra}
+        status = 400
+    headers = {'Content-Type': 'application/x-amz-json-1.0', 'x-amzn-RequestId': 'fake'}
+    return AWSResponse(request.url, status, headers, _RawResponse(json.dumps(response).encode('utf-8')))
+
+
+def _patch_connection_client():
+    """Registers `_before_send` on every botocore client PynamoDB creates or already has."""
+    from pynamodb.connection.base import Connection
+    if getattr(Connection.client.fget, '_fake_dynamodb_patched', False):
+        return
+    original = Connection.client
+
+    def client(connection):
+        botocore_client = original.fget(connection)
+        if not getattr(botocore_client, '_fake_dynamodb_registered', False):
+            botocore_client.meta.events.register_first('before-send.dynamodb', _before_send)
+            botocore_client._fake_dynamodb_registered = True
+        return botocore_client
+
+    patched = property(client)
+    patched.fget._fake_dynamodb_patched = True
+    Connection.client = patched
@@ -0,0 +1,307 @@
+"""
+Local stand-ins and generated data for the benchmarks and the load harness:
+PDF reports, a Cognito-like token issuer with its own JWKS, a seeded
+in-memory DynamoDB and the settings that tie them together.
+"""
+import json
+import random
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test.utils import override_settings
+from pynamodb.models import Model
+
+from .fake_dynamodb import FakeDynamoDB
+
+WORDS = (
+    "system design evaluation dataset model training accuracy latency results method "
+    "architecture database pipeline deployment testing user interface requirements analysis "
+    "implementation performance scalability security module component service api cloud "
+    "algorithm baseline experiment benchmark feature improvement limitation future work"
+).split()
+
+
+def make_text(words, seed=0):
+    """Deterministic report-like prose of `words` words."""
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < words:
+        length = min(rng.randint(8, 18), words - count)
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + '.')
+        count += length
+    return ' '.join(sentences)
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages, words_per_page=350, seed=0):
+    """
+    Builds a PDF of `pages` pages of generated text with one Type1 font, like
+    a plain exported report. Returns the file's bytes.
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        words = make_text(words_per_page, seed=rng.random()).split()
+        lines = [' '.join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        stream = "BT /F1 10 Tf 14 TL 50 790 Td\n" + f"(Page {page + 1}) '\n" + ''.join(
+            f"({_pdf_escape(line)}) '\n" for line in lines
+        ) + "ET"
+        stream = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+class TokenIssuer:
+    """
+    Mints Cognito-style RS256 ID tokens and publishes the matching JWKS as a
+    file, which COGNITO_JWKS_URL can point at.
+    """
+
+    def __init__(self, directory, region='us-east-1', user_pool_id='local_benchmark', client_id='benchmark-client',
+                 kid='benchmark-key'):
+        self.region = region
+        self.user_pool_id = user_pool_id
+        self.client_id = client_id
+        self.kid = kid
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self._private_key.public_key()))
+        jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+        self.jwks_path = Path(directory) / 'jwks.json'
+        self.jwks_path.write_text(json.dumps({'keys': [jwk]}))
+
+    @property
+    def issuer(self):
+        return f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}"
+
+    def token(self, username, role='student', email=None, ttl=3600):
+        now = int(time.time())
+        claims = {
+            'sub': str(uuid4()),
+            'cognito:username': username,
+            'email': email or f"{username}@example.edu",
+            'custom:role': role,
+            'token_use': 'id',
+            'aud': self.client_id,
+            'iss': self.issuer,
+            'iat': now,
+            'exp': now + ttl,
+        }
+        return jwt.encode(claims, self._private_key, algorithm='RS256', headers={'kid': self.kid})
+
+    def settings(self):
+        return {
+            'COGNITO_REGION': self.region,
+            'COGNITO_USER_POOL_ID': self.user_pool_id,
+            'COGNITO_APP_CLIENT_ID': self.client_id,
+            'COGNITO_JWKS_URL': str(self.jwks_path),
+        }
+
+
+def table_models():
+    from .. import models
+    return [
+        obj for obj in vars(models).values()
+        if isinstance(obj, type) and issubclass(obj, Model) and obj is not Model
+    ]
+
+
+class Dataset:
+    """Ids of the seeded items, for building requests."""
+
+    def __init__(self):
+        self.faculty = []
+        self.students = []
+        self.projects = []  # project ids
+        self.rubrics = {}  # project id -> [rubric ids]
+        self.submissions = []  # ids of latest submissions with report text
+        self.evaluated = []  # ids of submissions with manual scores for every rubric
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, values):
+        data = cls()
+        vars(data).update(values)
+        return data
+
+
+def seed(projects=5, rubrics_per_project=5, students=50, faculty=2, report_words=1500, evaluated_fraction=0.5):
+    """
+    Writes a semester's worth of items through the models (and the versioning
+    transaction), so the indexes hold what the views expect. Every student
+    submits once to every project.
+    """
+    from ..evaluations import bulk_upsert_manual_evaluations
+    from ..leaderboard import record_score
+    from ..models import ProjectModel, RubricModel, SubmissionModel
+    from ..versioning import load_counter, write_new_version
+
+    data = Dataset()
+    data.faculty = [f"faculty{i}" for i in range(faculty)]
+    data.students = [f"student{i:04d}" for i in range(students)]
+    today = date.today()
+    report = make_text(report_words)
+    for p in range(projects):
+        project = ProjectModel(
+            title=f"Project {p}",
+            description=make_text(60, seed=p),
+            created_by_username=data.faculty[p % faculty],
+            start_date=today - timedelta(days=30),
+            end_date=today + timedelta(days=1 + p),
+        )
+        project.save()
+        data.projects.append(project.project_id)
+        rubrics = []
+        for r in range(rubrics_per_project):
+            rubric = RubricModel(
+                project_id=project.project_id,
+                criterion=f"Criterion {r}",
+                max_points=10,
+                description=make_text(25, seed=r),
+            )
+            rubric.save()
+            rubrics.append(rubric)
+        data.rubrics[project.project_id] = [r.rubric_id for r in rubrics]
+
+        for s, student in enumerate(data.students):
+            submission = SubmissionModel(
+                project_id=project.project_id,
+                student_username=student,
+                student_email=f"{student}@example.edu",
+                title=f"{student} - Project {p}",
+                report_file_path=f"reports/{student}-{p}.pdf",
+                report_content_summary=report,
+                status='Submitted',
+            )
+            write_new_version(submission, load_counter(project.project_id, student))
+            data.submissions.append(submission.submission_id)
+            if s < students * evaluated_fraction:
+                scores = [
+                    {'rubric_id': rubric.rubric_id, 'points_awarded': (s + i) % 11, 'feedback': 'Seeded score.'}
+                    for i, rubric in enumerate(rubrics)
+                ]
+                bulk_upsert_manual_evaluations(submission, scores, project.created_by_username)
+                submission.update(actions=[
+                    SubmissionModel.manual_score.set(sum(score['points_awarded'] for score in scores)),
+                    SubmissionModel.overall_score.set(sum(score['points_awarded'] for score in scores)),
+                    SubmissionModel.status.set('Evaluated'),
+                ])
+                record_score(submission, project_title=project.title)
+                data.evaluated.append(submission.submission_id)
+    return data
+
+
+def reset_singletons():
+    """Drops the process-wide clients and caches so they are rebuilt from the current settings."""
+    from ml_evaluator.backends import reset_backend
+    from .. import authentication, catalog_cache, extraction_cache, jobs, jwks, outbox, pdf_extractor
+
+    reset_backend()
+    pdf_extractor.reset_engine()
+    jwks._provider = None
+    authentication.verified_tokens.clear()
+    authentication._public_keys.clear()
+    jobs._queue = None
+    outbox._outbox = None
+    extraction_cache._cache = None
+    catalog_cache._catalog = None
+
+
+class LocalEnvironment:
+    def __init__(self, directory, dynamodb, issuer):
+        self.directory = directory
+        self.dynamodb = dynamodb
+        self.issuer = issuer
+
+
+@contextmanager
+def local_environment(llm_options=None, dynamodb_options=None, fake_dynamodb=True, **extra_settings):
+    """
+    Runs the block against local stand-ins only: the in-memory DynamoDB, a
+    token issuer with a file JWKS, the deterministic LocalBackend evaluator,
+    and a temporary directory for media, the job queue, the outbox (FileBackend)
+    and the extraction cache. Nothing leaves the machine.
+
+    With `fake_dynamodb=False` the models use the configured DynamoDB instead
+    (e.g. DynamoDB Local through DYNAMODB_HOST, with the tables already created
+    by Proj/create_tables.py).
+
+    Yields a LocalEnvironment; call `seed()` inside the block to add data.
+    """
+    with tempfile.TemporaryDirectory(prefix='projectflow-bench-') as directory:
+        root = Path(directory)
+        issuer = TokenIssuer(root)
+        overrides = {
+            **issuer.settings(),
+            'ALLOWED_HOSTS': ['testserver', 'localhost', '127.0.0.1'],
+            'MEDIA_ROOT': str(root / 'media'),
+            'AUTH_USER_SYNC_ENABLED': False,
+            'ML_EVALUATOR_BACKEND': 'ml_evaluator.backends.local.LocalBackend',
+            'ML_EVALUATOR_OPTIONS': llm_options or {},
+            'EXTRACTION_CACHE_DIR': str(root / 'extraction_cache'),
+            'UPLOAD_SESSION_DIR': str(root / 'upload_sessions'),
+            'CACHES': {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': str(root / 'shared_cache'),
+                },
+            },
+            'JOB_QUEUE': {
+                'BACKEND': 'Proj.jobs.SQLiteJobQueue',
+                'OPTIONS': {'path': str(root / 'jobs.sqlite3')},
+                'TASK_MODULES': ['Proj.tasks', 'Proj.batch_evaluation'],
+                'MAX_ATTEMPTS': 3,
+                'RETRY_BACKOFF': 1,
+                'PERIODIC_CALLBACKS': [],
+            },
+            'EMAIL_OUTBOX': {
+                'BACKEND': 'Proj.outbox.FileBackend',
+                'OPTIONS': {'path': str(root / 'outbox.sqlite3'), 'digest_window': 0},
+                'FILE_PATH': str(root / 'sent_emails'),
+                'BATCH_SIZE': 50,
+                'SES_MAX_POOL_CONNECTIONS': 1,
+            },
+            **extra_settings,
+        }
+        dynamodb = FakeDynamoDB(**(dynamodb_options or {})).create_tables_for(table_models()) if fake_dynamodb else None
+        with override_settings(**overrides), dynamodb or nullcontext():
+            reset_singletons()
+            try:
+                yield LocalEnvironment(root, dynamodb, issuer)
+            finally:
+                reset_singletons()
@@ -0,0 +1,365 @@
+"""
+Deadline-surge load harness: replays the traffic of the hour before a
+project's end_date (students submitting, faculty evaluating, everyone
+watching the leaderboard) against a running ProjectFlow over HTTP, at
+increasing concurrency, and reports throughput, latency percentiles per
+endpoint and error and throttle rates for every step.
+
+The server is either started in this process on top of the local stand-ins
+(see `serve`) or an instance started with `manage.py loadtest --serve`,
+whose tokens and seeded ids are read from the state file it writes.
+"""
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import requests
+from django.core.wsgi import get_wsgi_application
+
+from .fixtures import Dataset, make_pdf
+
+logger = logging.getLogger(__name__)
+
+# Share of the requests going to each operation; see OPERATIONS.
+DEFAULT_MIX = {
+    'submit': 0.40,
+    'projects': 0.08,
+    'my_submissions': 0.10,
+    'faculty_submissions': 0.05,
+    'evaluations': 0.05,
+    'evaluate': 0.10,
+    'finalize': 0.02,
+    'leaderboard': 0.20,
+}
+OPERATIONS = tuple(DEFAULT_MIX)
+
+# Tokens are minted for the whole run; a surge test should not hit expiry.
+TOKEN_TTL = 12 * 3600
+
+
+def build_state(environment, data, new_students=1000):
+    """
+    Tokens and ids the load generator needs: the seeded faculty and students,
+    plus students who have not submitted yet (the surge).
+    """
+    issuer = environment.issuer
+    return {
+        'faculty': [issuer.token(name, role='faculty', ttl=TOKEN_TTL) for name in data.faculty],
+        'students': [issuer.token(name, ttl=TOKEN_TTL) for name in data.students],
+        'new_students': [issuer.token(f"surge-{i:05d}", ttl=TOKEN_TTL) for i in range(new_students)],
+        'dataset': data.as_dict(),
+    }
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    WSGI server handling requests on a fixed pool of threads, like a gthread
+    worker: when every thread is busy, connections wait in the listen backlog.
+    """
+    request_queue_size = 1024
+
+    def __init__(self, address, threads):
+        super().__init__(address, _QuietHandler)
+        self.threads = threads
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='projectflow-server')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(host='127.0.0.1', port=0, threads=8):
+    """Starts ProjectFlow on a background thread. Returns (server, base_url); stop with server.shutdown()."""
+    server = PooledWSGIServer((host, port), threads)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, name='projectflow-server', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+class Recorder:
+    """Latency samples and failures per endpoint, shared by the virtual users of one step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # endpoint -> [latency_ms]
+        self.errors = {}  # endpoint -> {status or exception name: count}
+        self.throttled = {}  # endpoint -> responses with 429/503
+
+    def record(self, endpoint, latency_ms, outcome=None):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(latency_ms)
+            if outcome is not None:
+                errors = self.errors.setdefault(endpoint, {})
+                errors[outcome] = errors.get(outcome, 0) + 1
+                if outcome in ('429', '503'):
+                    self.throttled[endpoint] = self.throttled.get(endpoint, 0) + 1
+
+
+def _percentiles(samples):
+    if len(samples) == 1:
+        return samples[0], samples[0], samples[0]
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+class VirtualUser:
+    """
+    One closed-loop client: picks an operation by weight, sends it, waits
+    for the response and repeats. Surge students submit up to the attempt
+    limit, then the next new student takes over.
+    """
+
+    def __init__(self, harness, seed):
+        self.harness = harness
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.student_token = None
+        self.attempts_left = 0
+
+    def request(self, endpoint, method, path, token, expected, **kwargs):
+        started = time.perf_counter()
+        outcome = None
+        try:
+            response = self.session.request(
+                method, self.harness.url + path, headers={'Authorization': f"Bearer {token}"},
+                timeout=self.harness.timeout, **kwargs
+            )
+            if response.status_code not in expected:
+                outcome = str(response.status_code)
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        self.harness.recorder.record(endpoint, (time.perf_counter() - started) * 1000, outcome)
+
+    # --- Operations ---
+    def submit(self):
+        if self.attempts_left == 0:
+            self.student_token = self.harness.next_new_student()
+            self.attempts_left = 3
+        self.attempts_left -= 1
+        files = {'report_file': ('report.pdf', self.harness.report, 'application/pdf')}
+        body = {
+            'project_id': self.random.choice(self.harness.data.projects),
+            'title': 'Final report',
+            'github_link': 'https://github.com/example/project',
+        }
+        self.request('POST /api/submissions/', 'post', '/api/submissions/', self.student_token, (202,),
+                     data=body, files=files)
+
+    def projects(self):
+        self.request('GET /api/projects/?open', 'get', '/api/projects/?open=true', self.student(), (200,))
+
+    def my_submissions(self):
+        self.request('GET /api/submissions/my-submissions/', 'get', '/api/submissions/my-submissions/',
+                     self.student(), (200,))
+
+    def faculty_submissions(self):
+        self.request('GET /api/submissions/my-submissions/ (faculty)', 'get', '/api/submissions/my-submissions/',
+                     self.faculty(), (200,))
+
+    def evaluations(self):
+        submission_id = self.random.choice(self.harness.data.evaluated)
+        self.request('GET /api/submissions/<id>/evaluations/', 'get',
+                     f"/api/submissions/{submission_id}/evaluations/", self.faculty(), (200,))
+
+    def evaluate(self):
+        submission_id = self.random.choice(self.harness.data.submissions)
+        self.request('POST /api/submissions/<id>/trigger_ai_evaluation/', 'post',
+                     f"/api/submissions/{submission_id}/trigger_ai_evaluation/", self.faculty(), (200,))
+
+    def finalize(self):
+        submission_id = self.random.choice(self.harness.data.evaluated)
+        self.request('POST /api/submissions/<id>/finalize_evaluation/', 'post',
+                     f"/api/submissions/{submission_id}/finalize_evaluation/", self.faculty(), (200,))
+
+    def leaderboard(self):
+        if self.random.random() < 0.5:
+            path = '/api/leaderboard/'
+        else:
+            path = f"/api/leaderboard/?project_id={self.random.choice(self.harness.data.projects)}"
+        self.request('GET /api/leaderboard/', 'get', path, self.student(), (200,))
+
+    def student(self):
+        return self.random.choice(self.harness.state['students'])
+
+    def faculty(self):
+        return self.random.choice(self.harness.state['faculty'])
+
+    def run(self, stop_at, think_time):
+        names, weights = zip(*self.harness.mix.items())
+        while time.monotonic() < stop_at:
+            getattr(self, self.random.choices(names, weights)[0])()
+            if think_time:
+                time.sleep(self.random.uniform(0, 2 * think_time))
+
+
+class LoadHarness:
+    """
+    Args:
+        url (str): Base URL of the ProjectFlow instance under test.
+        state (dict): Tokens and seeded ids, from build_state().
+        mix (dict): Operation name -> weight (see DEFAULT_MIX).
+        think_time (float): Mean pause of a virtual user between requests, in seconds.
+        timeout (float): Client-side request timeout, in seconds.
+    """
+
+    def __init__(self, url, state, mix=None, think_time=0.0, timeout=60.0, seed=0):
+        self.url = url.rstrip('/')
+        self.state = state
+        self.data = Dataset.from_dict(state['dataset'])
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        unknown = set(self.mix) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operation(s) in the traffic mix: {', '.join(sorted(unknown))}")
+        self.think_time = think_time
+        self.timeout = timeout
+        self.seed = seed
+        self.report = make_pdf(5)
+        self.recorder = None
+        self._new_students = iter(state['new_students'])
+        self._new_students_lock = threading.Lock()
+        self._staff_session = requests.Session()
+
+    def next_new_student(self):
+        with self._new_students_lock:
+            try:
+                return next(self._new_students)
+            except StopIteration:
+                raise RuntimeError("Ran out of surge students; build the state with more new students.")
+
+    def _dynamodb_stats(self, method):
+        """Resets (DELETE) or reads (GET) the server's DynamoDB counters through the staff API."""
+        try:
+            response = self._staff_session.request(
+                method, f"{self.url}/api/system/dynamodb/",
+                headers={'Authorization': f"Bearer {self.state['faculty'][0]}"}, timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Could not {method} the server's DynamoDB stats: {e}")
+            return None
+        return response.json() if method == 'GET' else None
+
+    def run_step(self, concurrency, duration):
+        """Runs `concurrency` virtual users for `duration` seconds and returns the step's report."""
+        self.recorder = Recorder()
+        self._dynamodb_stats('DELETE')
+        users = [VirtualUser(self, seed=self.seed * 100003 + concurrency * 1009 + i) for i in range(concurrency)]
+        started = time.monotonic()
+        stop_at = started + duration
+        threads = [
+            threading.Thread(target=user.run, args=(stop_at, self.think_time), daemon=True)
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return self._step_report(concurrency, elapsed, self._dynamodb_stats('GET'))
+
+    def _step_report(self, concurrency, elapsed, dynamodb):
+        recorder = self.recorder
+        endpoints = {}
+        total = errors = throttled = 0
+        all_samples = []
+        for endpoint, samples in sorted(recorder.samples.items()):
+            p50, p95, p99 = _percentiles(samples)
+            endpoint_errors = sum(recorder.errors.get(endpoint, {}).values())
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'throughput': round(len(samples) / elapsed, 2),
+                'p50_ms': round(p50, 1),
+                'p95_ms': round(p95, 1),
+                'p99_ms': round(p99, 1),
+                'max_ms': round(max(samples), 1),
+                'error_rate': round(endpoint_errors / len(samples), 4),
+                'errors': recorder.errors.get(endpoint, {}),
+            }
+            total += len(samples)
+            errors += endpoint_errors
+            throttled += recorder.throttled.get(endpoint, 0)
+            all_samples.extend(samples)
+        report = {
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput': round(total / elapsed, 2),
+            'error_rate': round(errors / total, 4) if total else None,
+            'http_throttle_rate': round(throttled / total, 4) if total else None,
+            'endpoints': endpoints,
+        }
+        if all_samples:
+            p50, p95, p99 = _percentiles(all_samples)
+            report.update(p50_ms=round(p50, 1), p95_ms=round(p95, 1), p99_ms=round(p99, 1))
+        if dynamodb is not None:
+            calls = sum(op['calls'] for op in dynamodb['operations'])
+            throttled_calls = sum(op['throttled'] for op in dynamodb['operations'])
+            report['dynamodb'] = {
+                'calls': calls,
+                'throttled': throttled_calls,
+                'throttle_rate': round(throttled_calls / calls, 4) if calls else None,
+                'errors': sum(op['errors'] for op in dynamodb['operations']),
+                'capacity_units': round(sum(op['capacity_units'] for op in dynamodb['operations']), 1),
+            }
+        return report
+
+    def run(self, concurrency_levels, duration, on_step=None):
+        steps = []
+        for concurrency in concurrency_levels:
+            step = self.run_step(concurrency, duration)
+            steps.append(step)
+            if on_step:
+                on_step(step)
+        return {'url': self.url, 'mix': self.mix, 'think_time': self.think_time, 'steps': steps,
+                'saturation': find_saturation(steps)}
+
+
+def find_saturation(steps, min_gain=0.1, max_error_rate=0.01):
+    """
+    The first concurrency level at which adding users stopped paying off:
+    more than `max_error_rate` of the requests failed, or throughput grew by
+    less than `min_gain` over the previous step. None if every step scaled.
+    """
+    previous = None
+    for step in steps:
+        if (step['error_rate'] or 0) > max_error_rate:
+            return {'concurrency': step['concurrency'], 'reason': f"error rate {step['error_rate']:.1%}"}
+        if previous is not None and step['throughput'] < previous['throughput'] * (1 + min_gain):
+            return {
+                'concurrency': step['concurrency'],
+                'reason': f"throughput {previous['throughput']} -> {step['throughput']} req/s",
+            }
+        previous = step
+    return None
+
+
+def load_state(path):
+    with open(path) as state_file:
+        return json.load(state_file)
+
+
+def save_state(path, state):
+    with open(path, 'w') as state_file:
+        json.dump(state, state_file)
@@ -0,0 +1,157 @@
+"""
+Benchmark registry, runner and baseline comparison.
+
+A benchmark is a function that takes a BenchmarkContext, does its setup and
+returns the zero-argument operation to time. Benchmarks are registered with
+the `benchmark` decorator (see Proj/benchmarks/cases.py) and run by
+`python manage.py benchmark`.
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+RESULTS_FORMAT = 1
+
+_registry = {}
+
+
+class BenchmarkError(Exception):
+    """A benchmark's operation did not do what it is meant to measure (e.g. a view returned an error)."""
+
+
+def benchmark(name, repeat=None, items=None):
+    """
+    Registers a benchmark.
+
+    Args:
+        name (str): Dotted name, e.g. 'views.leaderboard.global'; --filter matches on it.
+        repeat (int, optional): Cap on the timed runs, for slow operations.
+        items (int, optional): Items handled per run, to report items per second.
+    """
+    def decorator(func):
+        _registry[name] = {'name': name, 'func': func, 'repeat': repeat, 'items': items}
+        return func
+    return decorator
+
+
+def registered(patterns=None):
+    """Registered benchmarks, in registration order, whose name contains any of `patterns`."""
+    from . import cases  # noqa: F401  (registers the benchmarks)
+    entries = list(_registry.values())
+    if patterns:
+        entries = [entry for entry in entries if any(pattern in entry['name'] for pattern in patterns)]
+    return entries
+
+
+class BenchmarkContext:
+    """What a benchmark's setup gets: the local environment, the seeded data and the run count."""
+
+    def __init__(self, environment, data, iterations, quick=False):
+        self.environment = environment
+        self.data = data
+        self.iterations = iterations
+        self.quick = quick
+
+
+def summarize(timings_ms, items=None):
+    ordered = sorted(timings_ms)
+    median = statistics.median(ordered)
+    result = {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 4),
+        'median_ms': round(median, 4),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'max_ms': round(ordered[-1], 4),
+        'ops_per_second': round(1000 / median, 2) if median else None,
+    }
+    if items:
+        result['items'] = items
+        result['items_per_second'] = round(items * 1000 / median, 1) if median else None
+    return result
+
+
+def run_benchmark(entry, environment, data, repeat, warmup, quick=False):
+    repeat = min(repeat, entry['repeat']) if entry['repeat'] else repeat
+    context = BenchmarkContext(environment, data, iterations=warmup + repeat, quick=quick)
+    operation = entry['func'](context)
+    for _ in range(warmup):
+        operation()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, entry['items'])
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def results_document(benchmarks, repeat, warmup, quick):
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'settings': {'repeat': repeat, 'warmup': warmup, 'quick': quick},
+        'benchmarks': benchmarks,
+    }
+
+
+def load_results(path):
+    with open(path) as results_file:
+        document = json.load(results_file)
+    if document.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path} is not a benchmark results file (format {RESULTS_FORMAT}).")
+    return document
+
+
+def save_results(path, document):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as results_file:
+        json.dump(document, results_file, indent=2, sort_keys=True)
+        results_file.write('\n')
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Compares the median time of every benchmark with the baseline document.
+
+    A benchmark regressed when its median is more than `tolerance` (a fraction)
+    slower than the baseline's, and improved when it is that much faster.
+
+    Returns:
+        list: One dict per benchmark with name, baseline_ms, current_ms, change and status
+              ('regressed', 'improved', 'unchanged', 'new' or 'missing').
+    """
+    before = baseline['benchmarks']
+    after = current['benchmarks']
+    rows = []
+    for name in [*after, *(n for n in before if n not in after)]:
+        old = before.get(name, {}).get('median_ms')
+        new = after.get(name, {}).get('median_ms')
+        if old is None or new is None:
+            rows.append({
+                'name': name, 'baseline_ms': old, 'current_ms': new, 'change': None,
+                'status': 'new' if old is None else 'missing',
+            })
+            continue
+        change = (new - old) / old if old else 0.0
+        if change > tolerance:
+            row_status = 'regressed'
+        elif change < -tolerance:
+            row_status = 'improved'
+        else:
+            row_status = 'unchanged'
+        rows.append({'name': name, 'baseline_ms': old, 'current_ms': new, 'change': round(change, 4), 'status': row_status})
+    return rows
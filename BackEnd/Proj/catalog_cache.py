@@ -0,0 +1,196 @@
+"""
+In-process cache of the catalog reads made on almost every request: a project
+by id and the rubric set of a project. Both tables are small and rarely change.
+
+Entries expire after CATALOG_CACHE_TTL seconds and the least recently used are
+evicted past CATALOG_CACHE_MAX_ENTRIES. Every entry is stamped with a version
+kept in the 'shared' Django cache; writes go through `invalidate_project` /
+`invalidate_rubrics`, which bump that version, so an entry cached before the
+write is never served again by any worker. If that cache is process-local,
+other workers would not see the bump, so entries then expire after
+CATALOG_CACHE_LOCAL_TTL seconds instead. Items are cached in their serialized
+form and every read gets a fresh model instance, so callers may modify what
+they get back.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import ProjectModel, RubricModel
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+SHARED_CACHE = 'shared'
+
+
+class VersionedLRUCache:
+    """Thread-safe TTL/LRU map whose entries are only served while their version is current."""
+
+    def __init__(self, name, ttl, max_entries):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, version, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _version_key(self, key):
+        return f"catalog:{self.name}:{key}"
+
+    def version(self, key):
+        return caches[SHARED_CACHE].get(self._version_key(key), 0)
+
+    def get(self, key):
+        """
+        Returns (value, version). The value is _MISSING on a miss; the version is
+        then the one to pass to `set` once the value has been read from DynamoDB.
+        """
+        if not self.enabled:
+            return _MISSING, 0
+        version = self.version(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == version and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], version
+            if entry is not None:
+                del self._entries[key]
+                if entry[1] != version:
+                    self.stale += 1
+            self.misses += 1
+            return _MISSING, version
+
+    def set(self, key, value, version):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drops the entry here and bumps its version for every other worker. Returns the new version."""
+        version_key = self._version_key(key)
+        cache = caches[SHARED_CACHE]
+        try:
+            version = cache.incr(version_key)
+        except ValueError:
+            # Never bumped yet (or evicted from the cache): start above the implicit 0.
+            if cache.add(version_key, 1, timeout=None):
+                version = 1
+            else:
+                version = cache.incr(version_key)
+        with self._lock:
+            self._entries.pop(key, None)
+            self.invalidations += 1
+        return version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class CatalogCache:
+    """Projects by project_id and rubric sets by project_id."""
+
+    def __init__(self, ttl, max_entries):
+        self.projects = VersionedLRUCache('project', ttl, max_entries)
+        self.rubric_sets = VersionedLRUCache('rubrics', ttl, max_entries)
+
+    def get_project(self, project_id):
+        """Returns the project, or None if it does not exist (misses are not cached)."""
+        if not project_id:
+            return None
+        raw, version = self.projects.get(project_id)
+        if raw is not _MISSING:
+            return ProjectModel.from_raw_data(raw)
+        try:
+            project = ProjectModel.get(project_id)
+        except ProjectModel.DoesNotExist:
+            return None
+        self.projects.set(project_id, project.serialize(), version)
+        return project
+
+    def get_rubrics(self, project_id):
+        """Returns the project's rubrics, in project_index order."""
+        raw, version = self.rubric_sets.get(project_id)
+        if raw is not _MISSING:
+            return [RubricModel.from_raw_data(item) for item in raw]
+        rubrics = list(RubricModel.project_index.query(project_id))
+        self.rubric_sets.set(project_id, [rubric.serialize() for rubric in rubrics], version)
+        return rubrics
+
+    def invalidate_project(self, project_id, project=None):
+        """Call after a project is written; pass the saved project to cache it straight away."""
+        version = self.projects.invalidate(project_id)
+        if project is not None:
+            self.projects.set(project_id, project.serialize(), version)
+
+    def invalidate_rubrics(self, project_id):
+        """Call after a rubric of `project_id` is created, updated or deleted."""
+        self.rubric_sets.invalidate(project_id)
+
+    def clear(self):
+        self.projects.clear()
+        self.rubric_sets.clear()
+
+    def stats(self):
+        return {'project': self.projects.stats(), 'rubrics': self.rubric_sets.stats()}
+
+
+_catalog = None
+
+
+def get_catalog_cache():
+    global _catalog
+    if _catalog is None:
+        ttl = settings.CATALOG_CACHE_TTL
+        if isinstance(caches[SHARED_CACHE], (LocMemCache, DummyCache)) and ttl > settings.CATALOG_CACHE_LOCAL_TTL:
+            logger.warning(
+                f"The '{SHARED_CACHE}' cache is process-local; catalog entries expire after "
+                f"{settings.CATALOG_CACHE_LOCAL_TTL}s instead of {ttl}s."
+            )
+            ttl = settings.CATALOG_CACHE_LOCAL_TTL
+        _catalog = CatalogCache(ttl, settings.CATALOG_CACHE_MAX_ENTRIES)
+    return _catalog
+
+
+def cached_fetcher(model):
+    """The single-item read to use for `model` in request loaders, or None to read DynamoDB directly."""
+    if model is ProjectModel:
+        return get_catalog_cache().get_project
+    return None
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 # This block allows the script to be run directly from the command line
 # by adding the project's root directory to the Python path.
@@ -11,7 +12,58 @@ django.setup()
 
 # Now we can import our models and other necessary components
 from pynamodb.indexes import GlobalSecondaryIndex
-from Proj.models import ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel
+from Proj.models import ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel, LeaderboardEntryModel, SubmissionCounterModel
+
+def _wait_for_table(model, index_name=None):
+    """Waits until the table (and `index_name`, if given) is ACTIVE."""
+    while True:
+        table = model.describe_table()
+        indexes = {i['IndexName']: i['IndexStatus'] for i in table.get('GlobalSecondaryIndexes', [])}
+        if table['TableStatus'] == 'ACTIVE' and (index_name is None or indexes.get(index_name) == 'ACTIVE'):
+            return
+        time.sleep(5)
+
+def add_missing_indexes(model):
+    """
+    Creates the GSIs defined on `model` that the existing table does not have yet.
+    DynamoDB builds one new index per UpdateTable call, so they are added one at a time.
+    Returns the names of the indexes created.
+    """
+    existing = {i['IndexName'] for i in model.describe_table().get('GlobalSecondaryIndexes', [])}
+    schema = model._get_schema()
+    created = []
+    for index in schema['global_secondary_indexes']:
+        if index['index_name'] in existing:
+            continue
+        print(f"Creating index '{index['index_name']}' on '{model.Meta.table_name}'...")
+        _wait_for_table(model)
+        model._get_connection().connection.client.update_table(
+            TableName=model.Meta.table_name,
+            AttributeDefinitions=index['attribute_definitions'],
+            GlobalSecondaryIndexUpdates=[{
+                'Create': {
+                    'IndexName': index['index_name'],
+                    # HASH must come before RANGE in a key schema.
+                    'KeySchema': sorted(index['key_schema'], key=lambda k: k['KeyType'] != 'HASH'),
+                    'Projection': index['projection'],
+                    'ProvisionedThroughput': index['provisioned_throughput'],
+                }
+            }]
+        )
+        _wait_for_table(model, index['index_name'])
+        created.append(index['index_name'])
+    return created
+
+def backfill_projects():
+    """Sets active_partition on active projects so they appear in the sparse active_index."""
+    count = 0
+    for project in ProjectModel.scan(ProjectModel.is_active == True):
+        project.update(actions=[ProjectModel.active_partition.set(ProjectModel.ACTIVE_PARTITION)])
+        count += 1
+    return count
+
+# Run after new indexes are created on an existing table, to fill the attributes they use.
+BACKFILLS = {ProjectModel: backfill_projects}
 
 def create_all_tables():
     """
@@ -20,7 +72,7 @@ def create_all_tables():
     with the required indexes as defined in the PynamoDB model class.
     """
     # List of all PynamoDB models to be created
-    models_to_create = [ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel]
+    models_to_create = [ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel, LeaderboardEntryModel, SubmissionCounterModel]
 
     for model in models_to_create:
         table_name = model.Meta.table_name
@@ -52,13 +104,13 @@ def create_all_tables():
 
                 print(f"Successfully created table '{table_name}'.")
             else:
-                print(f"Table '{table_name}' already exists. No action taken.")
-                # For existing tables, log the GSIs the code expects to find.
-                # This helps diagnose mismatches.
-                expected_gsi = get_model_gsi_names(model)
-                if expected_gsi:
-                    print(f"Note: The model code expects the following GSIs for this table: {expected_gsi}")
-                    print("If you are seeing errors about a missing index, you may need to delete the table in your AWS account and run this script again.")
+                print(f"Table '{table_name}' already exists.")
+                # Existing tables get any index added to the model since they were created.
+                if add_missing_indexes(model):
+                    backfill = BACKFILLS.get(model)
+                    if backfill:
+                        print(f"Backfilling new index attributes on '{table_name}'...")
+                        print(f"Updated {backfill()} item(s).")
 
         except Exception as e:
             print(f"An error occurred while creating or checking table '{table_name}': {e}")
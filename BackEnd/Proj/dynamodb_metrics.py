@@ -0,0 +1,261 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from botocore.exceptions import ClientError
+from django.conf import settings
+from pynamodb.connection.base import Connection
+
+from .metrics import LatencyHistogram, record_phase
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+
+class CallTotals:
+    """Counters shared by the per-operation, per-view and per-request aggregates."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.capacity_units = 0.0
+        self.items = 0
+        self.retries = 0
+        self.throttled = 0
+        self.unprocessed = 0
+        self.time_ms = 0.0
+
+    def add(self, other):
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        data = dict(vars(self))
+        data['capacity_units'] = round(self.capacity_units, 2)
+        data['time_ms'] = round(self.time_ms, 2)
+        return data
+
+
+class DynamoDBStats:
+    """
+    Process-wide aggregates of DynamoDB calls, keyed by (model, operation)
+    and by the view (or background job) that made them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}  # (model, operation) -> (CallTotals, LatencyHistogram)
+            self.views = {}  # view -> {'requests': n, 'totals': CallTotals}
+
+    def record_call(self, model, operation, call):
+        with self._lock:
+            totals, histogram = self.operations.setdefault((model, operation), (CallTotals(), LatencyHistogram()))
+            totals.add(call)
+            histogram.observe(call.time_ms)
+
+    def record_request(self, view, totals):
+        with self._lock:
+            entry = self.views.setdefault(view, {'requests': 0, 'totals': CallTotals()})
+            entry['requests'] += 1
+            entry['totals'].add(totals)
+
+    def snapshot(self):
+        with self._lock:
+            operations = [
+                {'model': model, 'operation': operation, **totals.as_dict(), 'latency': histogram.as_dict()}
+                for (model, operation), (totals, histogram) in self.operations.items()
+            ]
+            views = [
+                {
+                    'view': view,
+                    'requests': entry['requests'],
+                    **entry['totals'].as_dict(),
+                    'capacity_units_per_request': round(entry['totals'].capacity_units / entry['requests'], 2),
+                }
+                for view, entry in self.views.items()
+            ]
+        operations.sort(key=lambda o: o['capacity_units'], reverse=True)
+        views.sort(key=lambda v: v['capacity_units'], reverse=True)
+        return {'views': views, 'operations': operations}
+
+
+dynamodb_stats = DynamoDBStats()
+
+# Totals for the request or job running in the current context, if any.
+_current = contextvars.ContextVar('dynamodb_request_totals', default=None)
+# Throttled attempts seen by botocore's retry handler during the call in progress.
+_call_state = threading.local()
+_totals_lock = threading.Lock()
+
+
+@contextmanager
+def attribute_to(name):
+    """
+    Collects the DynamoDB calls made inside the block and records them under
+    `name` (a view route or a job name; a callable is resolved on exit).
+    Yields the CallTotals.
+    """
+    totals = CallTotals()
+    token = _current.set(totals)
+    try:
+        yield totals
+    finally:
+        _current.reset(token)
+        if totals.calls:
+            name = name() if callable(name) else name
+            dynamodb_stats.record_request(name, totals)
+            logger.info(
+                f"{name}: {totals.calls} DynamoDB call(s), {totals.capacity_units:.1f} capacity units, "
+                f"{totals.items} item(s), {totals.retries} retries, {totals.throttled} throttled, "
+                f"{totals.time_ms:.1f} ms"
+            )
+
+
+def current_totals():
+    return _current.get()
+
+
+_table_models = None
+
+
+def _model_for_table(table_name):
+    global _table_models
+    if _table_models is None:
+        from pynamodb.models import Model
+        from . import models
+        _table_models = {
+            obj.Meta.table_name: obj.__name__
+            for obj in vars(models).values()
+            if isinstance(obj, type) and issubclass(obj, Model) and obj is not Model
+        }
+    return _table_models.get(table_name, table_name)
+
+
+def _tables_in(operation_kwargs):
+    if 'RequestItems' in operation_kwargs:
+        return list(operation_kwargs['RequestItems'])
+    if 'TransactItems' in operation_kwargs:
+        return sorted({op['TableName'] for item in operation_kwargs['TransactItems'] for op in item.values()})
+    return [operation_kwargs.get('TableName')]
+
+
+def _consumed_capacity(data):
+    consumed = data.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(entry.get('CapacityUnits', 0) for entry in consumed)
+
+
+def _item_count(data):
+    if 'Count' in data:
+        return data['Count']
+    if 'Item' in data:
+        return 1
+    if 'Responses' in data:
+        responses = data['Responses']
+        if isinstance(responses, dict):
+            return sum(len(items) for items in responses.values())
+        return len(responses)
+    return 0
+
+
+def _on_needs_retry(response=None, **kwargs):
+    """botocore 'needs-retry' handler: counts throttled attempts. Never decides on the retry itself."""
+    if response is not None and response[1]:
+        code = response[1].get('Error', {}).get('Code')
+        if code in THROTTLING_CODES:
+            _call_state.throttled = getattr(_call_state, 'throttled', 0) + 1
+    return None
+
+
+def _instrumented_dispatch(original):
+    def dispatch(self, operation_name, operation_kwargs):
+        client = self.client
+        if not getattr(client, '_projectflow_instrumented', False):
+            client.meta.events.register('needs-retry.dynamodb', _on_needs_retry)
+            client._projectflow_instrumented = True
+
+        label = operation_name
+        if operation_kwargs.get('IndexName'):
+            label = f"{operation_name}:{operation_kwargs['IndexName']}"
+        tables = _tables_in(operation_kwargs)
+        model = ','.join(_model_for_table(t) for t in tables)
+
+        call = CallTotals()
+        call.calls = 1
+        _call_state.throttled = 0
+        started = time.perf_counter()
+        try:
+            data = original(self, operation_name, operation_kwargs)
+        except Exception as e:
+            call.errors = 1
+            cause = e.__cause__ if isinstance(e.__cause__, ClientError) else e
+            if isinstance(cause, ClientError):
+                call.retries = cause.response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+            raise
+        else:
+            data = data or {}
+            call.capacity_units = _consumed_capacity(data)
+            call.items = _item_count(data)
+            call.retries = data.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+            call.unprocessed = int(bool(data.get('UnprocessedKeys') or data.get('UnprocessedItems')))
+            return data
+        finally:
+            call.time_ms = (time.perf_counter() - started) * 1000
+            call.throttled = _call_state.throttled
+            dynamodb_stats.record_call(model, label, call)
+            record_phase('dynamodb', call.time_ms)
+            totals = _current.get()
+            if totals is not None:
+                # Calls of one request may run concurrently (Proj/async_views.py).
+                with _totals_lock:
+                    totals.add(call)
+            if call.throttled:
+                logger.warning(f"DynamoDB throttled {label} on {model} {call.throttled} time(s)")
+
+    dispatch._projectflow_original = original
+    return dispatch
+
+
+def install():
+    """Wraps PynamoDB's Connection.dispatch, through which every table operation goes. Idempotent."""
+    if not settings.DYNAMODB_INSTRUMENTATION or hasattr(Connection.dispatch, '_projectflow_original'):
+        return
+    Connection.dispatch = _instrumented_dispatch(Connection.dispatch)
+
+
+def view_name(request):
+    """Low-cardinality name for the view that handled `request`, e.g. 'GET /api/leaderboard/'."""
+    match = getattr(request, 'resolver_match', None)
+    return f"{request.method} /{match.route}" if match else f"{request.method} (unresolved)"
+
+
+class DynamoDBMetricsMiddleware:
+    """Attributes DynamoDB calls to the view that handled the request and logs a summary line."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with attribute_to(lambda: view_name(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with attribute_to(lambda: view_name(request)):
+            return await self.get_response(request)
@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime
+
+from pynamodb.transactions import TransactWrite
+
+from .models import EvaluationModel, SubmissionModel, get_transaction_connection
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB accepts at most 100 actions per transaction; one is the submission status update.
+MAX_BULK_EVALUATIONS = 99
+
+
+def _manual_actions(submission_id, rubric_id, points_awarded, feedback, username, evaluated_at=None):
+    return [
+        EvaluationModel.submission_id.set(submission_id),
+        EvaluationModel.rubric_id.set(rubric_id),
+        EvaluationModel.points_awarded.set(points_awarded),
+        EvaluationModel.feedback.set(feedback or ''),
+        EvaluationModel.evaluated_by_username.set(username),
+        EvaluationModel.evaluated_at.set(evaluated_at or datetime.utcnow()),
+    ]
+
+
+def _same_submission(submission_id):
+    # Guards the key against ever being reused for a different submission.
+    return EvaluationModel.submission_id.does_not_exist() | (EvaluationModel.submission_id == submission_id)
+
+
+def upsert_manual_evaluation(submission_id, rubric_id, points_awarded, feedback, username):
+    """
+    Creates or updates the manual score of one rubric with a single conditional
+    UpdateItem and returns the item as stored (ALL_NEW), including any AI result.
+    """
+    evaluation = EvaluationModel(EvaluationModel.key_for(submission_id, rubric_id))
+    evaluation.update(
+        actions=_manual_actions(submission_id, rubric_id, points_awarded, feedback, username),
+        condition=_same_submission(submission_id)
+    )
+    return evaluation
+
+
+def bulk_upsert_manual_evaluations(submission, scores, username):
+    """
+    Saves the manual scores of several rubrics and marks the submission as under
+    evaluation in one DynamoDB transaction.
+
+    Args:
+        submission (SubmissionModel): The submission being evaluated.
+        scores (list of dict): Items with rubric_id, points_awarded and optional feedback.
+        username (str): The evaluating faculty member.
+
+    Returns:
+        list of EvaluationModel: The manual scores as written, in the order of
+        `scores`. AI results already stored on the items are not read back.
+    """
+    evaluated_at = datetime.utcnow()
+    evaluations = []
+    with TransactWrite(connection=get_transaction_connection()) as transaction:
+        for score in scores:
+            evaluation = EvaluationModel(
+                EvaluationModel.key_for(submission.submission_id, score['rubric_id']),
+                submission_id=submission.submission_id,
+                rubric_id=score['rubric_id'],
+                points_awarded=score['points_awarded'],
+                feedback=score.get('feedback') or '',
+                evaluated_by_username=username,
+                evaluated_at=evaluated_at,
+            )
+            transaction.update(
+                evaluation,
+                actions=_manual_actions(
+                    evaluation.submission_id, evaluation.rubric_id, evaluation.points_awarded,
+                    evaluation.feedback, username, evaluated_at
+                ),
+                condition=_same_submission(submission.submission_id)
+            )
+            evaluations.append(evaluation)
+        transaction.update(submission, actions=[SubmissionModel.status.set('Under Evaluation')])
+    return evaluations
+
+
+def one_per_rubric(evaluations):
+    """
+    Collapses duplicate items for the same rubric, which can exist for submissions
+    evaluated before evaluation ids were made deterministic. The keyed item wins,
+    then the most recent one.
+    """
+    chosen = {}
+    for evaluation in evaluations:
+        current = chosen.get(evaluation.rubric_id)
+        if current is None or _rank(evaluation) > _rank(current):
+            chosen[evaluation.rubric_id] = evaluation
+    return list(chosen.values())
+
+
+def _rank(evaluation):
+    keyed = evaluation.evaluation_id == EvaluationModel.key_for(evaluation.submission_id, evaluation.rubric_id)
+    return (keyed, evaluation.evaluated_at or datetime.min)
+
+
+def migrate_legacy_ids(dry_run=False):
+    """
+    Rewrites evaluations stored under random ids to their deterministic key,
+    merging duplicates per (submission, rubric): the newest manual score and the
+    newest AI result are kept. Scans the table, so run it once as a maintenance task.
+
+    Returns:
+        dict: Number of keyed items written and legacy items deleted.
+    """
+    groups = {}
+    for evaluation in EvaluationModel.scan():
+        groups.setdefault((evaluation.submission_id, evaluation.rubric_id), []).append(evaluation)
+
+    written = deleted = 0
+    for (submission_id, rubric_id), items in groups.items():
+        key = EvaluationModel.key_for(submission_id, rubric_id)
+        legacy = [e for e in items if e.evaluation_id != key]
+        if not legacy:
+            continue
+        manual = max((e for e in items if e.points_awarded is not None),
+                     key=lambda e: e.evaluated_at or datetime.min, default=None)
+        ml = max((e for e in items if e.ml_evaluated_at is not None),
+                 key=lambda e: e.ml_evaluated_at, default=None)
+        merged = EvaluationModel(evaluation_id=key, submission_id=submission_id, rubric_id=rubric_id)
+        if manual is not None:
+            merged.points_awarded = manual.points_awarded
+            merged.feedback = manual.feedback
+            merged.evaluated_by_username = manual.evaluated_by_username
+            merged.evaluated_at = manual.evaluated_at
+        if ml is not None:
+            merged.ml_points_awarded = ml.ml_points_awarded
+            merged.ml_feedback = ml.ml_feedback
+            merged.ml_input_hash = ml.ml_input_hash
+            merged.ml_evaluated_at = ml.ml_evaluated_at
+        if not dry_run:
+            merged.save()
+            with EvaluationModel.batch_write() as batch:
+                for evaluation in legacy:
+                    batch.delete(evaluation)
+        written += 1
+        deleted += len(legacy)
+    logger.info(f"Evaluation id migration: {written} keyed items written, {deleted} legacy items deleted")
+    return {'written': written, 'deleted': deleted}
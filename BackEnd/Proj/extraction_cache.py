@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import pdfminer
+from django.conf import settings
+
+# Bump when a change to Proj/pdf_extractor.py changes the extracted text, so
+# entries produced by the old code are no longer served.
+EXTRACTOR_VERSION = 1
+
+
+def extractor_fingerprint(laparams_kwargs):
+    """Identifies the extractor settings; part of every cache key."""
+    config = json.dumps({
+        'version': EXTRACTOR_VERSION,
+        'pdfminer': pdfminer.__version__,
+        'laparams': laparams_kwargs,
+    }, sort_keys=True)
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+
+def file_sha256(absolute_file_path):
+    """Hashes a file on disk. Only used for files whose hash was not recorded at upload time."""
+    digest = hashlib.sha256()
+    with open(absolute_file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    On-disk, content-addressed store of extracted PDF text.
+
+    Each entry is a text file named after its key. A small SQLite index next
+    to the files tracks entry sizes and last access times, so the least
+    recently used entries are evicted once the store grows past `max_bytes`,
+    and keeps hit/miss counters shared by every process using the directory.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    cache_key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    pages INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_lru_idx ON entries (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _path(self, cache_key):
+        return os.path.join(self.directory, cache_key[:2], f"{cache_key}.txt")
+
+    @staticmethod
+    def _count(conn, name, amount=1):
+        conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+
+    def get(self, cache_key):
+        """Returns (text, pages) for a cached entry, or None on a miss."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT pages FROM entries WHERE cache_key = ?', (cache_key,)).fetchone()
+            if row is not None:
+                try:
+                    with open(self._path(cache_key), encoding='utf-8') as f:
+                        text = f.read()
+                except OSError:
+                    # The file was evicted by another process between the lookup and the read.
+                    conn.execute('DELETE FROM entries WHERE cache_key = ?', (cache_key,))
+                    row = None
+            if row is None:
+                self._count(conn, 'misses')
+                return None
+            conn.execute('UPDATE entries SET last_access = ? WHERE cache_key = ?', (time.time(), cache_key))
+            self._count(conn, 'hits')
+            return text, row['pages']
+
+    def set(self, cache_key, text, pages):
+        path = self._path(cache_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (cache_key, size, pages, last_access) VALUES (?, ?, ?, ?)',
+                (cache_key, size, pages, time.time())
+            )
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in conn.execute('SELECT cache_key, size FROM entries ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM entries WHERE cache_key = ?', (row['cache_key'],))
+            try:
+                os.remove(self._path(row['cache_key']))
+            except OSError:
+                pass
+            total -= row['size']
+            self._count(conn, 'evictions')
+
+    def stats(self):
+        with self._connect() as conn:
+            counters = {row['name']: row['value'] for row in conn.execute('SELECT name, value FROM counters')}
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+
+_cache = None
+
+
+def get_extraction_cache():
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache(settings.EXTRACTION_CACHE_DIR, settings.EXTRACTION_CACHE_MAX_BYTES)
+    return _cache
+
+
+def cache_key_for(content_sha256, laparams_kwargs):
+    return f"{content_sha256}-{extractor_fingerprint(laparams_kwargs)}"
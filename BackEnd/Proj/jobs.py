@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from importlib import import_module
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .dynamodb_metrics import attribute_to
+
+logger = logging.getLogger(__name__)
+
+# Registry of task name -> task options, filled in by the @task decorator.
+_registry = {}
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def task(name=None, max_attempts=None, retry_backoff=None, on_failure=None):
+    """
+    Registers a function as a background task that can be enqueued by name.
+
+    Args:
+        name (str, optional): Name the task is stored under. Defaults to the function's dotted path.
+        max_attempts (int, optional): Attempts before the job is marked as failed.
+        retry_backoff (float, optional): Base delay in seconds, doubled after each failed attempt.
+        on_failure (callable, optional): Called with the job payload once all attempts are exhausted.
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _registry[task_name] = {
+            'func': func,
+            'max_attempts': max_attempts or settings.JOB_QUEUE['MAX_ATTEMPTS'],
+            'retry_backoff': retry_backoff if retry_backoff is not None else settings.JOB_QUEUE['RETRY_BACKOFF'],
+            'on_failure': on_failure,
+        }
+        func.task_name = task_name
+        func.delay = lambda **payload: enqueue(task_name, **payload)
+        return func
+    return decorator
+
+
+def get_task(task_name):
+    if task_name not in _registry:
+        # Tasks register themselves on import, so make sure the task modules are loaded.
+        for module_path in settings.JOB_QUEUE['TASK_MODULES']:
+            import_module(module_path)
+    try:
+        return _registry[task_name]
+    except KeyError:
+        raise LookupError(f"Unknown task '{task_name}'.")
+
+
+class SQLiteJobQueue:
+    """
+    A durable job queue stored in a local SQLite database.
+
+    Jobs survive process restarts. A job claimed by a worker is leased for
+    `lease_seconds`; if the worker dies the lease expires and another worker
+    picks the job up again, unless it has used up its attempts.
+    """
+
+    def __init__(self, path, lease_seconds=300):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    task_name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    run_at REAL NOT NULL,
+                    locked_by TEXT,
+                    locked_until REAL,
+                    last_error TEXT,
+                    progress TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (status, run_at)')
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'progress' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, task_name, payload, max_attempts, delay=0):
+        job_id = str(uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, task_name, payload, status, max_attempts, run_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, task_name, json.dumps(payload), QUEUED, max_attempts, now + delay, now, now)
+            )
+        return job_id
+
+    def claim(self, worker_id):
+        """
+        Atomically leases the next runnable job, or returns None when the queue is idle.
+
+        A job whose lease expired after its last attempt (its worker died) is
+        marked as failed instead and returned with `lease_expired` set, so the
+        caller can run the task's failure hook.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE (status = ? AND run_at <= ?) OR (status = ? AND locked_until < ?) '
+                'ORDER BY run_at LIMIT 1',
+                (QUEUED, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            job = dict(row)
+            job['lease_expired'] = row['status'] == RUNNING and row['attempts'] >= row['max_attempts']
+            if job['lease_expired']:
+                job['last_error'] = f"Lease held by {row['locked_by']} expired on attempt {row['attempts']}"
+                conn.execute(
+                    'UPDATE jobs SET status = ?, locked_by = NULL, locked_until = NULL, last_error = ?, updated_at = ? '
+                    'WHERE job_id = ?',
+                    (FAILED, job['last_error'], now, row['job_id'])
+                )
+            else:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, locked_by = ?, locked_until = ?, '
+                    'updated_at = ? WHERE job_id = ?',
+                    (RUNNING, worker_id, now + self.lease_seconds, now, row['job_id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        if not job['lease_expired']:
+            job['attempts'] += 1
+            job['status'], job['locked_by'] = RUNNING, worker_id
+        job['payload'] = json.loads(job['payload'])
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        return job
+
+    def complete(self, job_id, worker_id):
+        return self._finish(job_id, worker_id, DONE, None)
+
+    def retry(self, job_id, worker_id, error, delay):
+        """Requeues a job after `delay` seconds. Returns False if `worker_id` no longer holds its lease."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, run_at = ?, locked_by = NULL, locked_until = NULL, last_error = ?, '
+                'updated_at = ? WHERE job_id = ? AND status = ? AND locked_by = ?',
+                (QUEUED, now + delay, error, now, job_id, RUNNING, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job_id, worker_id, progress=None):
+        """Extends the lease of a running job and optionally records its progress."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET locked_until = ?, progress = COALESCE(?, progress), updated_at = ? '
+                'WHERE job_id = ? AND status = ? AND locked_by = ?',
+                (now + self.lease_seconds, json.dumps(progress) if progress is not None else None, now, job_id,
+                 RUNNING, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, FAILED, error)
+
+    def _finish(self, job_id, worker_id, status, error):
+        # Only the worker holding the lease may record the outcome: one whose lease expired
+        # must not overwrite the result of the worker that reclaimed the job.
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, locked_by = NULL, locked_until = NULL, last_error = ?, updated_at = ? '
+                'WHERE job_id = ? AND status = ? AND locked_by = ?',
+                (status, error, time.time(), job_id, RUNNING, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        return job
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+_queue = None
+# The job being executed by this worker thread, for report_progress().
+_current = threading.local()
+
+
+def get_queue():
+    """Returns the process-wide queue configured by settings.JOB_QUEUE."""
+    global _queue
+    if _queue is None:
+        config = settings.JOB_QUEUE
+        _queue = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _queue
+
+
+def enqueue(task_name, delay=0, **payload):
+    """
+    Adds a job for `task_name` to the queue and returns its id.
+    The payload must be JSON serializable.
+    """
+    options = get_task(task_name)
+    job_id = get_queue().enqueue(task_name, payload, options['max_attempts'], delay=delay)
+    logger.info(f"Enqueued job {job_id} ({task_name})")
+    return job_id
+
+
+def report_progress(progress):
+    """
+    Records progress for the job running in this thread and extends its lease.
+    Long-running tasks should call this periodically. No-op outside a job.
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        get_queue().heartbeat(job['job_id'], job['locked_by'], progress)
+
+
+def current_job():
+    """Returns the job dict being executed by this thread, or None."""
+    return getattr(_current, 'job', None)
+
+
+def _run_failure_hook(options, job):
+    if options['on_failure']:
+        try:
+            options['on_failure'](**job['payload'])
+        except Exception as hook_error:
+            logger.error(f"on_failure hook for job {job['job_id']} raised: {hook_error}")
+
+
+def _lost_lease(job):
+    logger.warning(f"Job {job['job_id']} ({job['task_name']}): the lease of {job['locked_by']} expired and the job "
+                   f"was reclaimed, so this attempt's outcome is discarded.")
+
+
+def run_job(queue, job):
+    """Executes a claimed job and records the outcome, scheduling a retry when allowed."""
+    options = get_task(job['task_name'])
+    if job.get('lease_expired'):
+        # Already marked as failed by claim(): the worker running the last attempt died.
+        logger.error(f"Job {job['job_id']} ({job['task_name']}) failed permanently: {job['last_error']}")
+        _run_failure_hook(options, job)
+        return False
+    _current.job = job
+    worker_id = job['locked_by']
+    try:
+        with attribute_to(f"job:{job['task_name']}"):
+            options['func'](**job['payload'])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if job['attempts'] < job['max_attempts']:
+            delay = options['retry_backoff'] * (2 ** (job['attempts'] - 1))
+            logger.warning(f"Job {job['job_id']} ({job['task_name']}) attempt {job['attempts']} failed: {error}. "
+                           f"Retrying in {delay:.0f}s.")
+            if not queue.retry(job['job_id'], worker_id, error, delay):
+                _lost_lease(job)
+        else:
+            logger.error(f"Job {job['job_id']} ({job['task_name']}) failed permanently: {error}\n"
+                         f"{traceback.format_exc()}")
+            if queue.fail(job['job_id'], worker_id, error):
+                _run_failure_hook(options, job)
+            else:
+                _lost_lease(job)
+        return False
+    finally:
+        _current.job = None
+    if not queue.complete(job['job_id'], worker_id):
+        _lost_lease(job)
+        return False
+    return True
+
+
+def _run_callbacks(callbacks):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Periodic callback {callback.__module__}.{callback.__name__} raised: {e}")
+
+
+def _run_periodically(callbacks, interval, stop):
+    while not stop.wait(interval):
+        _run_callbacks(callbacks)
+
+
+def run_worker(poll_interval=1.0, once=False):
+    """
+    Processes jobs until interrupted. With `once=True` the worker drains the
+    currently runnable jobs and returns the number it processed.
+
+    JOB_QUEUE['PERIODIC_CALLBACKS'] (such as the email outbox drain) run on a
+    separate thread every PERIODIC_INTERVAL seconds, so they keep running while
+    the worker is busy with jobs; with `once=True` they run once at the end.
+    """
+    queue = get_queue()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    logger.info(f"Job worker {worker_id} started at {datetime.now(timezone.utc).isoformat()}")
+    config = settings.JOB_QUEUE
+    callbacks = [import_string(path) for path in config.get('PERIODIC_CALLBACKS', [])]
+    stop = threading.Event()
+    if callbacks and not once:
+        threading.Thread(
+            target=_run_periodically, args=(callbacks, config.get('PERIODIC_INTERVAL', 5), stop),
+            name='job-worker-callbacks', daemon=True
+        ).start()
+    try:
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                if once:
+                    _run_callbacks(callbacks)
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            run_job(queue, job)
+            processed += 1
+    finally:
+        stop.set()
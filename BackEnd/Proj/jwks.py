@@ -0,0 +1,139 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSUnavailable(Exception):
+    """Raised when no keys are available and they cannot be fetched."""
+
+
+class JWKSProvider:
+    """
+    Serves the JSON Web Key Set used to verify Cognito tokens.
+
+    - Refreshes are single-flight: at most one fetch runs at a time and
+      concurrent callers that need fresh keys wait for it.
+    - Keys are refreshed in a background thread once they are within
+      `refresh_ahead` seconds of `ttl`; until then, and if the refresh
+      fails, the current (stale) keys keep being served.
+    - A token with an unknown kid triggers an immediate refresh (key
+      rotation), at most once per `min_refresh_interval` seconds.
+    - HTTP fetches reuse one pooled requests.Session. `url` may also be a
+      file:// URL or a local path, for offline use.
+    """
+
+    def __init__(self, url, ttl=3600, refresh_ahead=300, timeout=5, min_refresh_interval=30):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.timeout = timeout
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refresh_lock = threading.Lock()
+        self._background = None
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.stats = {'fetches': 0, 'fetch_errors': 0, 'stale_served': 0, 'unknown_kid_refreshes': 0}
+
+    def _load(self):
+        parsed = urlparse(self.url)
+        if parsed.scheme in ('http', 'https'):
+            response = self._session.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            document = response.json()
+        else:
+            path = parsed.path if parsed.scheme == 'file' else self.url
+            document = json.loads(Path(path).read_text())
+        return {key['kid']: key for key in document['keys']}
+
+    def refresh(self, wait=True):
+        """
+        Fetches the key set unless another thread already is. With `wait`, a
+        caller that finds a refresh in progress blocks until it has finished.
+        Returns True if this call fetched successfully.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            if wait:
+                with self._refresh_lock:
+                    pass
+            return False
+        try:
+            self._last_attempt = time.monotonic()
+            self.stats['fetches'] += 1
+            keys = self._load()
+            self._keys, self._fetched_at = keys, time.monotonic()
+            logger.info(f"Fetched {len(keys)} JWKS key(s) from {self.url}")
+            return True
+        except (requests.exceptions.RequestException, OSError, ValueError, KeyError, TypeError) as e:
+            self.stats['fetch_errors'] += 1
+            logger.error(f"Error fetching JWKS from {self.url}: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_in_background(self):
+        if self._background is not None and self._background.is_alive():
+            return
+        if time.monotonic() - self._last_attempt < self.min_refresh_interval:
+            return
+        self._background = threading.Thread(target=self.refresh, kwargs={'wait': False}, daemon=True)
+        self._background.start()
+
+    def get_keys(self):
+        """Returns {kid: jwk}. Only blocks when no keys have been loaded yet."""
+        if not self._keys:
+            self.refresh()
+            if not self._keys:
+                raise JWKSUnavailable(f"Could not fetch public keys from {self.url}.")
+            return self._keys
+        age = time.monotonic() - self._fetched_at
+        if age >= self.ttl - self.refresh_ahead:
+            if age >= self.ttl:
+                self.stats['stale_served'] += 1
+            self._refresh_in_background()
+        return self._keys
+
+    def get_key(self, kid):
+        """Returns the JWK for `kid`, refreshing once if it is not known (key rotation)."""
+        key = self.get_keys().get(kid)
+        if key is None and time.monotonic() - self._last_attempt >= self.min_refresh_interval:
+            self.stats['unknown_kid_refreshes'] += 1
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_jwks_provider():
+    """Process-wide provider for settings.COGNITO_JWKS_URL (or the user pool's JWKS URL)."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                url = settings.COGNITO_JWKS_URL or (
+                    f"https://cognito-idp.{settings.COGNITO_REGION}.amazonaws.com/"
+                    f"{settings.COGNITO_USER_POOL_ID}/.well-known/jwks.json"
+                )
+                _provider = JWKSProvider(
+                    url,
+                    ttl=settings.COGNITO_JWKS_TTL,
+                    refresh_ahead=settings.COGNITO_JWKS_REFRESH_AHEAD,
+                    timeout=settings.COGNITO_JWKS_TIMEOUT,
+                    min_refresh_interval=settings.COGNITO_JWKS_MIN_REFRESH_INTERVAL,
+                )
+    return _provider
@@ -0,0 +1,122 @@
+import logging
+from datetime import datetime
+
+from .catalog_cache import get_catalog_cache
+from .models import LeaderboardEntryModel, ProjectModel, SubmissionModel
+from .pagination import check_start_key
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BOARD = 'GLOBAL'
+
+
+def entry_id_for(project_id, student_username):
+    return f"{project_id}#{student_username}"
+
+
+def record_score(submission, project_title=None):
+    """
+    Puts the finalized score of `submission` on the leaderboard. Only the
+    student's latest submission is ranked, so older versions are ignored.
+    """
+    if not submission.is_latest or submission.overall_score is None:
+        return
+    if project_title is None:
+        project = get_catalog_cache().get_project(submission.project_id)
+        project_title = project.title if project else None
+    LeaderboardEntryModel(
+        entry_id=entry_id_for(submission.project_id, submission.student_username),
+        board=GLOBAL_BOARD,
+        project_id=submission.project_id,
+        project_title=project_title,
+        student_username=submission.student_username,
+        submission_id=submission.submission_id,
+        total_points=submission.overall_score,
+        updated_at=datetime.utcnow(),
+    ).save()
+
+
+def rename_project(project_id, title):
+    """Keeps the denormalized project title on the project's entries in sync."""
+    for entry in LeaderboardEntryModel.project_score_index.query(project_id):
+        entry.update(actions=[LeaderboardEntryModel.project_title.set(title)])
+
+
+def query_leaderboard(project_id=None, limit=100, last_evaluated_key=None):
+    """
+    Returns one page of the global or per-project leaderboard, highest score first.
+
+    Returns:
+        tuple: (list of LeaderboardEntryModel, last_evaluated_key for the next page or None)
+
+    Raises:
+        ValidationError: `last_evaluated_key` is not a position on this leaderboard.
+    """
+    if project_id:
+        index, hash_key = LeaderboardEntryModel.project_score_index, project_id
+    else:
+        index, hash_key = LeaderboardEntryModel.global_score_index, GLOBAL_BOARD
+    results = index.query(
+        hash_key,
+        scan_index_forward=False,
+        limit=limit,
+        page_size=limit,
+        last_evaluated_key=check_start_key(last_evaluated_key, index, hash_key),
+    )
+    entries = list(results)
+    return entries, (results.last_evaluated_key if len(entries) == limit else None)
+
+
+def to_representation(entry):
+    return {
+        'student_username': entry.student_username,
+        'project_id': entry.project_id,
+        'project_title': entry.project_title or 'N/A',
+        'total_points': entry.total_points,
+        'submission_id': entry.submission_id,
+    }
+
+
+def rebuild_leaderboard(project_id=None):
+    """
+    Recomputes leaderboard entries from the submissions table (backfill/repair).
+    Scans the submissions table, so this is meant for the management command only.
+
+    Returns:
+        dict: Number of entries written and stale entries removed.
+    """
+    condition = SubmissionModel.overall_score.exists() & (SubmissionModel.is_latest == True)
+    if project_id:
+        condition = condition & (SubmissionModel.project_id == project_id)
+    submissions = list(SubmissionModel.scan(condition))
+
+    project_ids = {s.project_id for s in submissions}
+    titles = {p.project_id: p.title for p in ProjectModel.batch_get(project_ids)} if project_ids else {}
+
+    now = datetime.utcnow()
+    wanted = set()
+    with LeaderboardEntryModel.batch_write() as batch:
+        for s in submissions:
+            entry_id = entry_id_for(s.project_id, s.student_username)
+            wanted.add(entry_id)
+            batch.save(LeaderboardEntryModel(
+                entry_id=entry_id,
+                board=GLOBAL_BOARD,
+                project_id=s.project_id,
+                project_title=titles.get(s.project_id),
+                student_username=s.student_username,
+                submission_id=s.submission_id,
+                total_points=s.overall_score,
+                updated_at=now,
+            ))
+
+    if project_id:
+        existing = LeaderboardEntryModel.project_score_index.query(project_id)
+    else:
+        existing = LeaderboardEntryModel.scan()
+    stale = [e for e in existing if e.entry_id not in wanted]
+    with LeaderboardEntryModel.batch_write() as batch:
+        for entry in stale:
+            batch.delete(entry)
+    logger.info(f"Leaderboard rebuilt: {len(wanted)} entries written, {len(stale)} removed")
+    return {'written': len(wanted), 'removed': len(stale)}
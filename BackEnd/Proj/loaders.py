@@ -0,0 +1,102 @@
+from rest_framework.exceptions import NotFound
+
+from .catalog_cache import cached_fetcher
+
+BATCH_GET_LIMIT = 100
+
+
+class ModelLoader:
+    """
+    Loads items of one PynamoDB model by hash key for the duration of a request.
+
+    Keys requested with `prime_keys` are collected and fetched together with the
+    next `load`/`load_many`, deduplicated and in BatchGetItem calls of up to 100
+    keys. Every item (and every miss) is kept in an identity map, so the same key
+    is never fetched twice in one request. `fetch`, when given, replaces the
+    GetItem of a single `load` (e.g. to read through Proj/catalog_cache.py).
+    """
+
+    def __init__(self, model, fetch=None):
+        self.model = model
+        self.fetch = fetch
+        self._items = {}  # hash key -> item, or None when the item does not exist
+        self._pending = set()
+
+    def prime_keys(self, keys):
+        """Queues keys to be fetched with the next load."""
+        self._pending.update(k for k in keys if k and k not in self._items)
+
+    def prime(self, item):
+        """Adds an item already read (or just written) to the identity map."""
+        self._items[self._key_of(item)] = item
+        return item
+
+    def _key_of(self, item):
+        return getattr(item, self.model._hash_keyname)
+
+    def clear(self, key):
+        self._items.pop(key, None)
+
+    def _dispatch(self):
+        keys = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            chunk = keys[start:start + BATCH_GET_LIMIT]
+            found = {self._key_of(item): item for item in self.model.batch_get(chunk)}
+            for key in chunk:
+                self._items[key] = found.get(key)
+
+    def load_many(self, keys):
+        """Returns {key: item} for the keys that exist."""
+        keys = [k for k in keys if k]
+        self.prime_keys(keys)
+        if self._pending:
+            self._dispatch()
+        return {k: self._items[k] for k in keys if self._items.get(k) is not None}
+
+    def load(self, key):
+        """Returns the item with hash key `key`, or None if it does not exist."""
+        if not key:
+            return None
+        if key not in self._items and not self._pending:
+            if self.fetch is not None:
+                self._items[key] = self.fetch(key)
+                return self._items[key]
+            # A single key is cheaper as a GetItem.
+            try:
+                self._items[key] = self.model.get(key)
+            except self.model.DoesNotExist:
+                self._items[key] = None
+            return self._items[key]
+        return self.load_many([key]).get(key)
+
+    def load_or_404(self, key, detail="Not found."):
+        item = self.load(key)
+        if item is None:
+            raise NotFound(detail=detail)
+        return item
+
+
+class RequestLoaders:
+    """One ModelLoader per model, created on first use."""
+
+    def __init__(self):
+        self._loaders = {}
+
+    def __getitem__(self, model):
+        loader = self._loaders.get(model)
+        if loader is None:
+            loader = self._loaders[model] = ModelLoader(model, fetch=cached_fetcher(model))
+        return loader
+
+
+def get_loaders(request):
+    """
+    Returns the loaders attached to `request`, creating them on first use.
+    Stored on the underlying HttpRequest so DRF's Request wrapper shares them.
+    """
+    http_request = getattr(request, '_request', request)
+    loaders = getattr(http_request, 'pynamodb_loaders', None)
+    if loaders is None:
+        loaders = http_request.pynamodb_loaders = RequestLoaders()
+    return loaders
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from Proj.batch_evaluation import run_batch_evaluation
+
+
+class Command(BaseCommand):
+    help = "Runs the AI evaluation for the latest submission of every student in a project."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id')
+        parser.add_argument('--concurrency', type=int, help="Submissions evaluated at the same time.")
+        parser.add_argument('--rate', type=float, help="Maximum model calls per second.")
+        parser.add_argument(
+            '--evaluator',
+            help="Dotted path of a get_ai_evaluation replacement, e.g. a local fake model for benchmarks."
+        )
+
+    def handle(self, *args, **options):
+        def show(progress):
+            self.stdout.write(
+                f"\r{progress['processed']}/{progress['total']} processed "
+                f"({progress['evaluated']} evaluated, {progress['skipped']} skipped, {progress['failed']} failed)",
+                ending=''
+            )
+
+        progress = run_batch_evaluation(
+            options['project_id'],
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            evaluate=import_string(options['evaluator']) if options['evaluator'] else None,
+            on_progress=show
+        )
+        self.stdout.write('')
+        for key, error in progress['errors'].items():
+            self.stderr.write(f"{key}: {error}")
@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Proj.benchmarks.fixtures import local_environment, seed
+from Proj.benchmarks.suite import (
+    BenchmarkError, compare, load_results, registered, results_document, run_benchmark, save_results
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the offline benchmark suite (PDF extraction, authentication, serialization, "
+        "AI prompt construction and every view against an in-memory DynamoDB), writes the "
+        "results as JSON and compares them with the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', action='append', default=[], metavar='TEXT',
+                            help="Only run benchmarks whose name contains TEXT (repeatable).")
+        parser.add_argument('--list', action='store_true', help="List the benchmarks and exit.")
+        parser.add_argument('--repeat', type=int, default=30, help="Timed runs per benchmark.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed runs before timing.")
+        parser.add_argument('--quick', action='store_true',
+                            help="Fewer runs and a smaller dataset, for a fast smoke check.")
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'benchmark_results.json'),
+                            help="Where to write the results.")
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmark_baseline.json'),
+                            help="Results file to compare against (skipped if it does not exist).")
+        parser.add_argument('--save-baseline', action='store_true', help="Also store the results as the baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed slowdown of a median before it counts as a regression (0.2 = 20%%).")
+        parser.add_argument('--no-fail', action='store_true', help="Report regressions without failing.")
+
+    def handle(self, *args, **options):
+        entries = registered(options['filter'])
+        if options['list']:
+            for entry in entries:
+                self.stdout.write(entry['name'])
+            return
+        if not entries:
+            raise CommandError("No benchmark matches the filter.")
+
+        quick = options['quick']
+        repeat = 5 if quick else options['repeat']
+        warmup = 1 if quick else options['warmup']
+        results = {}
+        with local_environment() as environment:
+            started = time.perf_counter()
+            data = seed(projects=3, students=20) if quick else seed()
+            self.stdout.write(f"Seeded the in-memory DynamoDB in {time.perf_counter() - started:.1f}s")
+            for entry in entries:
+                try:
+                    results[entry['name']] = run_benchmark(entry, environment, data, repeat, warmup, quick=quick)
+                except BenchmarkError as e:
+                    raise CommandError(f"{entry['name']}: {e}")
+                result = results[entry['name']]
+                self.stdout.write(
+                    f"{entry['name']:<36} median {result['median_ms']:>10.3f} ms  "
+                    f"p95 {result['p95_ms']:>10.3f} ms  ({result['runs']} runs)"
+                )
+
+        document = results_document(results, repeat, warmup, quick)
+        save_results(options['output'], document)
+        self.stdout.write(f"Results written to {options['output']}")
+        if options['save_baseline']:
+            save_results(options['baseline'], document)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write("No baseline to compare with; store one with --save-baseline.")
+            return
+
+        baseline = load_results(options['baseline'])
+        if baseline['settings'].get('quick') != quick:
+            self.stdout.write(self.style.WARNING("The baseline was recorded with a different --quick setting."))
+        rows = compare(baseline, document, options['tolerance'])
+        styles = {'regressed': self.style.ERROR, 'improved': self.style.SUCCESS}
+        for row in rows:
+            if row['change'] is None:
+                line = f"{row['name']:<36} {row['status']}"
+            else:
+                line = (f"{row['name']:<36} {row['baseline_ms']:>10.3f} -> {row['current_ms']:>10.3f} ms "
+                        f"({row['change']:+.1%}) {row['status']}")
+            self.stdout.write(styles.get(row['status'], str)(line))
+        regressions = [row['name'] for row in rows if row['status'] == 'regressed']
+        if regressions and not options['no_fail']:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed by more than {options['tolerance']:.0%}: "
+                               f"{', '.join(regressions)}")
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Proj.outbox import get_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends the due emails in the outbox (the job worker also does this when idle)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true', help="Keep draining until interrupted.")
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds between drains with --watch.")
+
+    def handle(self, *args, **options):
+        outbox = get_outbox()
+        batch_size = settings.EMAIL_OUTBOX.get('BATCH_SIZE', 50)
+        while True:
+            result = outbox.drain(limit=batch_size)
+            if not options['watch'] and (sum(result.values()) < batch_size or result['deferred']):
+                break
+            if options['watch']:
+                time.sleep(options['poll_interval'])
+        self.stdout.write(f"Outbox: {outbox.counts()}")
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Proj.benchmarks.fixtures import local_environment, seed
+from Proj.benchmarks.load import (
+    DEFAULT_MIX, OPERATIONS, LoadHarness, build_state, load_state, save_state, serve
+)
+
+
+def parse_mix(value):
+    """'submit=0.5,leaderboard=0.3' -> DEFAULT_MIX with those weights replaced."""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(',')):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise CommandError(f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}.")
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid weight in '{part}'.")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays deadline-surge traffic (student submissions, faculty evaluation, leaderboard) "
+        "at increasing concurrency and reports throughput, p50/p95/p99 latency per endpoint and "
+        "error and throttle rates. By default ProjectFlow is started in this process on an "
+        "in-memory DynamoDB, a local JWKS issuer and the LocalBackend evaluator."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,4,16,32,64',
+                            help="Comma-separated numbers of virtual users, one step each.")
+        parser.add_argument('--duration', type=float, default=20.0, help="Seconds per step.")
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help="Mean pause of a virtual user between requests, in seconds.")
+        parser.add_argument('--mix', default='', help=f"Operation weights, e.g. submit=0.5,leaderboard=0.3 "
+                                                      f"(operations: {', '.join(OPERATIONS)}).")
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'loadtest_results.json'))
+
+        target = parser.add_argument_group('target')
+        target.add_argument('--url', help="Drive an instance started with --serve instead of starting one.")
+        target.add_argument('--state', default=os.path.join(settings.BASE_DIR, 'loadtest_state.json'),
+                            help="Tokens and seeded ids; written by --serve, read with --url.")
+        target.add_argument('--serve', action='store_true',
+                            help="Only start the instance under test and wait (drive it with --url).")
+        target.add_argument('--host', default='127.0.0.1')
+        target.add_argument('--port', type=int, default=0, help="Port to serve on (default: any free port).")
+        target.add_argument('--server-threads', type=int, default=8, help="Request threads of the served instance.")
+
+        stand_ins = parser.add_argument_group('local stand-ins (when serving)')
+        stand_ins.add_argument('--dynamodb-local', action='store_true',
+                               help="Use the DynamoDB at DYNAMODB_HOST (tables created by Proj/create_tables.py) "
+                                    "instead of the in-memory fake.")
+        stand_ins.add_argument('--dynamodb-latency', type=float, default=0.003,
+                               help="Seconds added to every call to the in-memory DynamoDB.")
+        stand_ins.add_argument('--dynamodb-capacity', default='',
+                               help="READ,WRITE capacity units per second per table; beyond it calls are throttled.")
+        stand_ins.add_argument('--llm-latency', type=float, default=2.0, help="Seconds per LLM call.")
+        stand_ins.add_argument('--llm-jitter', type=float, default=1.0, help="Extra random LLM delay, up to seconds.")
+        stand_ins.add_argument('--llm-failure-rate', type=float, default=0.0)
+        stand_ins.add_argument('--projects', type=int, default=5)
+        stand_ins.add_argument('--students', type=int, default=100, help="Students with an earlier submission.")
+        stand_ins.add_argument('--new-students', type=int, default=3000,
+                               help="Students who have not submitted yet (each submits up to 3 times).")
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        mix = parse_mix(options['mix'])
+        if options['url']:
+            if not os.path.exists(options['state']):
+                raise CommandError(f"State file {options['state']} not found; start the server with --serve first.")
+            self.drive(options['url'], load_state(options['state']), levels, mix, options)
+            return
+
+        capacity = None
+        if options['dynamodb_capacity']:
+            try:
+                read, write = (float(units) for units in options['dynamodb_capacity'].split(','))
+            except ValueError:
+                raise CommandError("--dynamodb-capacity takes READ,WRITE.")
+            capacity = (read, write)
+        llm_options = {
+            'latency': options['llm_latency'],
+            'latency_jitter': options['llm_jitter'],
+            'failure_rate': options['llm_failure_rate'],
+        }
+        if options['verbosity'] < 2:
+            # Failed requests and throttled calls are counted in the report; logging each would flood the output.
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+            logging.getLogger('Proj.dynamodb_metrics').setLevel(logging.ERROR)
+        allowed_hosts = ['testserver', 'localhost', '127.0.0.1', options['host']]
+        dynamodb_options = {'latency': options['dynamodb_latency']}
+        with local_environment(llm_options, dynamodb_options, fake_dynamodb=not options['dynamodb_local'],
+                               ALLOWED_HOSTS=allowed_hosts) as env:
+            started = time.perf_counter()
+            data = seed(projects=options['projects'], students=options['students'])
+            state = build_state(env, data, new_students=options['new_students'])
+            self.stdout.write(f"Seeded {len(data.submissions)} submissions in {time.perf_counter() - started:.1f}s")
+            if capacity and env.dynamodb:
+                # Provisioned only now, so seeding is not throttled.
+                env.dynamodb.set_capacity(capacity, burst_seconds=5)
+            server, url = serve(options['host'], options['port'], options['server_threads'])
+            self.stdout.write(f"ProjectFlow listening on {url} ({options['server_threads']} threads)")
+            try:
+                if options['serve']:
+                    save_state(options['state'], state)
+                    self.stdout.write(f"State written to {options['state']}; drive with --url {url}. Ctrl-C to stop.")
+                    while True:
+                        time.sleep(3600)
+                else:
+                    self.drive(url, state, levels, mix, options)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    def drive(self, url, state, levels, mix, options):
+        harness = LoadHarness(url, state, mix=mix, think_time=options['think_time'])
+        self.stdout.write(f"Driving {url}: {options['duration']:.0f}s per step at concurrency {levels}")
+        results = harness.run(levels, options['duration'], on_step=self.write_step)
+        saturation = results['saturation']
+        if saturation:
+            self.stdout.write(self.style.WARNING(
+                f"Saturated at concurrency {saturation['concurrency']}: {saturation['reason']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Throughput kept scaling at every step."))
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def write_step(self, step):
+        dynamodb = step.get('dynamodb') or {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nConcurrency {step['concurrency']}: {step['throughput']} req/s, "
+            f"p50 {step.get('p50_ms')} / p95 {step.get('p95_ms')} / p99 {step.get('p99_ms')} ms, "
+            f"errors {step['error_rate'] or 0:.2%}, DynamoDB throttled {dynamodb.get('throttle_rate') or 0:.2%}"
+        ))
+        for endpoint, stats in step['endpoints'].items():
+            self.stdout.write(
+                f"  {endpoint:<52} {stats['requests']:>6} req {stats['throughput']:>8.2f}/s  "
+                f"p50 {stats['p50_ms']:>8.1f}  p95 {stats['p95_ms']:>8.1f}  p99 {stats['p99_ms']:>8.1f} ms  "
+                f"errors {stats['error_rate']:.2%}"
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from Proj.evaluations import migrate_legacy_ids
+
+
+class Command(BaseCommand):
+    help = "Moves evaluations stored under random ids to their deterministic <submission_id>#<rubric_id> key."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        result = migrate_legacy_ids(dry_run=options['dry_run'])
+        prefix = "Would write" if options['dry_run'] else "Wrote"
+        self.stdout.write(f"{prefix} {result['written']} keyed evaluation(s), replacing {result['deleted']} legacy item(s).")
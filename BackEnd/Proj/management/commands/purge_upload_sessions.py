@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Proj.uploads import purge_stale_sessions
+
+
+class Command(BaseCommand):
+    help = "Deletes abandoned chunked upload sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours', type=int, default=settings.UPLOAD_SESSION_MAX_AGE_HOURS,
+            help="Remove sessions older than this many hours."
+        )
+
+    def handle(self, *args, **options):
+        removed = purge_stale_sessions(options['max_age_hours'] * 3600)
+        self.stdout.write(f"Removed {removed} stale upload session(s).")
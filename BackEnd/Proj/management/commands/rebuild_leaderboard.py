@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Proj.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized leaderboard from the submissions table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project-id', help="Only rebuild the entries of this project.")
+
+    def handle(self, *args, **options):
+        result = rebuild_leaderboard(options['project_id'])
+        self.stdout.write(f"Wrote {result['written']} leaderboard entries, removed {result['removed']} stale ones.")
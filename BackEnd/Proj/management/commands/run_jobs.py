@@ -0,0 +1,44 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+
+from Proj.jobs import run_worker, get_queue
+
+
+def _worker_main(poll_interval):
+    import django
+    django.setup()
+    run_worker(poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Runs background job workers (PDF extraction, notifications)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes to start.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is idle.")
+        parser.add_argument('--once', action='store_true', help="Process the runnable jobs and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = run_worker(once=True)
+            self.stdout.write(f"Processed {processed} job(s). Queue: {get_queue().counts()}")
+            return
+
+        if options['processes'] <= 1:
+            run_worker(poll_interval=options['poll_interval'])
+            return
+
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(options['poll_interval'],))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} job worker(s).")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,317 @@
+import contextvars
+import functools
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Route label for phases timed outside a request (job workers, management commands).
+BACKGROUND = 'background'
+
+
+class LatencyHistogram:
+    """Bucketed latency histogram (the last bucket is +Inf). Not thread-safe; callers lock."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (None above the last bound)."""
+        if not self.count:
+            return None
+        rank, seen = q / 100 * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.sum / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.counts)),
+        }
+
+
+class HistogramFamily:
+    """Histograms keyed by a tuple of label values."""
+
+    def __init__(self, label_names):
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, labels, value_ms):
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = LatencyHistogram()
+            histogram.observe(value_ms)
+
+    def prometheus_lines(self, name):
+        with self._lock:
+            items = [(labels, list(h.counts), h.count, h.sum) for labels, h in self._histograms.items()]
+        for labels, counts, count, total in sorted(items):
+            base = dict(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip([*LATENCY_BUCKETS_MS, None], counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound is None else repr(bound / 1000)
+                yield _sample(f"{name}_bucket", {**base, 'le': le}, cumulative)
+            yield _sample(f"{name}_sum", base, round(total / 1000, 6))
+            yield _sample(f"{name}_count", base, count)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+request_durations = HistogramFamily(('method', 'route', 'status'))
+phase_durations = HistogramFamily(('phase', 'route'))
+
+# {phase: [total_ms, count]} for the request being handled in this context.
+_timings = contextvars.ContextVar('request_phase_timings', default=None)
+_timings_lock = threading.Lock()
+
+
+def record_phase(name, duration_ms):
+    """Adds `duration_ms` to phase `name` of the current request, or to the background totals."""
+    timings = _timings.get()
+    if timings is None:
+        phase_durations.observe((name, BACKGROUND), duration_ms)
+        return
+    # Async views make independent calls of one request concurrently, from several threads.
+    with _timings_lock:
+        entry = timings.get(name)
+        if entry is None:
+            timings[name] = [duration_ms, 1]
+        else:
+            entry[0] += duration_ms
+            entry[1] += 1
+
+
+@contextmanager
+def phase(name):
+    """Times the block as phase `name` (see record_phase)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name):
+    """Decorator form of `phase`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return f"/{match.route}" if match else '(unresolved)'
+
+
+class PhaseTimingMiddleware:
+    """
+    Times each request and its named phases (auth, dynamodb, pdf, ml, email, ...).
+
+    Adds a Server-Timing header (when settings.SERVER_TIMING_HEADER is on) and
+    feeds the per-route histograms served by `metrics_view`. The per-request
+    cost is a few perf_counter calls and dict updates.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def finish(self, request, response, timings, started):
+        total_ms = (time.perf_counter() - started) * 1000
+
+        route = _route(request)
+        request_durations.observe((request.method, route, f"{response.status_code // 100}xx"), total_ms)
+        for name, (duration_ms, _) in timings.items():
+            phase_durations.observe((name, route), duration_ms)
+
+        if settings.SERVER_TIMING_HEADER:
+            entries = [
+                f'{name};dur={duration_ms:.1f}' + (f';desc="{count} calls"' if count > 1 else '')
+                for name, (duration_ms, count) in timings.items()
+            ]
+            # Time not covered by a named phase: view code, serialization, middleware.
+            app_ms = total_ms - sum(duration_ms for duration_ms, _ in timings.values())
+            entries.append(f'app;dur={max(app_ms, 0):.1f}')
+            entries.append(f'total;dur={total_ms:.1f}')
+            response['Server-Timing'] = ', '.join(entries)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value):
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+
+_collectors = []
+
+
+def register_collector(func):
+    """
+    Registers a function returning (name, type, help, [(labels, value), ...])
+    tuples, called on every scrape. Usable as a decorator.
+    """
+    _collectors.append(func)
+    return func
+
+
+@register_collector
+def _dynamodb_collector():
+    from .dynamodb_metrics import dynamodb_stats
+    operations = dynamodb_stats.snapshot()['operations']
+    labels = [{'model': op['model'], 'operation': op['operation']} for op in operations]
+    return [
+        ('projectflow_dynamodb_calls_total', 'counter', 'DynamoDB calls.',
+         [(label, op['calls']) for label, op in zip(labels, operations)]),
+        ('projectflow_dynamodb_consumed_capacity_total', 'counter', 'DynamoDB capacity units consumed.',
+         [(label, op['capacity_units']) for label, op in zip(labels, operations)]),
+        ('projectflow_dynamodb_throttled_total', 'counter', 'Throttled DynamoDB attempts.',
+         [(label, op['throttled']) for label, op in zip(labels, operations)]),
+        ('projectflow_dynamodb_errors_total', 'counter', 'DynamoDB calls that raised.',
+         [(label, op['errors']) for label, op in zip(labels, operations)]),
+    ]
+
+
+@register_collector
+def _auth_collector():
+    from .authentication import verified_tokens
+    stats = verified_tokens.stats()
+    return [
+        ('projectflow_token_cache_hits_total', 'counter', 'Verified-token cache hits.', [({}, stats['hits'])]),
+        ('projectflow_token_cache_misses_total', 'counter', 'Verified-token cache misses.', [({}, stats['misses'])]),
+    ]
+
+
+@register_collector
+def _catalog_collector():
+    from .catalog_cache import get_catalog_cache
+    caches = get_catalog_cache().stats()
+    return [
+        ('projectflow_catalog_cache_hits_total', 'counter', 'Project and rubric-set cache hits.',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('projectflow_catalog_cache_misses_total', 'counter', 'Project and rubric-set cache misses.',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('projectflow_catalog_cache_stale_total', 'counter', 'Cache entries dropped because another write bumped their version.',
+         [({'cache': name}, stats['stale']) for name, stats in caches.items()]),
+        ('projectflow_catalog_cache_hit_ratio', 'gauge', 'Hits per lookup since the process started.',
+         [({'cache': name}, stats['hit_ratio'] or 0) for name, stats in caches.items()]),
+        ('projectflow_catalog_cache_entries', 'gauge', 'Entries held by the cache.',
+         [({'cache': name}, stats['entries']) for name, stats in caches.items()]),
+    ]
+
+
+@register_collector
+def _queue_collector():
+    from .jobs import get_queue
+    from .outbox import get_outbox
+    return [
+        ('projectflow_jobs', 'gauge', 'Background jobs by status.',
+         [({'status': status}, count) for status, count in get_queue().counts().items()]),
+        ('projectflow_outbox_messages', 'gauge', 'Outbox emails by status.',
+         [({'status': status}, count) for status, count in get_outbox().counts().items()]),
+    ]
+
+
+def render_metrics():
+    """The process's metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP projectflow_request_duration_seconds Request latency by route.',
+        '# TYPE projectflow_request_duration_seconds histogram',
+        *request_durations.prometheus_lines('projectflow_request_duration_seconds'),
+        '# HELP projectflow_phase_duration_seconds Time per request spent in each phase, by route.',
+        '# TYPE projectflow_phase_duration_seconds histogram',
+        *phase_durations.prometheus_lines('projectflow_phase_duration_seconds'),
+    ]
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            logger.error(f"Metrics collector {collector.__name__} failed: {e}")
+            continue
+        for name, metric_type, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(_sample(name, labels, value) for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>`
+    when METRICS_TOKEN is set; otherwise only METRICS_ALLOWED_IPS may scrape.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            return HttpResponseForbidden()
+    elif request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
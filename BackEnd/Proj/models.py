@@ -24,8 +24,13 @@ class ISODateAttribute(UnicodeAttribute):
 class BaseMeta:
     # Common Meta attributes for all PynamoDB models
     region = settings.DYNAMODB_REGION
+    host = settings.DYNAMODB_HOST
     aws_access_key_id = settings.AWS_ACCESS_KEY_ID
     aws_secret_access_key = settings.AWS_SECRET_ACCESS_KEY
+    max_pool_connections = settings.DYNAMODB_MAX_POOL_CONNECTIONS
+    max_retry_attempts = settings.DYNAMODB_MAX_RETRY_ATTEMPTS
+    connect_timeout_seconds = settings.DYNAMODB_CONNECT_TIMEOUT_SECONDS
+    read_timeout_seconds = settings.DYNAMODB_READ_TIMEOUT_SECONDS
     # You can set default read/write capacity here for the main table,
     # but GSIs need their own explicit settings.
     read_capacity_units = 1
@@ -44,6 +49,26 @@ class UserProfileModel(Model):
 class ProjectModel(Model):
     class Meta(BaseMeta):
         table_name = settings.DYNAMODB_PROJECTS_TABLE
+
+    class OwnerIndex(GlobalSecondaryIndex):
+        class Meta(BaseMeta):
+            index_name = 'owner_index'
+            projection = AllProjection()
+            read_capacity_units = 1
+            write_capacity_units = 1
+        created_by_username = UnicodeAttribute(hash_key=True)
+        created_at = UTCDateTimeAttribute(range_key=True)
+
+    class ActiveIndex(GlobalSecondaryIndex):
+        # Sparse index: only active projects carry active_partition, so inactive ones drop out.
+        class Meta(BaseMeta):
+            index_name = 'active_index'
+            projection = AllProjection()
+            read_capacity_units = 1
+            write_capacity_units = 1
+        active_partition = UnicodeAttribute(hash_key=True)
+        end_date = ISODateAttribute(range_key=True)
+
     project_id = UnicodeAttribute(hash_key=True, default=lambda: str(uuid4()))
     title = UnicodeAttribute()
     description = UnicodeAttribute()
@@ -51,8 +76,37 @@ class ProjectModel(Model):
     start_date = ISODateAttribute()
     end_date = ISODateAttribute()
     is_active = BooleanAttribute(default=True)
+    # Optional per-project upload limits; settings.UPLOAD_MAX_*_SIZE_MB apply when unset.
+    max_report_size_mb = NumberAttribute(null=True)
+    max_source_code_size_mb = NumberAttribute(null=True)
     created_at = UTCDateTimeAttribute(default=datetime.utcnow)
     updated_at = UTCDateTimeAttribute(default=datetime.utcnow)
+    # Set from is_active on save; see ActiveIndex.
+    active_partition = UnicodeAttribute(null=True)
+
+    owner_index = OwnerIndex()
+    active_index = ActiveIndex()
+
+    ACTIVE_PARTITION = 'ACTIVE'
+
+    def save(self, *args, **kwargs):
+        self.active_partition = self.ACTIVE_PARTITION if self.is_active else None
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def query_active(cls, open_on=None, **kwargs):
+        """
+        Active projects ordered by end_date. With `open_on` (a date), only the
+        projects accepting submissions that day: started and not past the deadline.
+        """
+        if open_on is None:
+            return cls.active_index.query(cls.ACTIVE_PARTITION, **kwargs)
+        return cls.active_index.query(
+            cls.ACTIVE_PARTITION,
+            cls.end_date >= open_on,
+            filter_condition=cls.start_date <= open_on,
+            **kwargs
+        )
 
 class SubmissionModel(Model):
     class Meta(BaseMeta):
@@ -85,9 +139,12 @@ class SubmissionModel(Model):
     
     report_file_path = UnicodeAttribute(null=True)
     report_content_summary = UnicodeAttribute(null=True)
+    report_sha256 = UnicodeAttribute(null=True)
     github_link = UnicodeAttribute(null=True)
     
     source_code_file_path = UnicodeAttribute(null=True)
+    # Email from the student's token at submission time, for notifications.
+    student_email = UnicodeAttribute(null=True)
     
     submitted_at = UTCDateTimeAttribute(default=datetime.utcnow)
     status = UnicodeAttribute(default='Submitted')
@@ -132,13 +189,79 @@ class EvaluationModel(Model):
             read_capacity_units = 1
             write_capacity_units = 1
         submission_id = UnicodeAttribute(hash_key=True)
-    evaluation_id = UnicodeAttribute(hash_key=True, default=lambda: str(uuid4()))
+    # Deterministic "<submission_id>#<rubric_id>" (see key_for), so an evaluation is upserted
+    # by key. Items written before this change have random ids; see migrate_evaluation_ids.
+    evaluation_id = UnicodeAttribute(hash_key=True)
     submission_id = UnicodeAttribute()
     rubric_id = UnicodeAttribute()
-    evaluated_by_username = UnicodeAttribute()
-    points_awarded = NumberAttribute()
+    # The manual fields are empty while a rubric only has an AI result (see Proj/ai_evaluation.py).
+    evaluated_by_username = UnicodeAttribute(null=True)
+    points_awarded = NumberAttribute(null=True)
     feedback = UnicodeAttribute(null=True)
     evaluated_at = UTCDateTimeAttribute(default=datetime.utcnow)
     ml_points_awarded = NumberAttribute(null=True)
     ml_feedback = UnicodeAttribute(null=True)
+    ml_input_hash = UnicodeAttribute(null=True)
+    ml_evaluated_at = UTCDateTimeAttribute(null=True)
     submission_index = SubmissionIndex() # Associate the index
+
+    @staticmethod
+    def key_for(submission_id, rubric_id):
+        return f"{submission_id}#{rubric_id}"
+
+class LeaderboardEntryModel(Model):
+    """
+    Materialized leaderboard: one item per (project, student) holding the score of the
+    student's latest evaluated submission. Maintained by Proj/leaderboard.py.
+    """
+    class Meta(BaseMeta):
+        table_name = settings.DYNAMODB_LEADERBOARD_TABLE
+
+    class GlobalScoreIndex(GlobalSecondaryIndex):
+        class Meta(BaseMeta):
+            index_name = 'global_score_index'
+            projection = AllProjection()
+            read_capacity_units = 1
+            write_capacity_units = 1
+        board = UnicodeAttribute(hash_key=True)
+        total_points = NumberAttribute(range_key=True)
+
+    class ProjectScoreIndex(GlobalSecondaryIndex):
+        class Meta(BaseMeta):
+            index_name = 'project_score_index'
+            projection = AllProjection()
+            read_capacity_units = 1
+            write_capacity_units = 1
+        project_id = UnicodeAttribute(hash_key=True)
+        total_points = NumberAttribute(range_key=True)
+
+    entry_id = UnicodeAttribute(hash_key=True)  # "<project_id>#<student_username>"
+    board = UnicodeAttribute(default='GLOBAL')
+    project_id = UnicodeAttribute()
+    project_title = UnicodeAttribute(null=True)
+    student_username = UnicodeAttribute()
+    submission_id = UnicodeAttribute()
+    total_points = NumberAttribute()
+    updated_at = UTCDateTimeAttribute(default=datetime.utcnow)
+
+    global_score_index = GlobalScoreIndex()
+    project_score_index = ProjectScoreIndex()
+
+
+class SubmissionCounterModel(Model):
+    """
+    One item per (project, student) tracking the latest submission version.
+    Updated in the same transaction as the submission it counts (Proj/versioning.py).
+    """
+    class Meta(BaseMeta):
+        table_name = settings.DYNAMODB_SUBMISSION_COUNTERS_TABLE
+    counter_id = UnicodeAttribute(hash_key=True)  # "<project_id>#<student_username>"
+    project_id = UnicodeAttribute()
+    student_username = UnicodeAttribute()
+    latest_version = NumberAttribute(default=0)
+    latest_submission_id = UnicodeAttribute(null=True)
+    updated_at = UTCDateTimeAttribute(default=datetime.utcnow)
+
+def get_transaction_connection():
+    """Connection for TransactWrite/TransactGet, configured from BaseMeta like the models."""
+    return EvaluationModel._get_connection().connection
@@ -0,0 +1,25 @@
+from .outbox import queue_email
+
+
+def submission_received(recipient_email, project_title, version):
+    queue_email(
+        recipient_email,
+        subject=f"Submission Confirmation (Attempt {version}): {project_title}",
+        body_text=f"Your submission (version {version}) for '{project_title}' has been received."
+    )
+
+
+def submission_evaluated(submission, project_title):
+    """
+    Tells the student their submission was graded. Digested per project, so
+    re-finalizing within the digest window sends one email with every update.
+    """
+    queue_email(
+        submission.student_email,
+        subject=f"Evaluation Finalized: {project_title}",
+        body_text=(
+            f"Your submission (version {submission.version}) for '{project_title}' has been evaluated.\n"
+            f"Final score: {submission.overall_score}"
+        ),
+        digest_key=f"evaluated:{submission.project_id}"
+    )
@@ -0,0 +1,308 @@
+import logging
+import os
+import sqlite3
+import time
+from email.message import EmailMessage
+from pathlib import Path
+from uuid import uuid4
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import phase
+from .utils import get_ses_client
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# SES error codes that mean "slow down" rather than "this message is bad".
+THROTTLING_CODES = {'Throttling', 'ThrottlingException', 'TooManyRequestsException', 'MaxSendRateExceeded'}
+
+
+class DeliveryError(Exception):
+    """The backend could not send a message."""
+
+
+class ThrottledError(DeliveryError):
+    """The provider is rate limiting us; back off before sending anything else."""
+
+
+class SESBackend:
+    """Sends through Amazon SES with the process-wide pooled client from Proj/utils.py."""
+
+    def __init__(self, source=None):
+        self.source = source or settings.AWS_SES_SOURCE_EMAIL
+
+    @property
+    def can_send(self):
+        """Without a verified sender every send fails, so nothing should be queued."""
+        return bool(self.source)
+
+    def send(self, recipient, subject, body_text, body_html=None):
+        if not self.source:
+            raise DeliveryError("AWS_SES_SOURCE_EMAIL is not configured.")
+        try:
+            response = get_ses_client().send_email(
+                Destination={'ToAddresses': [recipient]},
+                Message={
+                    'Body': {
+                        'Html': {'Charset': 'UTF-8', 'Data': body_html or body_text},
+                        'Text': {'Charset': 'UTF-8', 'Data': body_text},
+                    },
+                    'Subject': {'Charset': 'UTF-8', 'Data': subject},
+                },
+                Source=self.source,
+            )
+        except ClientError as e:
+            error = e.response.get('Error', {})
+            if error.get('Code') in THROTTLING_CODES:
+                raise ThrottledError(error.get('Message', 'Throttled'))
+            raise DeliveryError(error.get('Message', str(e)))
+        return response['MessageId']
+
+
+class FileBackend:
+    """Writes each message as an .eml file instead of sending it (local development and tests)."""
+
+    can_send = True
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.EMAIL_OUTBOX['FILE_PATH'])
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def send(self, recipient, subject, body_text, body_html=None):
+        message_id = str(uuid4())
+        message = EmailMessage()
+        message['To'] = recipient
+        message['From'] = settings.AWS_SES_SOURCE_EMAIL or 'projectflow@localhost'
+        message['Subject'] = subject
+        message['Message-ID'] = f"<{message_id}@projectflow.local>"
+        message.set_content(body_text)
+        if body_html:
+            message.add_alternative(body_html, subtype='html')
+        (self.directory / f"{int(time.time() * 1000)}-{message_id}.eml").write_bytes(bytes(message))
+        return message_id
+
+
+class EmailOutbox:
+    """
+    Durable email queue stored in a local SQLite database.
+
+    Messages with a `digest_key` are held for the digest window; everything
+    queued for the same recipient and key in that window goes out as one email.
+    A drain claims due messages with a lease, like the job queue, so several
+    workers can drain the same outbox.
+    """
+
+    def __init__(self, path, backend, digest_window=300, max_attempts=5, retry_backoff=30,
+                 max_backoff=3600, lease_seconds=120):
+        self.path = str(path)
+        self.backend = backend
+        self.digest_window = digest_window
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self._throttle_streak = 0  # consecutive throttled sends, for exponential backoff
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    message_id TEXT PRIMARY KEY,
+                    recipient TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body_text TEXT NOT NULL,
+                    body_html TEXT,
+                    digest_key TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    send_after REAL NOT NULL,
+                    locked_until REAL,
+                    last_error TEXT,
+                    provider_id TEXT,
+                    created_at REAL NOT NULL,
+                    sent_at REAL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS messages_due_idx ON messages (status, send_after)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, recipient, subject, body_text, body_html=None, digest_key=None):
+        message_id = str(uuid4())
+        now = time.time()
+        send_after = now + self.digest_window if digest_key else now
+        with self._connect() as conn:
+            if digest_key:
+                # Join a digest that is already waiting so the whole group goes out together.
+                row = conn.execute(
+                    'SELECT MIN(send_after) AS send_after FROM messages '
+                    'WHERE recipient = ? AND digest_key = ? AND status = ?',
+                    (recipient, digest_key, PENDING)
+                ).fetchone()
+                if row['send_after'] is not None:
+                    send_after = row['send_after']
+            conn.execute(
+                'INSERT INTO messages (message_id, recipient, subject, body_text, body_html, digest_key, status, '
+                'send_after, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (message_id, recipient, subject, body_text, body_html, digest_key, PENDING, send_after, now)
+            )
+        return message_id
+
+    def _claim(self, limit):
+        """Leases up to `limit` due message groups and returns their rows."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            due = conn.execute(
+                'SELECT DISTINCT recipient, digest_key FROM messages '
+                'WHERE (status = ? AND send_after <= ?) OR (status = ? AND locked_until < ?) '
+                'ORDER BY send_after LIMIT ?',
+                (PENDING, now, SENDING, now, limit)
+            ).fetchall()
+            rows = []
+            for group in due:
+                if group['digest_key'] is None:
+                    group_rows = conn.execute(
+                        'SELECT * FROM messages WHERE recipient = ? AND digest_key IS NULL AND '
+                        '((status = ? AND send_after <= ?) OR (status = ? AND locked_until < ?))',
+                        (group['recipient'], PENDING, now, SENDING, now)
+                    ).fetchall()
+                else:
+                    group_rows = conn.execute(
+                        'SELECT * FROM messages WHERE recipient = ? AND digest_key = ? AND '
+                        '(status = ? OR (status = ? AND locked_until < ?)) ORDER BY created_at',
+                        (group['recipient'], group['digest_key'], PENDING, SENDING, now)
+                    ).fetchall()
+                rows.extend(group_rows)
+            conn.executemany(
+                'UPDATE messages SET status = ?, locked_until = ? WHERE message_id = ?',
+                [(SENDING, now + self.lease_seconds, row['message_id']) for row in rows]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _compose(rows):
+        """Returns (subject, body_text, body_html) for one message or a digest of several."""
+        if len(rows) == 1:
+            row = rows[0]
+            return row['subject'], row['body_text'], row['body_html']
+        latest = rows[-1]
+        subject = f"{latest['subject']} (+{len(rows) - 1} earlier update{'s' if len(rows) > 2 else ''})"
+        body_text = '\n\n---\n\n'.join(row['body_text'] for row in reversed(rows))
+        return subject, body_text, None
+
+    def _mark(self, message_ids, status, **fields):
+        assignments = ', '.join(['status = ?', 'locked_until = NULL'] + [f"{name} = ?" for name in fields])
+        with self._connect() as conn:
+            conn.executemany(
+                f'UPDATE messages SET {assignments} WHERE message_id = ?',
+                [(status, *fields.values(), message_id) for message_id in message_ids]
+            )
+
+    def _backoff(self, attempts):
+        return min(self.retry_backoff * (2 ** max(attempts - 1, 0)), self.max_backoff)
+
+    def drain(self, limit=50):
+        """
+        Sends the due messages (up to `limit` recipients/digests). On throttling the
+        remaining messages are released with exponential backoff and the drain stops.
+
+        Returns:
+            dict: Counts of sent, retried, failed and deferred (throttled) messages.
+        """
+        rows = self._claim(limit)
+        groups = {}
+        for row in rows:
+            key = (row['recipient'], row['digest_key'] or row['message_id'])
+            groups.setdefault(key, []).append(row)
+
+        result = {'sent': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+        pending_groups = list(groups.values())
+        for index, group in enumerate(pending_groups):
+            ids = [row['message_id'] for row in group]
+            attempts = max(row['attempts'] for row in group) + 1
+            subject, body_text, body_html = self._compose(group)
+            try:
+                with phase('email'):
+                    provider_id = self.backend.send(group[0]['recipient'], subject, body_text, body_html)
+            except ThrottledError as e:
+                # Back off everything claimed in this drain. Throttling does not use up
+                # attempts; the delay grows with each consecutive throttle instead.
+                self._throttle_streak += 1
+                delay = self._backoff(self._throttle_streak)
+                logger.warning(f"Email provider throttled us ({e}); backing off {delay:.0f}s.")
+                remaining = [row['message_id'] for g in pending_groups[index:] for row in g]
+                self._mark(remaining, PENDING, send_after=time.time() + delay, last_error=f"Throttled: {e}")
+                result['deferred'] += len(remaining)
+                break
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    logger.error(f"Giving up on email to {group[0]['recipient']}: {e}")
+                    self._mark(ids, FAILED, attempts=attempts, last_error=str(e))
+                    result['failed'] += len(ids)
+                else:
+                    self._mark(ids, PENDING, attempts=attempts, last_error=str(e),
+                               send_after=time.time() + self._backoff(attempts))
+                    result['retried'] += len(ids)
+                continue
+            self._throttle_streak = 0
+            self._mark(ids, SENT, attempts=attempts, provider_id=provider_id, sent_at=time.time())
+            result['sent'] += len(ids)
+        if rows:
+            logger.info(f"Outbox drained: {result}")
+        return result
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM messages GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+_outbox = None
+
+
+def get_outbox():
+    """Returns the process-wide outbox configured by settings.EMAIL_OUTBOX."""
+    global _outbox
+    if _outbox is None:
+        config = settings.EMAIL_OUTBOX
+        backend = import_string(config['BACKEND'])()
+        _outbox = EmailOutbox(backend=backend, **config.get('OPTIONS', {}))
+    return _outbox
+
+
+def queue_email(recipient_email, subject, body_text, body_html=None, digest_key=None):
+    """
+    Adds an email to the outbox; it is sent by the job worker (or manage.py drain_outbox).
+    Messages sharing `digest_key` for the same recipient are combined into one email.
+    Nothing is queued when the backend has no sender configured (AWS_SES_SOURCE_EMAIL unset).
+    """
+    if not recipient_email:
+        return None
+    outbox = get_outbox()
+    if not getattr(outbox.backend, 'can_send', True):
+        logger.debug("Email backend has no sender configured; not queueing %r", subject)
+        return None
+    return outbox.enqueue(recipient_email, subject, body_text, body_html, digest_key)
+
+
+def drain_outbox():
+    """Job worker periodic callback (see JOB_QUEUE['PERIODIC_CALLBACKS'])."""
+    return get_outbox().drain(limit=settings.EMAIL_OUTBOX.get('BATCH_SIZE', 50))
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+import math
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(last_evaluated_key):
+    """
+    Turns a pagination position (a DynamoDB LastEvaluatedKey, or a dict wrapping one)
+    into an opaque URL-safe cursor, or None at the end.
+    """
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValidationError for malformed cursors."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValidationError({"cursor": "Invalid pagination cursor."})
+    if not isinstance(key, dict):
+        raise ValidationError({"cursor": "Invalid pagination cursor."})
+    return key
+
+
+def _is_key_value(value, attr_type):
+    """Whether `value` is a DynamoDB key attribute value ({"S": "..."} or {"N": "..."})."""
+    if not isinstance(value, dict) or len(value) != 1 or not isinstance(value.get(attr_type), str):
+        return False
+    if attr_type == 'N':
+        try:
+            return math.isfinite(float(value['N']))
+        except ValueError:
+            return False
+    return True
+
+
+def check_start_key(key, index, hash_key):
+    """
+    Checks that a decoded cursor is a LastEvaluatedKey of `index` in partition
+    `hash_key`: exactly the table and index key attributes, each a single value
+    of the attribute's type. Raises ValidationError otherwise, so a forged cursor
+    never reaches DynamoDB.
+    """
+    if key is None:
+        return None
+    model = index._model
+    attributes = [model._hash_key_attribute(), model._range_key_attribute(), *index.Meta.attributes.values()]
+    types = {attribute.attr_name: attribute.attr_type for attribute in attributes if attribute is not None}
+    valid = set(key) == set(types) and all(_is_key_value(value, types[name]) for name, value in key.items())
+    hash_name = index._hash_key_attribute().attr_name
+    if not valid or key[hash_name][types[hash_name]] != str(hash_key):
+        raise ValidationError({"cursor": "Invalid pagination cursor."})
+    return key
+
+
+def page_params(request, default_size):
+    """Reads ?limit= and ?cursor= from the request. Returns (limit, last_evaluated_key)."""
+    limit = request.query_params.get('limit')
+    if limit is None:
+        limit = default_size
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        if limit < 1:
+            raise ValidationError({"limit": "Must be at least 1."})
+    return min(limit, settings.MAX_PAGE_SIZE), decode_cursor(request.query_params.get('cursor'))
+
+
+def paginated_response(data, last_evaluated_key):
+    """
+    Returns `data` as the response body (a plain list, as the frontend expects)
+    with the cursor for the next page in the X-Next-Cursor header.
+    """
+    response = Response(data)
+    cursor = encode_cursor(last_evaluated_key)
+    if cursor:
+        response[NEXT_CURSOR_HEADER] = cursor
+    return response
+
+
+def query_partitions(index, hash_keys, limit, position=None, **query_kwargs):
+    """
+    Keyset pagination over several partitions of `index`, read one after the other
+    in the given order. Each DynamoDB request reads at most `limit` items.
+
+    Args:
+        index: A PynamoDB index (or model) to query.
+        hash_keys (list): Partition keys to read, e.g. the project ids a user owns.
+        limit (int): Maximum number of items to return.
+        position (dict, optional): Position returned by the previous call.
+        **query_kwargs: Passed to index.query (filter_condition, attributes_to_get, ...).
+
+    Returns:
+        tuple: (list of items, position for the next page or None when done)
+
+    Raises:
+        ValidationError: `position` is not a position in `hash_keys` on this index.
+    """
+    hash_keys = list(hash_keys)
+    start = 0
+    last_evaluated_key = None
+    if position:
+        try:
+            start = hash_keys.index(position.get('partition'))
+        except ValueError:
+            raise ValidationError({"cursor": "Invalid pagination cursor."})
+        last_evaluated_key = check_start_key(position.get('key'), index, hash_keys[start])
+
+    items = []
+    for position_index, hash_key in enumerate(hash_keys[start:], start):
+        remaining = limit - len(items)
+        results = index.query(
+            hash_key,
+            limit=remaining,
+            page_size=remaining,
+            last_evaluated_key=last_evaluated_key,
+            **query_kwargs
+        )
+        items.extend(results)
+        last_evaluated_key = None
+        if len(items) >= limit:
+            key = results.last_evaluated_key
+            if key:
+                return items, {'partition': hash_key, 'key': key}
+            if position_index + 1 < len(hash_keys):
+                return items, {'partition': hash_keys[position_index + 1], 'key': None}
+            return items, None
+    return items, None
@@ -1,44 +1,292 @@
 import logging
+import multiprocessing
+import threading
+import time
+from dataclasses import dataclass, field
 from django.conf import settings
 from pdfminer.high_level import extract_text_to_fp
 from pdfminer.layout import LAParams
+from pdfminer.pdfpage import PDFPage
 import io
 import os # Import os for path joining
 
+from .extraction_cache import get_extraction_cache, cache_key_for, file_sha256
+from .metrics import timed
+
+try:
+    import resource  # Not available on Windows; memory caps are skipped there.
+except ImportError:
+    resource = None
+
 logger = logging.getLogger(__name__)
 
-def extract_text_from_local_pdf(file_path: str) -> str:
+# Layout analysis parameters passed to pdfminer. Kept as plain kwargs so they
+# can be shipped to worker processes.
+LAPARAMS_KWARGS = {}
+
+
+@dataclass
+class ExtractionResult:
+    """Text extracted from a PDF together with diagnostics about the run."""
+    text: str = ""
+    pages_total: int = 0
+    pages_extracted: int = 0
+    timed_out: bool = False
+    memory_exceeded: bool = False
+    errors: list = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    cached: bool = False
+
+    @property
+    def complete(self):
+        return self.pages_total > 0 and self.pages_extracted == self.pages_total
+
+    def diagnostics(self):
+        return {
+            'pages_total': self.pages_total,
+            'pages_extracted': self.pages_extracted,
+            'timed_out': self.timed_out,
+            'memory_exceeded': self.memory_exceeded,
+            'errors': self.errors,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'cached': self.cached,
+        }
+
+
+def _current_address_space():
+    """Returns the virtual memory size of this process in bytes, or 0 if unknown."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _limit_memory(limit_bytes):
+    # Runs once in every pool process. The cap is applied on top of what the
+    # process already maps, so it bounds what a single job can allocate.
+    if resource is None or not limit_bytes:
+        return
+    cap = _current_address_space() + limit_bytes
+    resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+
+def _count_pages(absolute_file_path):
+    with open(absolute_file_path, 'rb') as pdf_file_object:
+        return sum(1 for _ in PDFPage.get_pages(pdf_file_object))
+
+
+def _extract_page_range(absolute_file_path, start, stop, laparams_kwargs):
+    """Extracts pages [start, stop) of a PDF. Runs inside a pool process."""
+    try:
+        with open(absolute_file_path, 'rb') as pdf_file_object:
+            output_string = io.StringIO()
+            extract_text_to_fp(
+                pdf_file_object, output_string,
+                laparams=LAParams(**laparams_kwargs),
+                page_numbers=set(range(start, stop))
+            )
+            return 'ok', output_string.getvalue()
+    except MemoryError:
+        return 'memory', f"pages {start + 1}-{stop}: memory limit exceeded"
+    except Exception as e:
+        return 'error', f"pages {start + 1}-{stop}: {e}"
+
+
+def _pool_context():
+    # Pool processes are started from a clean server process rather than forked
+    # from the caller, which may be running other threads (the job worker's
+    # outbox drain, the ASGI thread pool).
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ExtractionEngine:
     """
-    Reads a PDF file from the local file system and extracts its text content.
+    Extracts PDF text in a pool of worker processes.
+
+    The document is split into page ranges that are extracted in parallel.
+    Every document gets a wall-clock budget of `timeout` seconds and every
+    worker process an address-space cap of `memory_limit_mb`. When a limit is
+    hit, the text of the page ranges that did finish is returned along with
+    diagnostics describing what was lost.
+
+    The pool is started on first use and kept for later documents; worker
+    processes are recycled after `max_tasks_per_child` page ranges. It is only
+    replaced after a timeout (its workers may still be busy) or a memory-limit
+    hit.
+    """
+
+    def __init__(self, workers=None, timeout=None, memory_limit_mb=None, pages_per_chunk=None,
+                 max_tasks_per_child=None):
+        self.workers = workers or settings.PDF_EXTRACTION_WORKERS
+        self.timeout = timeout or settings.PDF_EXTRACTION_TIMEOUT_SECONDS
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else settings.PDF_EXTRACTION_MEMORY_LIMIT_MB
+        self.pages_per_chunk = pages_per_chunk or settings.PDF_EXTRACTION_PAGES_PER_CHUNK
+        self.max_tasks_per_child = max_tasks_per_child or settings.PDF_EXTRACTION_MAX_TASKS_PER_CHILD
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = _pool_context().Pool(
+                    processes=self.workers,
+                    initializer=_limit_memory,
+                    initargs=(self.memory_limit_mb * 1024 * 1024,),
+                    maxtasksperchild=self.max_tasks_per_child
+                )
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Terminates `pool` (also killing workers still busy with a timed-out range) if it is still current."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.terminate()
+        pool.join()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    def extract(self, absolute_file_path):
+        result = ExtractionResult()
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        pool = self._get_pool()
+        try:
+            try:
+                result.pages_total = pool.apply_async(_count_pages, (absolute_file_path,)).get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except multiprocessing.TimeoutError:
+                result.timed_out = True
+                result.errors.append("timed out while reading the page tree")
+                return result
+            except MemoryError:
+                result.memory_exceeded = True
+                result.errors.append("memory limit exceeded while reading the page tree")
+                return result
+            except Exception as e:
+                result.errors.append(f"could not read the page tree: {e}")
+                return result
+
+            ranges = [
+                (start, min(start + self.pages_per_chunk, result.pages_total))
+                for start in range(0, result.pages_total, self.pages_per_chunk)
+            ]
+            pending = [
+                (start, stop, pool.apply_async(
+                    _extract_page_range, (absolute_file_path, start, stop, LAPARAMS_KWARGS)
+                ))
+                for start, stop in ranges
+            ]
+            texts = []
+            for start, stop, async_result in pending:
+                try:
+                    outcome, value = async_result.get(timeout=max(deadline - time.monotonic(), 0))
+                except multiprocessing.TimeoutError:
+                    result.timed_out = True
+                    result.errors.append(f"pages {start + 1}-{stop}: timed out")
+                    continue
+                if outcome == 'ok':
+                    texts.append(value)
+                    result.pages_extracted += stop - start
+                else:
+                    result.memory_exceeded = result.memory_exceeded or outcome == 'memory'
+                    result.errors.append(value)
+            result.text = "".join(texts)
+            return result
+        finally:
+            if result.timed_out or result.memory_exceeded:
+                self._discard_pool(pool)
+            result.elapsed_seconds = time.monotonic() - started
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the process-wide engine, whose pool is shared by every extraction in this process."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ExtractionEngine()
+        return _engine
+
+
+def reset_engine():
+    """Stops the pool of the process-wide engine, e.g. after settings changed."""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.close()
+
+
+@timed('pdf')
+def extract_pdf(file_path: str, content_sha256: str = None) -> ExtractionResult:
+    """
+    Extracts the text of a PDF stored under MEDIA_ROOT using the process-pool engine.
+
+    Results are cached by content hash, so a file whose bytes were extracted
+    before (a resubmission, or a re-triggered job) is not parsed again.
 
     Args:
         file_path (str): The local path to the PDF file relative to MEDIA_ROOT.
+        content_sha256 (str, optional): SHA-256 of the file recorded when it was uploaded.
+            Computed from the file if not given.
 
     Returns:
-        str: The extracted text content from the PDF, or an empty string if extraction fails.
+        ExtractionResult: The (possibly partial) text and extraction diagnostics.
     """
     if not file_path:
         logger.warning("No file path provided for PDF extraction.")
-        return ""
+        return ExtractionResult(errors=["no file path provided"])
 
     # Construct the absolute path to the file
     absolute_file_path = os.path.join(settings.MEDIA_ROOT, file_path)
 
     if not os.path.exists(absolute_file_path):
         logger.error(f"PDF file not found at local path: {absolute_file_path}")
-        return ""
+        return ExtractionResult(errors=["file not found"])
 
-    try:
-        with open(absolute_file_path, 'rb') as pdf_file_object:
-            output_string = io.StringIO()
-            laparams = LAParams() # Default layout analysis parameters
-            
-            extract_text_to_fp(pdf_file_object, output_string, laparams=laparams)
-            
-            extracted_text = output_string.getvalue()
-            logger.info(f"Successfully extracted text from local PDF: {file_path}")
-            return extracted_text
+    cache = get_extraction_cache()
+    cache_key = cache_key_for(content_sha256 or file_sha256(absolute_file_path), LAPARAMS_KWARGS)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        text, pages = cached
+        logger.info(f"Extraction cache hit for local PDF: {file_path}")
+        return ExtractionResult(text=text, pages_total=pages, pages_extracted=pages, cached=True)
 
-    except Exception as e:
-        logger.error(f"Error extracting text from local PDF '{file_path}': {e}")
-        return ""
+    result = get_engine().extract(absolute_file_path)
+    if result.complete:
+        logger.info(f"Successfully extracted text from local PDF: {file_path} ({result.diagnostics()})")
+        # Partial results are not cached; a later attempt may get further.
+        cache.set(cache_key, result.text, result.pages_total)
+    else:
+        logger.warning(f"Incomplete text extraction from local PDF '{file_path}': {result.diagnostics()}")
+    return result
+
+
+def extract_text_from_local_pdf(file_path: str, content_sha256: str = None) -> str:
+    """
+    Reads a PDF file from the local file system and extracts its text content.
+
+    Args:
+        file_path (str): The local path to the PDF file relative to MEDIA_ROOT.
+        content_sha256 (str, optional): SHA-256 of the file recorded when it was uploaded.
+
+    Returns:
+        str: The extracted text content from the PDF. If a time or memory limit
+             was hit this is the text of the pages that could be extracted, and
+             an empty string if extraction failed entirely.
+    """
+    return extract_pdf(file_path, content_sha256).text
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.core.files.storage import default_storage
 from .models import ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel
+from .utils import HashingFile
+from .uploads import UploadSession, check_magic
+from .versioning import write_new_version
+from .catalog_cache import get_catalog_cache
 from datetime import datetime
 
 class UserProfileSerializer(serializers.Serializer):
@@ -25,6 +29,8 @@ class ProjectSerializer(serializers.Serializer):
     start_date = serializers.DateField(format="%Y-%m-%d", input_formats=["%Y-%m-%d"])
     end_date = serializers.DateField(format="%Y-%m-%d", input_formats=["%Y-%m-%d"])
     is_active = serializers.BooleanField(required=False, default=True)
+    max_report_size_mb = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    max_source_code_size_mb = serializers.IntegerField(required=False, allow_null=True, min_value=1)
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
     def create(self, validated_data):
@@ -36,6 +42,7 @@ class ProjectSerializer(serializers.Serializer):
             setattr(instance, attr, value)
         instance.updated_at = datetime.utcnow()
         instance.save()
+        get_catalog_cache().invalidate_project(instance.project_id, instance)
         return instance
 
 class SubmissionSerializer(serializers.Serializer):
@@ -46,9 +53,13 @@ class SubmissionSerializer(serializers.Serializer):
     
     # File fields for upload. These are not stored in the model directly.
     # `write_only=True` means they are used for input but not for output.
-    report_file = serializers.FileField(write_only=True)
+    report_file = serializers.FileField(write_only=True, required=False)
     source_code_file = serializers.FileField(write_only=True, required=False, allow_null=True)
 
+    # Alternatively, ids of committed chunked uploads (see Proj/uploads.py).
+    report_upload_id = serializers.CharField(write_only=True, required=False)
+    source_code_upload_id = serializers.CharField(write_only=True, required=False, allow_null=True)
+
     # Read-only fields that are returned in the API response
     submission_id = serializers.CharField(read_only=True)
     student_username = serializers.CharField(read_only=True)
@@ -66,34 +77,79 @@ class SubmissionSerializer(serializers.Serializer):
 
 
     def validate(self, data):
+        if bool(data.get('report_file')) == bool(data.get('report_upload_id')):
+            raise serializers.ValidationError("Provide exactly one of a report file or a report upload id.")
         github_link = data.get('github_link')
-        source_code_file = data.get('source_code_file')
+        source_code_file = data.get('source_code_file') or data.get('source_code_upload_id')
         if not github_link and not source_code_file:
             raise serializers.ValidationError("Either a GitHub link or a source code ZIP file must be provided.")
         if github_link and source_code_file:
             raise serializers.ValidationError("Cannot provide both a GitHub link and a source code ZIP file.")
+        if data.get('source_code_file') and data.get('source_code_upload_id'):
+            raise serializers.ValidationError("Provide either a source code file or a source code upload id, not both.")
+
+        # Chunked uploads are validated here, before the view does any submission bookkeeping.
+        request = self.context.get('request')
+        for kind in ('report', 'source_code'):
+            upload_id = data.get(f"{kind}_upload_id")
+            if upload_id:
+                session = UploadSession.load(upload_id, request.user.username if request else None)
+                session.check_usable_for(data['project_id'], kind)
+                data[f"_{kind}_upload"] = session
+        if data.get('report_file'):
+            check_magic('report', data['report_file'].read(8))
+            data['report_file'].seek(0)
         return data
 
     def create(self, validated_data):
         # Pop the file objects from validated_data to handle them separately.
-        report_file_obj = validated_data.pop('report_file')
+        report_file_obj = validated_data.pop('report_file', None)
         source_code_file_obj = validated_data.pop('source_code_file', None)
+        validated_data.pop('report_upload_id', None)
+        validated_data.pop('source_code_upload_id', None)
+        report_upload = validated_data.pop('_report_upload', None)
+        source_code_upload = validated_data.pop('_source_code_upload', None)
+        # Counter from Proj/versioning.load_counter, passed in by the view.
+        counter = validated_data.pop('_counter')
+        stored_paths = []
 
-        # Save the report file using Django's default storage (FileSystemStorage)
-        # This returns the relative path where the file was saved.
-        report_path = default_storage.save(f"reports/{report_file_obj.name}", report_file_obj)
-        validated_data['report_file_path'] = report_path
+        if report_upload:
+            # Chunked uploads were already moved into storage when they were committed.
+            validated_data['report_file_path'] = report_upload.meta['file_path']
+            validated_data['report_sha256'] = report_upload.meta['sha256']
+        else:
+            # Save the report file using Django's default storage (FileSystemStorage)
+            # This returns the relative path where the file was saved.
+            # The content hash is taken while the file is written and keys the extraction cache.
+            report_file = HashingFile(report_file_obj)
+            report_path = default_storage.save(f"reports/{report_file_obj.name}", report_file)
+            stored_paths.append(report_path)
+            validated_data['report_file_path'] = report_path
+            validated_data['report_sha256'] = report_file.sha256
 
         # If a source code file was uploaded, save it too.
-        if source_code_file_obj:
+        if source_code_upload:
+            validated_data['source_code_file_path'] = source_code_upload.meta['file_path']
+        elif source_code_file_obj:
             source_code_path = default_storage.save(f"source_code/{source_code_file_obj.name}", source_code_file_obj)
+            stored_paths.append(source_code_path)
             validated_data['source_code_file_path'] = source_code_path
         else:
             validated_data['source_code_file_path'] = None
 
-        # Create and save the PynamoDB model instance with the file paths.
+        # Create the PynamoDB model instance with the file paths and write it as the
+        # student's next version (counter, new item and is_latest flip in one transaction).
         submission = SubmissionModel(**validated_data)
-        submission.save()
+        try:
+            write_new_version(submission, counter)
+        except Exception:
+            # Nothing was written, so the files stored above would be orphaned.
+            for path in stored_paths:
+                default_storage.delete(path)
+            raise
+        for upload in (report_upload, source_code_upload):
+            if upload:
+                upload.delete()
         return submission
 
 class RubricSerializer(serializers.Serializer):
@@ -105,12 +161,14 @@ class RubricSerializer(serializers.Serializer):
     def create(self, validated_data):
         rubric = RubricModel(**validated_data)
         rubric.save()
+        get_catalog_cache().invalidate_rubrics(rubric.project_id)
         return rubric
     def update(self, instance, validated_data):
         instance.criterion = validated_data.get('criterion', instance.criterion)
         instance.max_points = validated_data.get('max_points', instance.max_points)
         instance.description = validated_data.get('description', instance.description)
         instance.save()
+        get_catalog_cache().invalidate_rubrics(instance.project_id)
         return instance
 
 class EvaluationSerializer(serializers.Serializer):
@@ -122,9 +180,14 @@ class EvaluationSerializer(serializers.Serializer):
     points_awarded = serializers.IntegerField(min_value=0)
     feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     evaluated_at = serializers.DateTimeField(read_only=True)
+    ml_points_awarded = serializers.FloatField(read_only=True, required=False)
+    ml_feedback = serializers.CharField(read_only=True, required=False)
     rubric = RubricSerializer(read_only=True)
     def create(self, validated_data):
         # The view's serializer.save(submission_id=...) call adds submission_id here.
-        evaluation = EvaluationModel(**validated_data)
+        evaluation = EvaluationModel(
+            evaluation_id=EvaluationModel.key_for(validated_data['submission_id'], validated_data['rubric_id']),
+            **validated_data
+        )
         evaluation.save()
         return evaluation
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Server-sent events (text/event-stream) for views that stream their result.
+
+A view opts in by adding EventStreamRenderer to its renderer classes; clients
+ask for a stream with `Accept: text/event-stream`. Responses the view returns
+before it starts streaming (errors, mostly) are then sent as a single event.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return format_event(event, data).encode(self.charset)
+
+
+# Renderer classes for a view that can answer with JSON or an event stream.
+STREAMING_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+
+def wants_event_stream(request):
+    return isinstance(getattr(request, 'accepted_renderer', None), EventStreamRenderer)
+
+
+def event_stream_response(events):
+    """Streams (event, data) pairs from a generator or async generator as server-sent events."""
+    if hasattr(events, '__aiter__'):
+        async def body():
+            async for event, data in events:
+                yield format_event(event, data)
+    else:
+        def body():
+            for event, data in events:
+                yield format_event(event, data)
+    response = StreamingHttpResponse(body(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Proxies such as nginx would otherwise buffer the events until the stream ends.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,46 @@
+import logging
+
+from pynamodb.exceptions import DoesNotExist
+
+from .jobs import task
+from .models import SubmissionModel
+from .pdf_extractor import extract_text_from_local_pdf
+from .notifications import submission_received
+
+logger = logging.getLogger(__name__)
+
+
+def mark_extraction_failed(submission_id):
+    """Called once `process_submission` has used up all of its attempts."""
+    try:
+        submission = SubmissionModel.get(submission_id)
+    except DoesNotExist:
+        return
+    submission.update(actions=[SubmissionModel.status.set('ExtractionFailed')])
+
+
+@task(name='process_submission', on_failure=mark_extraction_failed)
+def process_submission(submission_id):
+    """
+    Extracts the report text of a freshly created submission and stores it as
+    the submission summary, moving the status from 'Processing' to 'Submitted'.
+    """
+    try:
+        submission = SubmissionModel.get(submission_id)
+    except DoesNotExist:
+        logger.warning(f"Submission {submission_id} no longer exists. Skipping processing.")
+        return
+
+    actions = [SubmissionModel.status.set('Submitted')]
+    if submission.report_file_path:
+        extracted_text = extract_text_from_local_pdf(submission.report_file_path, submission.report_sha256)
+        if not extracted_text:
+            raise RuntimeError(f"Could not extract text from PDF for submission {submission_id}")
+        actions.append(SubmissionModel.report_content_summary.set(extracted_text))
+    submission.update(actions=actions)
+
+
+@task(name='send_submission_confirmation')
+def send_submission_confirmation(recipient_email, project_title, version):
+    """Kept for jobs enqueued before the email outbox; new confirmations go straight to the outbox."""
+    submission_received(recipient_email, project_title, version)
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from . import ai_evaluation, jobs, outbox
+from .benchmarks.fixtures import local_environment, seed
+from .jobs import DONE, FAILED, QUEUED, RUNNING, SQLiteJobQueue
+from .pagination import NEXT_CURSOR_HEADER, encode_cursor
+from .uploads import UploadSession
+
+failure_hook_calls = []
+
+
+def _record_failure(**payload):
+    failure_hook_calls.append(payload)
+
+
+@jobs.task(name='tests.ok')
+def _ok(value):
+    return value
+
+
+@jobs.task(name='tests.broken', max_attempts=2, retry_backoff=0, on_failure=_record_failure)
+def _broken(value):
+    raise RuntimeError(f"broken {value}")
+
+
+class SQLiteJobQueueTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'jobs.sqlite3'
+        self.queue = SQLiteJobQueue(self.path)
+        failure_hook_calls.clear()
+
+    def expired_queue(self):
+        """A second handle on the same database whose leases are already over when taken."""
+        return SQLiteJobQueue(self.path, lease_seconds=-1)
+
+    def test_claim_leases_the_job_to_the_worker(self):
+        job_id = self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3)
+        job = self.queue.claim('worker-a')
+        self.assertEqual(job['job_id'], job_id)
+        self.assertEqual(job['attempts'], 1)
+        self.assertEqual(job['locked_by'], 'worker-a')
+        self.assertFalse(job['lease_expired'])
+        self.assertEqual(self.queue.get(job_id)['status'], RUNNING)
+        self.assertIsNone(self.queue.claim('worker-b'))
+
+    def test_delayed_job_is_not_claimed_early(self):
+        self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3, delay=60)
+        self.assertIsNone(self.queue.claim('worker-a'))
+
+    def test_complete_and_retry(self):
+        job_id = self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3)
+        self.queue.claim('worker-a')
+        self.assertTrue(self.queue.retry(job_id, 'worker-a', 'boom', delay=0))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['last_error'], job['locked_by']), (QUEUED, 'boom', None))
+
+        job = self.queue.claim('worker-a')
+        self.assertEqual(job['attempts'], 2)
+        self.assertTrue(self.queue.complete(job_id, 'worker-a'))
+        self.assertEqual(self.queue.get(job_id)['status'], DONE)
+
+    def test_expired_lease_is_reclaimed_and_old_worker_cannot_finish(self):
+        job_id = self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3)
+        self.expired_queue().claim('worker-a')
+
+        job = self.queue.claim('worker-b')
+        self.assertEqual((job['job_id'], job['attempts'], job['locked_by']), (job_id, 2, 'worker-b'))
+
+        self.assertFalse(self.queue.complete(job_id, 'worker-a'))
+        self.assertFalse(self.queue.fail(job_id, 'worker-a', 'late'))
+        self.assertFalse(self.queue.retry(job_id, 'worker-a', 'late', delay=0))
+        self.assertFalse(self.queue.heartbeat(job_id, 'worker-a'))
+        self.assertEqual(self.queue.get(job_id)['status'], RUNNING)
+
+        self.assertTrue(self.queue.heartbeat(job_id, 'worker-b', {'done': 1}))
+        self.assertTrue(self.queue.complete(job_id, 'worker-b'))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['progress']), (DONE, {'done': 1}))
+
+    def test_expired_lease_on_last_attempt_fails_the_job(self):
+        job_id = self.queue.enqueue('tests.broken', {'value': 1}, max_attempts=1)
+        self.expired_queue().claim('worker-a')
+
+        job = self.queue.claim('worker-b')
+        self.assertTrue(job['lease_expired'])
+        self.assertIn('worker-a', job['last_error'])
+        self.assertEqual(self.queue.get(job_id)['status'], FAILED)
+        self.assertIsNone(self.queue.claim('worker-b'))
+
+        with self.assertLogs('Proj.jobs', level='ERROR'):
+            self.assertFalse(jobs.run_job(self.queue, job))
+        self.assertEqual(failure_hook_calls, [{'value': 1}])
+
+
+class RunJobTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = SQLiteJobQueue(Path(directory.name) / 'jobs.sqlite3')
+        failure_hook_calls.clear()
+
+    def test_success_completes_the_job(self):
+        job_id = self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3)
+        self.assertTrue(jobs.run_job(self.queue, self.queue.claim('worker-a')))
+        self.assertEqual(self.queue.get(job_id)['status'], DONE)
+
+    def test_failure_is_retried_then_fails_permanently(self):
+        job_id = self.queue.enqueue('tests.broken', {'value': 7}, max_attempts=2)
+
+        with self.assertLogs('Proj.jobs', level='WARNING'):
+            self.assertFalse(jobs.run_job(self.queue, self.queue.claim('worker-a')))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['last_error']), (QUEUED, 'RuntimeError: broken 7'))
+        self.assertEqual(failure_hook_calls, [])
+
+        with self.assertLogs('Proj.jobs', level='ERROR'):
+            self.assertFalse(jobs.run_job(self.queue, self.queue.claim('worker-a')))
+        self.assertEqual(self.queue.get(job_id)['status'], FAILED)
+        self.assertEqual(failure_hook_calls, [{'value': 7}])
+
+    def test_outcome_of_a_reclaimed_job_is_discarded(self):
+        job_id = self.queue.enqueue('tests.ok', {'value': 1}, max_attempts=3)
+        stale = self.queue.claim('worker-a')
+        # Simulate worker-a's lease expiring and worker-b taking over.
+        self.queue.retry(job_id, 'worker-a', 'lease expired', delay=0)
+        self.queue.claim('worker-b')
+
+        with self.assertLogs('Proj.jobs', level='WARNING'):
+            self.assertFalse(jobs.run_job(self.queue, stale))
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['locked_by']), (RUNNING, 'worker-b'))
+
+
+class SlowStream(io.BytesIO):
+    """A request body that arrives a few bytes at a time."""
+
+    def read(self, size=-1):
+        time.sleep(0.001)
+        return super().read(min(size, 5))
+
+
+class UploadSessionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = Path(directory.name) / 'media'
+        overrides = override_settings(UPLOAD_SESSION_DIR=str(Path(directory.name) / 'sessions'), MEDIA_ROOT=str(media))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.project = SimpleNamespace(project_id='p1', max_report_size_mb=None)
+        self.content = b'%PDF-1.7\n' + b'x' * 200
+
+    def new_session(self):
+        return UploadSession.create('student1', self.project, 'report', 'report.pdf', len(self.content))
+
+    def put(self, session, start, data):
+        return session.append(start, io.BytesIO(data), len(data))
+
+    def test_chunks_shorter_than_the_signature(self):
+        session = self.new_session()
+        self.assertEqual(self.put(session, 0, self.content[:2]), 2)
+        self.assertEqual(self.put(session, 2, self.content[2:4]), 4)
+        self.assertEqual(self.put(session, 4, self.content[4:]), len(self.content))
+        session.commit()
+        self.assertTrue(session.meta['committed'])
+
+    def test_bad_signature_is_rejected_without_deleting_the_session(self):
+        session = self.new_session()
+        self.put(session, 0, b'%P')
+        with self.assertRaises(ValidationError):
+            self.put(session, 2, b'NG\r\n')
+        self.assertEqual(UploadSession.load(session.upload_id, 'student1').offset, 2)
+        self.put(session, 2, self.content[2:])
+        self.assertEqual(session.offset, len(self.content))
+
+    def test_commit_checks_the_whole_signature(self):
+        self.content = b'%PD'
+        session = self.new_session()
+        self.put(session, 0, self.content)
+        with self.assertRaises(ValidationError):
+            session.commit()
+
+    def test_short_body_is_dropped(self):
+        session = self.new_session()
+        with self.assertRaises(ValidationError):
+            session.append(0, io.BytesIO(self.content[:50]), 100)
+        self.assertEqual(session.offset, 0)
+
+    def test_concurrent_chunks_at_the_same_offset_append_once(self):
+        session = self.new_session()
+        self.put(session, 0, self.content[:10])
+        chunk = self.content[10:60]
+        outcomes = []
+
+        def put():
+            try:
+                outcomes.append(UploadSession.load(session.upload_id, 'student1').append(10, SlowStream(chunk), len(chunk)))
+            except ValidationError:
+                outcomes.append('rejected')
+
+        threads = [threading.Thread(target=put) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes, key=str), [60] + ['rejected'] * 7)
+        with open(session.data_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content[:60])
+
+
+class ListingPaginationTests(SimpleTestCase):
+    def setUp(self):
+        environment = local_environment()
+        self.env = environment.__enter__()
+        self.addCleanup(environment.__exit__, None, None, None)
+        self.data = seed(projects=3, rubrics_per_project=1, students=3, faculty=1, report_words=20)
+
+    def client_for(self, username, role):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.env.issuer.token(username, role=role)}")
+        return client
+
+    def follow(self, client, path, limit):
+        items, cursor = [], None
+        while True:
+            response = client.get(path, {'limit': limit, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            items.extend(response.data)
+            cursor = response.get(NEXT_CURSOR_HEADER)
+            if not cursor:
+                return items
+
+    def test_submission_pages_cover_every_owned_project(self):
+        faculty = self.client_for(self.data.faculty[0], 'faculty')
+        submissions = self.follow(faculty, '/api/submissions/my-submissions/', limit=2)
+        self.assertCountEqual([s['submission_id'] for s in submissions], self.data.submissions)
+
+    def test_submission_cursor_for_another_partition_is_rejected(self):
+        student = self.data.students[0]
+        submissions = self.follow(self.client_for(student, 'student'), '/api/submissions/my-submissions/', limit=1)
+        self.assertEqual(len(submissions), len(self.data.projects))
+
+        other = self.data.students[1]
+        forged = {'partition': student, 'key': {
+            'submission_id': {'S': submissions[0]['submission_id']},
+            'student_username': {'S': other},
+            'submitted_at': {'S': submissions[0]['submitted_at']},
+        }}
+        response = self.client_for(student, 'student').get(
+            '/api/submissions/my-submissions/', {'cursor': encode_cursor(forged)}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_project_pages_and_forged_cursor(self):
+        faculty = self.client_for(self.data.faculty[0], 'faculty')
+        projects = self.follow(faculty, '/api/projects/', limit=2)
+        self.assertCountEqual([p['project_id'] for p in projects], self.data.projects)
+        self.assertEqual(len(self.follow(self.client_for(self.data.students[0], 'student'), '/api/projects/', limit=2)), 3)
+
+        forged = {
+            'project_id': {'S': projects[0]['project_id']},
+            'created_by_username': {'S': 'someone-else'},
+            'created_at': {'S': projects[0]['created_at']},
+        }
+        response = faculty.get('/api/projects/', {'cursor': encode_cursor(forged)})
+        self.assertEqual(response.status_code, 400)
+        response = faculty.get('/api/projects/', {'open': 'true', 'cursor': encode_cursor(forged)})
+        self.assertEqual(response.status_code, 400)
+
+
+class QueueEmailTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.config = {'BACKEND': 'Proj.outbox.SESBackend', 'OPTIONS': {'path': str(Path(directory.name) / 'outbox.sqlite3')}}
+        outbox._outbox = None
+        self.addCleanup(setattr, outbox, '_outbox', None)
+
+    def test_nothing_is_queued_without_a_sender(self):
+        with override_settings(EMAIL_OUTBOX=self.config, AWS_SES_SOURCE_EMAIL=''):
+            self.assertIsNone(outbox.queue_email('student@example.edu', 'Subject', 'Body'))
+            self.assertEqual(outbox.get_outbox().counts(), {})
+
+    def test_messages_are_queued_with_a_sender(self):
+        with override_settings(EMAIL_OUTBOX=self.config, AWS_SES_SOURCE_EMAIL='noreply@example.edu'):
+            self.assertIsNotNone(outbox.queue_email('student@example.edu', 'Subject', 'Body'))
+            self.assertEqual(outbox.get_outbox().counts(), {outbox.PENDING: 1})
+
+
+@override_settings(ML_EVALUATOR_BACKEND='ml_evaluator.backends.local.LocalBackend', ML_EVALUATOR_OPTIONS={})
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        from ml_evaluator.backends import reset_backend
+        reset_backend()
+        self.addCleanup(reset_backend)
+        self.submission = SimpleNamespace(submission_id='s1', report_content_summary='Report text.')
+        self.rubrics = [SimpleNamespace(rubric_id='r1', criterion='Design', max_points=10, description='')]
+
+    def test_followers_share_the_leaders_result(self):
+        release = threading.Event()
+        calls, results = [], []
+
+        def evaluate(text, rubrics):
+            calls.append(text)
+            release.wait(5)
+            return {"error": "model unavailable"}
+
+        def request():
+            results.append(ai_evaluation.get_or_create_ai_evaluation(
+                self.submission, self.rubrics, evaluations=[], evaluate=evaluate
+            ))
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"error": "model unavailable"}] * 4)
+        self.assertEqual(ai_evaluation._in_flight, {})
+
+    def test_leader_exception_reaches_followers(self):
+        with self.assertRaises(RuntimeError):
+            with ai_evaluation.single_flight('s1', 'hash') as (leader, future):
+                self.assertTrue(leader)
+                with ai_evaluation.single_flight('s1', 'hash') as (follower_leads, shared):
+                    self.assertFalse(follower_leads)
+                    self.assertIs(shared, future)
+                raise RuntimeError("model crashed")
+        with self.assertRaises(RuntimeError):
+            future.result()
+        self.assertEqual(ai_evaluation._in_flight, {})
+
+    def test_abandoned_stream_interrupts_followers(self):
+        def stream(text, rubrics):
+            yield 'criterion', {'key': 'design'}
+            yield 'criterion', {'key': 'never sent'}
+
+        events = ai_evaluation.stream_or_create_ai_evaluation(
+            self.submission, self.rubrics, evaluations=[], stream=stream
+        )
+        self.assertEqual(next(events)[0], 'start')
+        self.assertEqual(next(events), ('criterion', {'key': 'design'}))
+        (future,) = ai_evaluation._in_flight.values()
+        events.close()
+        self.assertEqual(future.result(), {"error": ai_evaluation.INTERRUPTED})
+        self.assertEqual(ai_evaluation._in_flight, {})
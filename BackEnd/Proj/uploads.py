@@ -0,0 +1,271 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
+
+from .utils import HashingFile
+
+try:
+    import fcntl  # Not available on Windows; chunk writes are then not serialized across processes.
+except ImportError:
+    fcntl = None
+
+# Per-kind upload rules: where the file ends up, what it must look like and
+# which ProjectModel attribute can override the size limit.
+UPLOAD_KINDS = {
+    'report': {
+        'storage_dir': 'reports',
+        'extensions': ('.pdf',),
+        'magic': (b'%PDF-',),
+        'project_limit_attr': 'max_report_size_mb',
+        'default_limit_setting': 'UPLOAD_MAX_REPORT_SIZE_MB',
+    },
+    'source_code': {
+        'storage_dir': 'source_code',
+        'extensions': ('.zip',),
+        'magic': (b'PK\x03\x04', b'PK\x05\x06'),
+        'project_limit_attr': 'max_source_code_size_mb',
+        'default_limit_setting': 'UPLOAD_MAX_SOURCE_CODE_SIZE_MB',
+    },
+}
+
+# Bytes read from the request body at a time; bounds memory per upload.
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def size_limit_for(project, kind):
+    """Returns the maximum upload size in bytes for a file of `kind` in `project`."""
+    rules = UPLOAD_KINDS[kind]
+    limit_mb = getattr(project, rules['project_limit_attr'], None) or getattr(settings, rules['default_limit_setting'])
+    return int(limit_mb * 1024 * 1024)
+
+
+def magic_length(kind):
+    """Number of leading bytes needed to check the signature of a file of `kind`."""
+    return max(len(magic) for magic in UPLOAD_KINDS[kind]['magic'])
+
+
+def check_magic(kind, first_bytes, partial=False):
+    """
+    Raises ValidationError unless `first_bytes` start with the signature of `kind`.
+    With `partial=True`, fewer bytes than the signature are accepted as long as
+    they are its beginning (more of the file is still to come).
+    """
+    signatures = UPLOAD_KINDS[kind]['magic']
+    if partial and len(first_bytes) < magic_length(kind):
+        valid = any(magic.startswith(first_bytes) or first_bytes.startswith(magic) for magic in signatures)
+    else:
+        valid = first_bytes.startswith(signatures)
+    if not valid:
+        expected = 'a PDF document' if kind == 'report' else 'a ZIP archive'
+        raise ValidationError(f"The uploaded {kind.replace('_', ' ')} file is not {expected}.")
+
+
+class UploadSession:
+    """
+    A resumable upload of one file, assembled on local disk from chunks.
+
+    The session directory holds `meta.json` and the partial file `data.part`.
+    The size of `data.part` is the upload offset, so an interrupted client can
+    ask for the offset and continue from there.
+    """
+
+    def __init__(self, upload_id, meta):
+        self.upload_id = upload_id
+        self.meta = meta
+
+    @staticmethod
+    def _dir(upload_id):
+        # upload_id comes from the URL; only accept ids we could have generated.
+        if not upload_id or not all(c in '0123456789abcdef-' for c in upload_id):
+            raise NotFound("Upload not found.")
+        return os.path.join(settings.UPLOAD_SESSION_DIR, upload_id)
+
+    @property
+    def data_path(self):
+        return os.path.join(self._dir(self.upload_id), 'data.part')
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.data_path)
+        except OSError:
+            return 0
+
+    @classmethod
+    def create(cls, owner, project, kind, filename, size):
+        if kind not in UPLOAD_KINDS:
+            raise ValidationError(f"Unknown upload kind '{kind}'.")
+        if not filename or not filename.lower().endswith(UPLOAD_KINDS[kind]['extensions']):
+            raise ValidationError(f"File name must end with {' or '.join(UPLOAD_KINDS[kind]['extensions'])}.")
+        limit = size_limit_for(project, kind)
+        if size <= 0:
+            raise ValidationError("Declared file size must be positive.")
+        if size > limit:
+            raise ValidationError(f"File is too large. The limit for this project is {limit // (1024 * 1024)} MB.")
+
+        upload_id = str(uuid4())
+        os.makedirs(cls._dir(upload_id))
+        session = cls(upload_id, {
+            'owner': owner,
+            'project_id': project.project_id,
+            'kind': kind,
+            'filename': os.path.basename(filename),
+            'size': size,
+            'created_at': time.time(),
+            'committed': False,
+            'file_path': None,
+            'sha256': None,
+        })
+        open(session.data_path, 'wb').close()
+        session._save_meta()
+        return session
+
+    @classmethod
+    def load(cls, upload_id, owner):
+        try:
+            with open(os.path.join(cls._dir(upload_id), 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise NotFound("Upload not found.")
+        if meta['owner'] != owner:
+            raise PermissionDenied("You do not have permission to access this upload.")
+        return cls(upload_id, meta)
+
+    def _save_meta(self):
+        meta_path = os.path.join(self._dir(self.upload_id), 'meta.json')
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Holds an exclusive lock on the session, so the offset check, the append
+        and any truncation of one request never interleave with another's
+        (a retried PUT racing the original, say). Re-reads the metadata once locked.
+        """
+        lock_path = os.path.join(self._dir(self.upload_id), 'lock')
+        try:
+            lock_file = open(lock_path, 'a')
+        except FileNotFoundError:
+            raise NotFound("Upload not found.")
+        with lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.meta = self.load(self.upload_id, self.meta['owner']).meta
+            yield
+
+    def _head(self, size):
+        with open(self.data_path, 'rb') as f:
+            return f.read(size)
+
+    def append(self, offset, stream, length):
+        """
+        Appends `length` bytes read from `stream` at `offset`.
+        The start of the file is checked against the expected signature before
+        it is written; a chunk that does not match is rejected without touching
+        the upload.
+        """
+        if length <= 0 or length > settings.UPLOAD_CHUNK_MAX_BYTES:
+            raise ValidationError(f"Chunks must be between 1 and {settings.UPLOAD_CHUNK_MAX_BYTES} bytes.")
+        with self._locked():
+            if self.meta['committed']:
+                raise ValidationError("This upload has already been committed.")
+            if offset != self.offset:
+                raise ValidationError(f"Chunk offset {offset} does not match the upload offset {self.offset}.")
+            if offset + length > self.meta['size']:
+                raise ValidationError("Chunk extends past the declared file size.")
+
+            kind = self.meta['kind']
+            needed = magic_length(kind)
+            checked = offset >= needed
+            head = b'' if checked else self._head(offset)
+            pending = b''
+            remaining = length
+            with open(self.data_path, 'ab') as f:
+                while remaining:
+                    block = stream.read(min(READ_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    if not checked:
+                        # Hold back the start of the file until the whole signature can be checked.
+                        pending += block
+                        if len(head) + len(pending) < needed and remaining:
+                            continue
+                        check_magic(kind, head + pending, partial=True)
+                        checked = True
+                        block, pending = pending, b''
+                    f.write(block)
+            if remaining:
+                # Drop the short chunk so the client can resend it from the same offset.
+                with open(self.data_path, 'r+b') as f:
+                    f.truncate(offset)
+                raise ValidationError("Request body is shorter than the declared chunk length.")
+            return self.offset
+
+    def commit(self):
+        """Moves the completed file into media storage and records its path and hash."""
+        with self._locked():
+            if self.meta['committed']:
+                return self
+            if self.offset != self.meta['size']:
+                raise ValidationError(f"Upload is incomplete: {self.offset} of {self.meta['size']} bytes received.")
+            check_magic(self.meta['kind'], self._head(magic_length(self.meta['kind'])))
+            storage_name = f"{UPLOAD_KINDS[self.meta['kind']]['storage_dir']}/{self.meta['filename']}"
+            with open(self.data_path, 'rb') as f:
+                content = HashingFile(File(f, name=self.meta['filename']))
+                self.meta['file_path'] = default_storage.save(storage_name, content)
+            self.meta['sha256'] = content.sha256
+            self.meta['committed'] = True
+            os.remove(self.data_path)
+            self._save_meta()
+            return self
+
+    def delete(self):
+        shutil.rmtree(self._dir(self.upload_id), ignore_errors=True)
+
+    def check_usable_for(self, project_id, kind):
+        """Validates that this upload can be attached to a new submission."""
+        if self.meta['kind'] != kind or self.meta['project_id'] != project_id:
+            raise ValidationError(f"Upload {self.upload_id} is not a {kind.replace('_', ' ')} upload for this project.")
+        if not self.meta['committed']:
+            raise ValidationError(f"Upload {self.upload_id} has not been committed.")
+
+    def to_representation(self):
+        return {
+            'upload_id': self.upload_id,
+            'project_id': self.meta['project_id'],
+            'kind': self.meta['kind'],
+            'filename': self.meta['filename'],
+            'size': self.meta['size'],
+            'offset': self.meta['size'] if self.meta['committed'] else self.offset,
+            'committed': self.meta['committed'],
+            'chunk_size': settings.UPLOAD_CHUNK_MAX_BYTES,
+        }
+
+
+def purge_stale_sessions(max_age_seconds):
+    """Removes upload sessions older than `max_age_seconds`. Returns the number removed."""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    if not os.path.isdir(settings.UPLOAD_SESSION_DIR):
+        return removed
+    for upload_id in os.listdir(settings.UPLOAD_SESSION_DIR):
+        session_dir = os.path.join(settings.UPLOAD_SESSION_DIR, upload_id)
+        try:
+            created_at = os.path.getmtime(os.path.join(session_dir, 'meta.json'))
+        except OSError:
+            created_at = os.path.getmtime(session_dir)
+        if created_at < cutoff:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,16 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ProjectListCreateView, ProjectDetailView,
     SubmissionListCreateView, SubmissionDetailView,
+    UploadSessionCreateView, UploadSessionDetailView, UploadCommitView,
     RubricListCreateView, RubricDetailView, # Added RubricDetailView
-    EvaluationListCreateView,
+    EvaluationListCreateView, EvaluationBulkUpsertView,
     FinalizeEvaluationView,
     TriggerAIEvaluationView, # Added TriggerAIEvaluationView
+    BatchAIEvaluationView,
     LeaderboardView,
     MySubmissionsListView,
-    ProfileDetailView # Added ProfileDetailView
+    ProfileDetailView, # Added ProfileDetailView
+    ExtractionCacheStatsView, AuthCacheStatsView, DynamoDBStatsView
 )
 
+if settings.ASYNC_VIEWS:
+    # Same endpoints without holding a thread while waiting on the model or DynamoDB (ASGI only).
+    from .async_views import (
+        AsyncSubmissionListCreateView as SubmissionListCreateView,
+        AsyncTriggerAIEvaluationView as TriggerAIEvaluationView,
+        AsyncFinalizeEvaluationView as FinalizeEvaluationView,
+        AsyncLeaderboardView as LeaderboardView,
+    )
+
 urlpatterns = [
     # NEW: Profile URL
     path('api/profiles/<str:username>/', ProfileDetailView.as_view(), name='profile-detail'),
@@ -24,6 +37,11 @@ urlpatterns = [
     path('api/submissions/my-submissions/', MySubmissionsListView.as_view(), name='my-submissions-list'),
     path('api/submissions/<str:submission_id>/', SubmissionDetailView.as_view(), name='submission-detail'),
 
+    # Chunked, resumable upload URLs (report / source code files)
+    path('api/uploads/', UploadSessionCreateView.as_view(), name='upload-create'),
+    path('api/uploads/<str:upload_id>/', UploadSessionDetailView.as_view(), name='upload-detail'),
+    path('api/uploads/<str:upload_id>/commit/', UploadCommitView.as_view(), name='upload-commit'),
+
     # Rubric URLs
     path('api/projects/<str:project_id>/rubrics/', RubricListCreateView.as_view(), name='rubric-list-create'),
     # NEW: URL for updating/deleting a specific rubric
@@ -31,10 +49,18 @@ urlpatterns = [
 
     # Evaluation URLs
     path('api/submissions/<str:submission_id>/evaluations/', EvaluationListCreateView.as_view(), name='evaluation-list-create'),
+    path('api/submissions/<str:submission_id>/evaluations/bulk/', EvaluationBulkUpsertView.as_view(), name='evaluation-bulk-upsert'),
     # NEW: URL for triggering AI evaluation
     path('api/submissions/<str:submission_id>/trigger_ai_evaluation/', TriggerAIEvaluationView.as_view(), name='trigger-ai-evaluation'),
     path('api/submissions/<str:submission_id>/finalize_evaluation/', FinalizeEvaluationView.as_view(), name='finalize-evaluation'),
+    path('api/projects/<str:project_id>/batch_ai_evaluation/', BatchAIEvaluationView.as_view(), name='batch-ai-evaluation'),
+    path('api/projects/<str:project_id>/batch_ai_evaluation/<str:job_id>/', BatchAIEvaluationView.as_view(), name='batch-ai-evaluation-status'),
 
     # Leaderboard URL
     path('api/leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+
+    # System statistics (staff only)
+    path('api/system/auth-cache/', AuthCacheStatsView.as_view(), name='auth-cache-stats'),
+    path('api/system/extraction-cache/', ExtractionCacheStatsView.as_view(), name='extraction-cache-stats'),
+    path('api/system/dynamodb/', DynamoDBStatsView.as_view(), name='dynamodb-stats'),
 ]
\ No newline at end of file
@@ -1,13 +1,46 @@
 import boto3
+import hashlib
+import threading
 from django.conf import settings
+from django.core.files import File
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import logging
 
 logger = logging.getLogger(__name__)
 
+_ses_client = None
+_ses_client_lock = threading.Lock()
+
+
+def get_ses_client():
+    """
+    Returns the process-wide SES client. boto3 clients are thread-safe and keep
+    a pool of HTTPS connections, so one client is reused for every email.
+    Throttling is handled by the outbox (Proj/outbox.py), so botocore's own
+    retries are limited to transient network errors.
+    """
+    global _ses_client
+    if _ses_client is None:
+        with _ses_client_lock:
+            if _ses_client is None:
+                _ses_client = boto3.client(
+                    'ses',
+                    region_name=settings.AWS_SES_REGION_NAME,
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    config=Config(
+                        max_pool_connections=settings.EMAIL_OUTBOX['SES_MAX_POOL_CONNECTIONS'],
+                        retries={'mode': 'standard', 'max_attempts': 2},
+                    )
+                )
+    return _ses_client
+
+
 def send_email_ses(recipient_email, subject, body_text, body_html=None):
     """
-    Sends an email using AWS Simple Email Service (SES).
+    Sends an email using AWS Simple Email Service (SES), synchronously.
+    Request handlers should use Proj.outbox.queue_email instead.
 
     Args:
         recipient_email (str): The email address of the recipient.
@@ -23,15 +56,7 @@ def send_email_ses(recipient_email, subject, body_text, body_html=None):
         return False
 
     sender = settings.AWS_SES_SOURCE_EMAIL
-    aws_region = settings.AWS_SES_REGION_NAME
-
-    # Create a new SES client
-    client = boto3.client(
-        'ses',
-        region_name=aws_region,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-    )
+    client = get_ses_client()
 
     # The character encoding for the email.
     CHARSET = "UTF-8"
@@ -67,4 +92,26 @@ def send_email_ses(recipient_email, subject, body_text, body_html=None):
         return False
     else:
         logger.info(f"Email sent! Message ID: {response['MessageId']}")
-        return True
\ No newline at end of file
+        return True
+
+
+class HashingFile(File):
+    """
+    Wraps an uploaded file so its SHA-256 is computed while storage reads it.
+
+    Storage backends copy content through `chunks()`, so hashing there avoids
+    a second pass over the file. Wrapping also hides `temporary_file_path()`,
+    which would otherwise let FileSystemStorage move the file without reading it.
+    """
+    def __init__(self, file):
+        super().__init__(file, name=file.name)
+        self._digest = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self._digest.update(chunk)
+            yield chunk
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+
+from pynamodb.exceptions import TransactWriteError
+from pynamodb.transactions import TransactWrite
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .leaderboard import entry_id_for
+from .models import SubmissionModel, SubmissionCounterModel, LeaderboardEntryModel, get_transaction_connection
+
+logger = logging.getLogger(__name__)
+
+MAX_SUBMISSIONS_PER_PROJECT = 3
+
+
+class ConcurrentSubmission(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Another submission for this project was saved at the same time. Please try again."
+    default_code = 'concurrent_submission'
+
+
+def counter_id_for(project_id, student_username):
+    return f"{project_id}#{student_username}"
+
+
+def load_counter(project_id, student_username):
+    """
+    Returns the submission counter of a student in a project (one GetItem).
+
+    A missing counter is seeded from the student's existing submissions, for
+    data written before counters existed. The seeded counter is not saved here;
+    write_new_version creates it with a condition that it still does not exist.
+    """
+    counter_id = counter_id_for(project_id, student_username)
+    try:
+        counter = SubmissionCounterModel.get(counter_id)
+        counter.is_new = False
+        return counter
+    except SubmissionCounterModel.DoesNotExist:
+        pass
+    counter = SubmissionCounterModel(
+        counter_id=counter_id, project_id=project_id, student_username=student_username
+    )
+    counter.is_new = True
+    existing = list(SubmissionModel.project_student_index.query(
+        project_id,
+        SubmissionModel.student_username == student_username,
+        attributes_to_get=['submission_id', 'version', 'is_latest']
+    ))
+    if existing:
+        latest = max(existing, key=lambda s: (bool(s.is_latest), s.version or 0))
+        counter.latest_version = max(len(existing), max(s.version or 0 for s in existing))
+        counter.latest_submission_id = latest.submission_id
+    return counter
+
+
+def check_can_submit(counter):
+    if counter.latest_version >= MAX_SUBMISSIONS_PER_PROJECT:
+        raise ValidationError(
+            f"You have reached the maximum of {MAX_SUBMISSIONS_PER_PROJECT} submissions for this project."
+        )
+
+
+def write_new_version(submission, counter):
+    """
+    Saves `submission` as the student's next version in one DynamoDB transaction:
+    the counter is incremented only if it still holds the value read by
+    load_counter, the new item is put, the previous version loses is_latest and
+    the student's leaderboard entry is removed until the new version is evaluated.
+
+    Raises:
+        ValidationError: The student already used all attempts.
+        ConcurrentSubmission: Another submission changed the counter first.
+    """
+    check_can_submit(counter)
+    previous_version = counter.latest_version
+    previous_submission_id = counter.latest_submission_id
+    submission.version = previous_version + 1
+    submission.is_latest = True
+
+    if counter.is_new:
+        counter_condition = SubmissionCounterModel.counter_id.does_not_exist()
+    else:
+        counter_condition = SubmissionCounterModel.latest_version == previous_version
+    try:
+        with TransactWrite(connection=get_transaction_connection()) as transaction:
+            transaction.update(
+                SubmissionCounterModel(counter.counter_id),
+                actions=[
+                    SubmissionCounterModel.project_id.set(counter.project_id),
+                    SubmissionCounterModel.student_username.set(counter.student_username),
+                    SubmissionCounterModel.latest_version.set(submission.version),
+                    SubmissionCounterModel.latest_submission_id.set(submission.submission_id),
+                    SubmissionCounterModel.updated_at.set(datetime.utcnow()),
+                ],
+                condition=counter_condition
+            )
+            transaction.save(submission, condition=SubmissionModel.submission_id.does_not_exist())
+            if previous_submission_id:
+                transaction.update(
+                    SubmissionModel(previous_submission_id),
+                    actions=[SubmissionModel.is_latest.set(False)],
+                    condition=SubmissionModel.submission_id.exists()
+                )
+            transaction.delete(LeaderboardEntryModel(entry_id_for(counter.project_id, counter.student_username)))
+    except TransactWriteError as e:
+        # PynamoDB sends deletes and puts before updates, so the counter's reason is not
+        # necessarily first. Every condition here fails only on a concurrent write.
+        reasons = e.cancellation_reasons or []
+        if any(reason is not None and reason.code == 'ConditionalCheckFailed' for reason in reasons):
+            logger.info(f"Concurrent submission for {counter.counter_id} rejected")
+            raise ConcurrentSubmission()
+        raise
+
+    counter.latest_version = submission.version
+    counter.latest_submission_id = submission.submission_id
+    counter.is_new = False
+    return submission
@@ -1,16 +1,35 @@
+import logging
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
 from django.conf import settings
-from pynamodb.exceptions import DoesNotExist
 from datetime import date, datetime
 
 from .models import ProjectModel, SubmissionModel, RubricModel, EvaluationModel, UserProfileModel
 from .serializers import SubmissionSerializer, ProjectSerializer, RubricSerializer, EvaluationSerializer, UserProfileSerializer
-from .utils import send_email_ses
-from ml_evaluator.evaluator import get_ai_evaluation
-from .pdf_extractor import extract_text_from_local_pdf
+from .tasks import process_submission
+from .notifications import submission_received, submission_evaluated
+from .authentication import verified_tokens
+from .jwks import get_jwks_provider
+from .dynamodb_metrics import dynamodb_stats
+from .extraction_cache import get_extraction_cache
+from .uploads import UploadSession
+from .batch_evaluation import batch_ai_evaluation, batch_options
+from .jobs import get_queue
+from .ai_evaluation import get_or_create_ai_evaluation, stream_or_create_ai_evaluation, total_ml_score
+from .leaderboard import record_score, rename_project, query_leaderboard, to_representation
+from .loaders import get_loaders
+from .catalog_cache import get_catalog_cache
+from .versioning import load_counter, check_can_submit
+from .evaluations import (
+    upsert_manual_evaluation, bulk_upsert_manual_evaluations, one_per_rubric, MAX_BULK_EVALUATIONS
+)
+from .pagination import check_start_key, page_params, paginated_response, query_partitions
+from .sse import STREAMING_RENDERER_CLASSES, event_stream_response, wants_event_stream
+
+logger = logging.getLogger(__name__)
 
 class SubmissionListCreateView(APIView):
     """Create a new submission. (Students only)."""
@@ -21,75 +40,117 @@ class SubmissionListCreateView(APIView):
             raise PermissionDenied("Only students can create submissions.")
 
         # Pass request data to the serializer. DRF handles merging request.data and request.FILES.
-        serializer = SubmissionSerializer(data=request.data)
+        serializer = SubmissionSerializer(data=request.data, context={'request': request})
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         project_id = serializer.validated_data['project_id']
-        try:
-            project = ProjectModel.get(project_id)
-        except DoesNotExist:
-            raise NotFound(detail="Project not found.")
+        project = get_loaders(request)[ProjectModel].load_or_404(project_id, "Project not found.")
 
         if project.end_date < date.today():
             raise ValidationError("The submission deadline for this project has passed.")
 
-        existing_submissions = list(SubmissionModel.project_student_index.query(
-            hash_key=project_id,
-            range_key_condition=SubmissionModel.student_username == request.user.username
-        ))
-        
-        if len(existing_submissions) >= 3:
-            raise ValidationError("You have reached the maximum of 3 submissions for this project.")
-        
-        # Set previous submissions to not be the latest
-        with SubmissionModel.batch_write() as batch:
-            for sub in existing_submissions:
-                sub.is_latest = False
-                batch.save(sub)
+        # One GetItem; the limit is enforced again atomically when the submission is written.
+        counter = load_counter(project_id, request.user.username)
+        check_can_submit(counter)
 
-        submission_version = len(existing_submissions) + 1
-            
-        # The serializer's create method now handles file saving.
+        # The serializer's create method handles file saving and writes the new version
+        # (see Proj/versioning.py). PDF extraction runs in the background job worker
+        # (see Proj/tasks.py) and the confirmation email goes through the outbox (Proj/outbox.py).
         submission = serializer.save(
             student_username=request.user.username,
-            version=submission_version,
-            is_latest=True
+            student_email=request.user.email or None,
+            status='Processing',
+            _counter=counter
         )
+        submission_version = submission.version
 
-        # Extract text from the locally saved PDF and update the submission.
-        if submission.report_file_path:
-            extracted_text = extract_text_from_local_pdf(submission.report_file_path)
-            if extracted_text:
-                submission.update(actions=[
-                    SubmissionModel.report_content_summary.set(extracted_text)
-                ])
-                # Refresh the submission object to include the summary in the response
-                submission.refresh()
-            else:
-                print(f"WARNING: Could not extract text from PDF for submission {submission.submission_id}")
-
-        if settings.AWS_SES_SOURCE_EMAIL and request.user.email:
-            send_email_ses(
-                recipient_email=request.user.email,
-                subject=f"Submission Confirmation (Attempt {submission_version}): {project.title}",
-                body_text=f"Your submission (version {submission_version}) for '{project.title}' has been received."
-            )
+        process_submission.delay(submission_id=submission.submission_id)
+
+        submission_received(request.user.email, project.title, submission_version)
             
         # Return the data using the same serializer to ensure a consistent response format.
-        return Response(SubmissionSerializer(submission).data, status=status.HTTP_201_CREATED)
+        return Response(SubmissionSerializer(submission).data, status=status.HTTP_202_ACCEPTED)
+
+class UploadSessionCreateView(APIView):
+    """
+    Start a chunked, resumable upload of a report or source code file. (Students only).
+
+    Cheap checks (project, deadline, attempts left, file type and declared size
+    against the project's limit) happen here, before any bytes are sent.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if request.user.is_staff:
+            raise PermissionDenied("Only students can upload submission files.")
+        project_id = request.data.get('project_id')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            raise ValidationError("A numeric 'size' in bytes is required.")
+        project = get_loaders(request)[ProjectModel].load_or_404(project_id, "Project not found.")
+        if project.end_date < date.today():
+            raise ValidationError("The submission deadline for this project has passed.")
+        check_can_submit(load_counter(project_id, request.user.username))
+
+        session = UploadSession.create(
+            owner=request.user.username,
+            project=project,
+            kind=request.data.get('kind', 'report'),
+            filename=request.data.get('filename'),
+            size=size
+        )
+        return Response(session.to_representation(), status=status.HTTP_201_CREATED)
+
+class UploadSessionDetailView(APIView):
+    """
+    GET returns the current offset of an upload so an interrupted client can resume.
+    PUT appends one chunk; the body is the raw bytes and the offset is given with
+    a `Content-Range: bytes <start>-<end>/<total>` header.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, upload_id):
+        session = UploadSession.load(upload_id, request.user.username)
+        return Response(session.to_representation())
+
+    def put(self, request, upload_id):
+        session = UploadSession.load(upload_id, request.user.username)
+        content_range = request.META.get('HTTP_CONTENT_RANGE', '')
+        try:
+            unit, _, byte_range = content_range.partition(' ')
+            start, end = (int(part) for part in byte_range.split('/')[0].split('-'))
+        except ValueError:
+            raise ValidationError("A 'Content-Range: bytes <start>-<end>/<total>' header is required.")
+        if unit != 'bytes' or end < start:
+            raise ValidationError("Invalid Content-Range header.")
+        length = end - start + 1
+        if int(request.META.get('CONTENT_LENGTH') or 0) != length:
+            raise ValidationError("Content-Length does not match the Content-Range header.")
+
+        # Read the raw body in small blocks; request.data is never touched, so
+        # the chunk is never buffered in memory as a whole.
+        session.append(start, request.stream, length)
+        return Response(session.to_representation())
+
+class UploadCommitView(APIView):
+    """Finish an upload once all bytes are received; the returned upload_id can then be submitted."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, upload_id):
+        session = UploadSession.load(upload_id, request.user.username)
+        session.commit()
+        return Response(session.to_representation())
 
 # --- The rest of the views remain unchanged, so they are included for completeness ---
 
 def get_submission_and_check_permission(submission_id, request):
     """Fetches a submission and verifies user has permission to view it."""
-    try:
-        submission = SubmissionModel.get(submission_id)
-        if not request.user.is_staff and submission.student_username != request.user.username:
-            raise PermissionDenied("You do not have permission to view this submission.")
-        return submission
-    except DoesNotExist:
-        raise NotFound(detail="Submission not found.")
+    submission = get_loaders(request)[SubmissionModel].load_or_404(submission_id, "Submission not found.")
+    if not request.user.is_staff and submission.student_username != request.user.username:
+        raise PermissionDenied("You do not have permission to view this submission.")
+    return submission
 
 class ProfileDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -112,15 +173,54 @@ class ProfileDetailView(APIView):
         serializer.save(username=username)
         return Response(serializer.data)
 
+# Listings leave out the extracted report text; the detail endpoint returns it.
+SUBMISSION_LIST_ATTRIBUTES = [
+    name for name in SubmissionModel.get_attributes() if name != 'report_content_summary'
+]
+
+def parse_bool_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValidationError({name: "Must be true or false."})
+
+def owned_project_ids(username):
+    """Ids of the projects created by `username`, in a stable order."""
+    projects = ProjectModel.owner_index.query(username, attributes_to_get=['project_id'])
+    return [p.project_id for p in projects]
+
 class ProjectListCreateView(APIView):
+    """
+    Faculty get the projects they created (owner_index, newest first); students get
+    active projects ordered by deadline (active_index). `?open=true` limits the
+    list to projects accepting submissions today. Paginated with ?limit= and ?cursor=.
+    """
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request):
-        if request.user.is_staff:
-            projects = list(ProjectModel.scan(ProjectModel.created_by_username == request.user.username))
+        limit, last_evaluated_key = page_params(request, settings.PROJECTS_PAGE_SIZE)
+        open_only = parse_bool_param(request, 'open')
+        if request.user.is_staff and not open_only:
+            index, hash_key = ProjectModel.owner_index, request.user.username
+        else:
+            index, hash_key = ProjectModel.active_index, ProjectModel.ACTIVE_PARTITION
+        page = {
+            'limit': limit,
+            'page_size': limit,
+            'last_evaluated_key': check_start_key(last_evaluated_key, index, hash_key),
+        }
+        if open_only:
+            results = ProjectModel.query_active(open_on=date.today(), **page)
+        elif request.user.is_staff:
+            results = ProjectModel.owner_index.query(request.user.username, scan_index_forward=False, **page)
         else:
-            projects = list(ProjectModel.scan(ProjectModel.is_active == True))
+            results = ProjectModel.query_active(**page)
+        projects = list(results)
         serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        return paginated_response(serializer.data, results.last_evaluated_key if len(projects) == limit else None)
     def post(self, request):
         if not request.user.is_staff:
             raise PermissionDenied("Only faculty can create projects.")
@@ -132,33 +232,62 @@ class ProjectListCreateView(APIView):
 class ProjectDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get_object(self, project_id, request_user):
-        try:
-            project = ProjectModel.get(project_id)
-            if self.request.method != 'GET' and project.created_by_username != request_user.username:
-                 raise PermissionDenied("You do not have permission to modify this project.")
-            return project
-        except DoesNotExist:
-            raise NotFound(detail="Project not found.")
+        project = get_loaders(self.request)[ProjectModel].load_or_404(project_id, "Project not found.")
+        if self.request.method != 'GET' and project.created_by_username != request_user.username:
+            raise PermissionDenied("You do not have permission to modify this project.")
+        return project
     def get(self, request, project_id):
         project = self.get_object(project_id, request.user)
         serializer = ProjectSerializer(project)
         return Response(serializer.data)
     def put(self, request, project_id):
         project = self.get_object(project_id, request.user)
+        old_title = project.title
         serializer = ProjectSerializer(project, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        project = serializer.save()
+        if project.title != old_title:
+            rename_project(project_id, project.title)
         return Response(serializer.data)
 
 class MySubmissionsListView(APIView):
+    """
+    Students get their own submissions; staff get the submissions to the projects they own.
+    Query params: project_id, status, is_latest, limit, cursor (next page, see X-Next-Cursor).
+    """
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request):
+        limit, position = page_params(request, settings.SUBMISSIONS_PAGE_SIZE)
+        condition = None
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            condition = SubmissionModel.status == status_filter
+        is_latest = parse_bool_param(request, 'is_latest')
+        if is_latest is not None:
+            latest_condition = SubmissionModel.is_latest == is_latest
+            condition = latest_condition if condition is None else condition & latest_condition
+
+        project_id = request.query_params.get('project_id')
         if request.user.is_staff:
-            submissions = list(SubmissionModel.scan())
+            project_ids = owned_project_ids(request.user.username)
+            if project_id:
+                if project_id not in project_ids:
+                    raise PermissionDenied("You can only list submissions to your own projects.")
+                project_ids = [project_id]
+            index, hash_keys = SubmissionModel.project_student_index, project_ids
         else:
-            submissions = list(SubmissionModel.student_index.query(request.user.username))
+            if project_id:
+                student_condition = SubmissionModel.project_id == project_id
+                condition = student_condition if condition is None else condition & student_condition
+            index, hash_keys = SubmissionModel.student_index, [request.user.username]
+
+        submissions, next_position = query_partitions(
+            index, hash_keys, limit, position,
+            filter_condition=condition,
+            attributes_to_get=SUBMISSION_LIST_ATTRIBUTES
+        )
         serializer = SubmissionSerializer(submissions, many=True)
-        return Response(serializer.data)
+        return paginated_response(serializer.data, next_position)
 
 class SubmissionDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -170,18 +299,15 @@ class SubmissionDetailView(APIView):
 class RubricListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request, project_id):
-        rubrics = list(RubricModel.project_index.query(project_id))
+        rubrics = get_catalog_cache().get_rubrics(project_id)
         serializer = RubricSerializer(rubrics, many=True)
         return Response(serializer.data)
     def post(self, request, project_id):
         if not request.user.is_staff:
             raise PermissionDenied("Only faculty can create rubrics.")
-        try:
-            project = ProjectModel.get(project_id)
-            if project.created_by_username != request.user.username:
-                raise PermissionDenied("You can only add rubrics to your own projects.")
-        except DoesNotExist:
-            raise NotFound("Project not found.")
+        project = get_loaders(request)[ProjectModel].load_or_404(project_id, "Project not found.")
+        if project.created_by_username != request.user.username:
+            raise PermissionDenied("You can only add rubrics to your own projects.")
         serializer = RubricSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(project_id=project_id)
@@ -190,12 +316,9 @@ class RubricListCreateView(APIView):
 class RubricDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get_object(self, rubric_id, request_user):
-        if not request.user.is_staff:
+        if not request_user.is_staff:
             raise PermissionDenied("You do not have permission to manage rubrics.")
-        try:
-            return RubricModel.get(rubric_id)
-        except DoesNotExist:
-            raise NotFound("Rubric not found.")
+        return get_loaders(self.request)[RubricModel].load_or_404(rubric_id, "Rubric not found.")
     def put(self, request, project_id, rubric_id):
         rubric = self.get_object(rubric_id, request.user)
         serializer = RubricSerializer(rubric, data=request.data, partial=True)
@@ -205,19 +328,33 @@ class RubricDetailView(APIView):
     def delete(self, request, project_id, rubric_id):
         rubric = self.get_object(rubric_id, request.user)
         rubric.delete()
+        get_catalog_cache().invalidate_rubrics(rubric.project_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+def check_rubric_scores(request, submission, scores):
+    """Loads the rubrics of `scores` and checks they belong to the submission's project."""
+    rubrics = get_loaders(request)[RubricModel].load_many(score['rubric_id'] for score in scores)
+    for score in scores:
+        rubric = rubrics.get(score['rubric_id'])
+        if rubric is None or rubric.project_id != submission.project_id:
+            raise ValidationError({"rubric_id": f"Rubric {score['rubric_id']} is not part of this project."})
+        if score['points_awarded'] > rubric.max_points:
+            raise ValidationError({"points_awarded": f"{rubric.criterion} allows at most {rubric.max_points} points."})
+    return rubrics
+
 class EvaluationListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request, submission_id):
         submission = get_submission_and_check_permission(submission_id, request)
-        evaluations = list(EvaluationModel.submission_index.query(submission_id))
+        # Items holding only an AI result (no manual score yet) are not listed as evaluations.
+        evaluations = [
+            e for e in one_per_rubric(EvaluationModel.submission_index.query(submission_id))
+            if e.points_awarded is not None
+        ]
         if evaluations:
-            rubric_ids = [e.rubric_id for e in evaluations if e.rubric_id]
-            if rubric_ids:
-                rubric_map = {r.rubric_id: r for r in RubricModel.scan(RubricModel.rubric_id.is_in(*rubric_ids))}
-                for e in evaluations:
-                    e.rubric = rubric_map.get(e.rubric_id)
+            rubric_map = get_loaders(request)[RubricModel].load_many(e.rubric_id for e in evaluations)
+            for e in evaluations:
+                e.rubric = rubric_map.get(e.rubric_id)
         serializer = EvaluationSerializer(evaluations, many=True)
         return Response(serializer.data)
     def post(self, request, submission_id):
@@ -226,68 +363,124 @@ class EvaluationListCreateView(APIView):
         submission = get_submission_and_check_permission(submission_id, request)
         serializer = EvaluationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        existing_evals = list(EvaluationModel.scan(
-            (EvaluationModel.submission_id == submission_id) &
-            (EvaluationModel.rubric_id == serializer.validated_data['rubric_id'])
-        ))
-        if existing_evals:
-            evaluation = existing_evals[0]
-            evaluation.update(actions=[
-                EvaluationModel.points_awarded.set(serializer.validated_data['points_awarded']),
-                EvaluationModel.feedback.set(serializer.validated_data.get('feedback', '')),
-                EvaluationModel.evaluated_at.set(datetime.utcnow()),
-                EvaluationModel.evaluated_by_username.set(request.user.username)
-            ])
-        else:
-            evaluation = serializer.save(
-                submission_id=submission_id,
-                evaluated_by_username=request.user.username
-            )
-        submission.update(actions=[SubmissionModel.status.set('Under Evaluation')])
-        refreshed_evaluation = EvaluationModel.get(evaluation.evaluation_id)
-        if refreshed_evaluation.rubric_id:
-            try:
-                refreshed_evaluation.rubric = RubricModel.get(refreshed_evaluation.rubric_id)
-            except DoesNotExist:
-                refreshed_evaluation.rubric = None
-        return Response(EvaluationSerializer(refreshed_evaluation).data, status=status.HTTP_201_CREATED)
+        rubrics = check_rubric_scores(request, submission, [serializer.validated_data])
+        # One conditional UpdateItem creates or updates the item and returns it (ALL_NEW).
+        evaluation = upsert_manual_evaluation(
+            submission_id,
+            serializer.validated_data['rubric_id'],
+            serializer.validated_data['points_awarded'],
+            serializer.validated_data.get('feedback', ''),
+            request.user.username
+        )
+        if submission.status != 'Under Evaluation':
+            submission.update(actions=[SubmissionModel.status.set('Under Evaluation')])
+        evaluation.rubric = rubrics.get(evaluation.rubric_id)
+        return Response(EvaluationSerializer(evaluation).data, status=status.HTTP_201_CREATED)
+
+class EvaluationBulkUpsertView(APIView):
+    """
+    Save the manual scores of several rubrics at once (Faculty only). The body is a
+    list of {rubric_id, points_awarded, feedback}; all scores and the submission
+    status are written in one DynamoDB transaction.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    def post(self, request, submission_id):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only faculty can create evaluations.")
+        submission = get_submission_and_check_permission(submission_id, request)
+        serializer = EvaluationSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        scores = serializer.validated_data
+        if not scores:
+            raise ValidationError("Provide at least one rubric score.")
+        if len(scores) > MAX_BULK_EVALUATIONS:
+            raise ValidationError(f"At most {MAX_BULK_EVALUATIONS} rubric scores can be saved at once.")
+        if len({score['rubric_id'] for score in scores}) != len(scores):
+            raise ValidationError("Each rubric can only be scored once per request.")
+        rubrics = check_rubric_scores(request, submission, scores)
+        evaluations = bulk_upsert_manual_evaluations(submission, scores, request.user.username)
+        for evaluation in evaluations:
+            evaluation.rubric = rubrics.get(evaluation.rubric_id)
+        return Response(EvaluationSerializer(evaluations, many=True).data, status=status.HTTP_200_OK)
 
 class TriggerAIEvaluationView(APIView):
+    """
+    AI score suggestions for a submission. With `Accept: text/event-stream` the
+    criteria are streamed as server-sent events as the model produces them
+    (start, criterion..., then result or error).
+    """
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = STREAMING_RENDERER_CLASSES
     def post(self, request, submission_id):
         if not request.user.is_staff:
             raise PermissionDenied("Only faculty can trigger AI evaluation.")
-        try:
-            submission = SubmissionModel.get(submission_id)
-        except DoesNotExist:
-            raise NotFound(detail="Submission not found.")
+        submission = get_loaders(request)[SubmissionModel].load_or_404(submission_id, "Submission not found.")
         if not submission.report_content_summary:
             return Response(
                 {"detail": "Submission has no text content to analyze. PDF extraction might have failed."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        rubrics = list(RubricModel.project_index.query(submission.project_id))
+        rubrics = get_catalog_cache().get_rubrics(submission.project_id)
         if not rubrics:
             return Response(
                 {"detail": "This project has no rubrics defined. AI evaluation cannot proceed."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ml_results = get_ai_evaluation(submission.report_content_summary, rubrics)
+        if wants_event_stream(request):
+            return event_stream_response(stream_or_create_ai_evaluation(submission, rubrics))
+        # Stored results are reused while the report text, rubrics and model are unchanged.
+        ml_results = get_or_create_ai_evaluation(submission, rubrics)
         if "error" in ml_results:
             return Response({"detail": ml_results["error"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(ml_results, status=status.HTTP_200_OK)
 
+class BatchAIEvaluationView(APIView):
+    """
+    Start (POST) or follow (GET with a job id) an AI evaluation of the latest
+    submission of every student in a project. (Project owner only).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def check_owner(self, request, project_id):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only faculty can run batch AI evaluations.")
+        project = get_loaders(request)[ProjectModel].load_or_404(project_id, "Project not found.")
+        if project.created_by_username != request.user.username:
+            raise PermissionDenied("You can only evaluate submissions of your own projects.")
+
+    def post(self, request, project_id):
+        self.check_owner(request, project_id)
+        concurrency, rate = batch_options(request.data)
+        job_id = batch_ai_evaluation.delay(project_id=project_id, concurrency=concurrency, rate=rate)
+        return Response({"job_id": job_id, "status": "queued"}, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request, project_id, job_id):
+        self.check_owner(request, project_id)
+        job = get_queue().get(job_id)
+        if job is None or job['task_name'] != batch_ai_evaluation.task_name or job['payload']['project_id'] != project_id:
+            raise NotFound(detail="Batch evaluation not found.")
+        return Response({
+            "job_id": job_id,
+            "status": job['status'],
+            "attempts": job['attempts'],
+            "progress": job['progress'],
+            "last_error": job['last_error'],
+        })
+
 class FinalizeEvaluationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request, submission_id):
         if not request.user.is_staff:
             raise PermissionDenied("Only faculty can finalize evaluations.")
         submission = get_submission_and_check_permission(submission_id, request)
-        evaluations = list(EvaluationModel.submission_index.query(submission_id))
+        evaluations = [
+            e for e in one_per_rubric(EvaluationModel.submission_index.query(submission_id))
+            if e.points_awarded is not None
+        ]
         if not evaluations:
             raise ValidationError("Cannot finalize. No manual evaluations found.")
         total_manual_score = sum(e.points_awarded for e in evaluations)
-        rubrics = list(RubricModel.project_index.query(submission.project_id))
+        rubrics = get_catalog_cache().get_rubrics(submission.project_id)
         if not rubrics:
             return Response(
                 {"detail": "This project has no rubrics defined. AI evaluation cannot proceed."},
@@ -298,56 +491,85 @@ class FinalizeEvaluationView(APIView):
                 {"detail": "Cannot finalize. Submission has no text content for AI evaluation."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ml_results = get_ai_evaluation(submission.report_content_summary, rubrics)
+        # Reuses the results faculty reviewed via trigger_ai_evaluation when they are still valid.
+        ml_results = get_or_create_ai_evaluation(submission, rubrics)
         if "error" in ml_results:
             return Response({"detail": ml_results["error"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # FIX: Correctly parse the potentially nested dictionary returned by the AI.
-        # This handles cases where the score is inside a 'value' key.
-        total_ml_score = 0
-        for key, value in ml_results.items():
-            if key.endswith('_score'):
-                if isinstance(value, (int, float)):
-                    total_ml_score += value
-                elif isinstance(value, dict) and 'value' in value and isinstance(value['value'], (int, float)):
-                    total_ml_score += value['value']
+        ml_score = total_ml_score(ml_results)
 
         weight = settings.ML_SCORE_WEIGHT
-        final_score = (total_manual_score * (1 - weight)) + (total_ml_score * weight)
+        final_score = (total_manual_score * (1 - weight)) + (ml_score * weight)
         
         submission.update(actions=[
             SubmissionModel.manual_score.set(total_manual_score),
-            SubmissionModel.ml_score.set(total_ml_score),
+            SubmissionModel.ml_score.set(ml_score),
             SubmissionModel.overall_score.set(round(final_score, 2)),
             SubmissionModel.status.set('Evaluated')
         ])
-        
+        project = get_loaders(request)[ProjectModel].load(submission.project_id)
+        project_title = project.title if project else None
+        record_score(submission, project_title=project_title)
+        submission_evaluated(submission, project_title or submission.title)
+
         return Response({
             "status": "Evaluation finalized",
             "manual_score": total_manual_score,
-            "ml_score": total_ml_score,
+            "ml_score": ml_score,
             "final_score": final_score
         }, status=status.HTTP_200_OK)
 
 class LeaderboardView(APIView):
+    """
+    Ranked latest evaluated submissions, highest score first.
+    Query params: project_id (per-project board), limit (top K), cursor (next page, see X-Next-Cursor).
+    """
     permission_classes = [permissions.AllowAny]
     def get(self, request):
+        limit, last_evaluated_key = page_params(request, settings.LEADERBOARD_PAGE_SIZE)
         try:
-            all_submissions = list(SubmissionModel.scan(
-                (SubmissionModel.overall_score.exists()) & (SubmissionModel.is_latest == True)
-            ))
-            if not all_submissions:
-                return Response([])
-            project_ids = {s.project_id for s in all_submissions}
-            projects = ProjectModel.scan(ProjectModel.project_id.is_in(*list(project_ids)))
-            project_map = {p.project_id: p.title for p in projects}
-            leaderboard_data = [{
-                'student_username': s.student_username,
-                'project_title': project_map.get(s.project_id, 'N/A'),
-                'total_points': s.overall_score,
-                'submission_id': s.submission_id
-            } for s in all_submissions]
-            leaderboard_data.sort(key=lambda x: x['total_points'], reverse=True)
-            return Response(leaderboard_data)
-        except Exception as e:
-            return Response({"detail": f"Error generating leaderboard: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            entries, next_key = query_leaderboard(
+                project_id=request.query_params.get('project_id'),
+                limit=limit,
+                last_evaluated_key=last_evaluated_key
+            )
+        except ValidationError:
+            raise
+        except Exception:
+            logger.exception("Error generating leaderboard")
+            return Response({"detail": "Error generating leaderboard."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return paginated_response([to_representation(e) for e in entries], next_key)
+
+class AuthCacheStatsView(APIView):
+    """Verified-token cache hit rate, verification latency and JWKS fetch counters. (Staff only)."""
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can view system statistics.")
+        return Response({**verified_tokens.stats(), 'jwks': get_jwks_provider().stats})
+
+class DynamoDBStatsView(APIView):
+    """
+    DynamoDB calls since the process started: consumed capacity, items, retries and
+    throttling per view (or background job), and latency per model and operation.
+    DELETE resets the counters. (Staff only).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can view system statistics.")
+        return Response(dynamodb_stats.snapshot())
+
+    def delete(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can reset system statistics.")
+        dynamodb_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ExtractionCacheStatsView(APIView):
+    """Hit/miss counters and size of the PDF extraction cache. (Staff only)."""
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied("Only staff can view system statistics.")
+        return Response(get_extraction_cache().stats())
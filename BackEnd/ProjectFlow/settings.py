@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import json
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,12 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Proj.metrics.PhaseTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Ensure 'corsheaders.middleware.CorsMiddleware' is here
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Proj.dynamodb_metrics.DynamoDBMetricsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,6 +76,21 @@ DATABASES = {
     }
 }
 
+# Caches. 'shared' is seen by every process (web workers and job workers): Redis when
+# CACHE_REDIS_URL is set (needs the redis package), otherwise files under SHARED_CACHE_DIR,
+# which covers the processes of one host.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', os.path.join(BASE_DIR, 'shared_cache')),
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -112,11 +130,25 @@ REST_FRAMEWORK = {
 CORS_ALLOWED_ORIGINS = ["http://localhost:5173"] # Only keep localhost
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_HEADERS = ['accept', 'authorization', 'content-type', 'user-agent', 'x-csrftoken', 'x-requested-with']
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor']
 
 # AWS Cognito - Still needed for authentication
 COGNITO_REGION = os.getenv('AWS_COGNITO_REGION', 'us-east-1')
 COGNITO_USER_POOL_ID = os.getenv('AWS_COGNITO_USER_POOL_ID')
 COGNITO_APP_CLIENT_ID = os.getenv('AWS_COGNITO_APP_CLIENT_ID')
+# JWKS used to verify tokens. Defaults to the user pool's URL; may be a file:// URL
+# or local path for offline use.
+COGNITO_JWKS_URL = os.getenv('COGNITO_JWKS_URL')
+COGNITO_JWKS_TTL = int(os.getenv('COGNITO_JWKS_TTL', '3600'))
+COGNITO_JWKS_REFRESH_AHEAD = int(os.getenv('COGNITO_JWKS_REFRESH_AHEAD', '300'))
+COGNITO_JWKS_TIMEOUT = float(os.getenv('COGNITO_JWKS_TIMEOUT', '5'))
+COGNITO_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('COGNITO_JWKS_MIN_REFRESH_INTERVAL', '30'))
+# Verified ID tokens kept in memory (per process) until they expire; 0 disables the cache.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '1024'))
+# Authenticated users are built from token claims. They are mirrored into the Django
+# User table (for the admin site) only when a (username, role) pair is first seen.
+AUTH_USER_SYNC_ENABLED = os.getenv('AUTH_USER_SYNC_ENABLED', 'True') == 'True'
+AUTH_USER_SYNC_TTL = int(os.getenv('AUTH_USER_SYNC_TTL', '3600'))
 
 # AWS Credentials (still needed for DynamoDB, SES, Cognito)
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
@@ -132,12 +164,111 @@ AWS_SES_SOURCE_EMAIL = os.getenv('AWS_SES_SOURCE_EMAIL')
 
 # DynamoDB Settings (for PynamoDB)
 DYNAMODB_REGION = os.getenv('AWS_DYNAMODB_REGION', COGNITO_REGION)
+DYNAMODB_HOST = os.getenv('DYNAMODB_HOST')  # e.g. http://localhost:8000 for DynamoDB Local; AWS when unset
+# Shared botocore connection pool and retry policy for every model (see BaseMeta in Proj/models.py).
+DYNAMODB_MAX_POOL_CONNECTIONS = int(os.getenv('DYNAMODB_MAX_POOL_CONNECTIONS', '10'))
+DYNAMODB_MAX_RETRY_ATTEMPTS = int(os.getenv('DYNAMODB_MAX_RETRY_ATTEMPTS', '3'))
+DYNAMODB_CONNECT_TIMEOUT_SECONDS = int(os.getenv('DYNAMODB_CONNECT_TIMEOUT_SECONDS', '5'))
+DYNAMODB_READ_TIMEOUT_SECONDS = int(os.getenv('DYNAMODB_READ_TIMEOUT_SECONDS', '15'))
+# Request phase timing (Proj/metrics.py): Server-Timing response header and the Prometheus /metrics endpoint.
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # scrapers send "Authorization: Bearer <token>"
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+# Per-view latency, consumed capacity and throttling of DynamoDB calls (Proj/dynamodb_metrics.py).
+DYNAMODB_INSTRUMENTATION = os.getenv('DYNAMODB_INSTRUMENTATION', 'true').lower() == 'true'
 DYNAMODB_PROJECTS_TABLE = os.getenv('DYNAMODB_PROJECTS_TABLE', 'ProjectFlow_Projects')
 DYNAMODB_SUBMISSIONS_TABLE = os.getenv('DYNAMODB_SUBMISSIONS_TABLE', 'ProjectFlow_Submissions')
 DYNAMODB_RUBRICS_TABLE = os.getenv('DYNAMODB_RUBRICS_TABLE', 'ProjectFlow_Rubrics')
 DYNAMODB_EVALUATIONS_TABLE = os.getenv('DYNAMODB_EVALUATIONS_TABLE', 'ProjectFlow_Evaluations')
 DYNAMODB_USER_PROFILES_TABLE = os.getenv('DYNAMODB_USER_PROFILES_TABLE', 'ProjectFlow_UserProfiles')
+DYNAMODB_LEADERBOARD_TABLE = os.getenv('DYNAMODB_LEADERBOARD_TABLE', 'ProjectFlow_Leaderboard')
+DYNAMODB_SUBMISSION_COUNTERS_TABLE = os.getenv('DYNAMODB_SUBMISSION_COUNTERS_TABLE', 'ProjectFlow_SubmissionCounters')
+# Async (ASGI) versions of the submission, AI evaluation, finalize and leaderboard views
+# (Proj/async_views.py). Only useful when served by an ASGI server, e.g.
+# `uvicorn ProjectFlow.asgi:application`. Their blocking calls share a pool of
+# ASYNC_VIEW_THREADS threads per process; keep DYNAMODB_MAX_POOL_CONNECTIONS at least as large.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', str(DYNAMODB_MAX_POOL_CONNECTIONS)))
+# In-process cache of projects and per-project rubric sets (Proj/catalog_cache.py); 0 TTL disables it.
+# Invalidations bump a version in the 'shared' cache, so every worker drops stale entries on its
+# next read. Should that cache be process-local, entries live CATALOG_CACHE_LOCAL_TTL seconds at most.
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+CATALOG_CACHE_LOCAL_TTL = int(os.getenv('CATALOG_CACHE_LOCAL_TTL', '5'))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '1024'))
 
 # ML Model Settings
 ML_SCORE_WEIGHT = float(os.getenv('ML_SCORE_WEIGHT', '0.3'))
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+# Model used for AI evaluation. 'ml_evaluator.backends.local.LocalBackend' is a
+# deterministic offline stand-in for development and benchmarks.
+ML_EVALUATOR_BACKEND = os.getenv('ML_EVALUATOR_BACKEND', 'ml_evaluator.backends.gemini.GeminiBackend')
+ML_EVALUATOR_OPTIONS = json.loads(os.getenv('ML_EVALUATOR_OPTIONS', '{}'))  # e.g. {"latency": 2.0, "failure_rate": 0.05}
+
+# Background job queue (submission processing, notifications).
+# Run the worker with: python manage.py run_jobs
+JOB_QUEUE = {
+    'BACKEND': 'Proj.jobs.SQLiteJobQueue',
+    'OPTIONS': {
+        'path': os.getenv('JOB_QUEUE_PATH', os.path.join(BASE_DIR, 'jobs.sqlite3')),
+        'lease_seconds': int(os.getenv('JOB_QUEUE_LEASE_SECONDS', '300')),
+    },
+    'TASK_MODULES': ['Proj.tasks', 'Proj.batch_evaluation'],
+    'MAX_ATTEMPTS': int(os.getenv('JOB_QUEUE_MAX_ATTEMPTS', '3')),
+    'RETRY_BACKOFF': float(os.getenv('JOB_QUEUE_RETRY_BACKOFF', '10')),
+    # Called by every worker every PERIODIC_INTERVAL seconds, busy or idle.
+    'PERIODIC_CALLBACKS': ['Proj.outbox.drain_outbox'],
+    'PERIODIC_INTERVAL': float(os.getenv('JOB_QUEUE_CALLBACK_INTERVAL', '5')),
+}
+
+# Email outbox (Proj/outbox.py), drained by the job worker or `manage.py drain_outbox`.
+# 'Proj.outbox.FileBackend' writes .eml files to FILE_PATH instead of sending.
+EMAIL_OUTBOX = {
+    'BACKEND': os.getenv('EMAIL_OUTBOX_BACKEND', 'Proj.outbox.SESBackend'),
+    'OPTIONS': {
+        'path': os.getenv('EMAIL_OUTBOX_PATH', os.path.join(BASE_DIR, 'outbox.sqlite3')),
+        'digest_window': float(os.getenv('EMAIL_DIGEST_WINDOW_SECONDS', '300')),
+        'max_attempts': int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5')),
+        'retry_backoff': float(os.getenv('EMAIL_OUTBOX_RETRY_BACKOFF', '30')),
+    },
+    'FILE_PATH': os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails')),
+    'BATCH_SIZE': int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50')),
+    'SES_MAX_POOL_CONNECTIONS': int(os.getenv('SES_MAX_POOL_CONNECTIONS', '10')),
+}
+
+# PDF text extraction engine (Proj/pdf_extractor.py)
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', str(min(os.cpu_count() or 1, 4))))
+PDF_EXTRACTION_TIMEOUT_SECONDS = float(os.getenv('PDF_EXTRACTION_TIMEOUT_SECONDS', '60'))
+PDF_EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv('PDF_EXTRACTION_MEMORY_LIMIT_MB', '512'))
+PDF_EXTRACTION_PAGES_PER_CHUNK = int(os.getenv('PDF_EXTRACTION_PAGES_PER_CHUNK', '10'))
+# Page ranges a pool process extracts before it is replaced by a fresh one.
+PDF_EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv('PDF_EXTRACTION_MAX_TASKS_PER_CHILD', '50'))
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', os.path.join(BASE_DIR, 'extraction_cache'))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+# Chunked uploads (Proj/uploads.py). Per-project limits on ProjectModel override the size defaults.
+UPLOAD_SESSION_DIR = os.getenv('UPLOAD_SESSION_DIR', os.path.join(BASE_DIR, 'upload_sessions'))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv('UPLOAD_CHUNK_MAX_BYTES', str(8 * 1024 * 1024)))
+UPLOAD_SESSION_MAX_AGE_HOURS = int(os.getenv('UPLOAD_SESSION_MAX_AGE_HOURS', '24'))
+UPLOAD_MAX_REPORT_SIZE_MB = int(os.getenv('UPLOAD_MAX_REPORT_SIZE_MB', '25'))
+UPLOAD_MAX_SOURCE_CODE_SIZE_MB = int(os.getenv('UPLOAD_MAX_SOURCE_CODE_SIZE_MB', '100'))
+
+# Project-wide batch AI evaluation (Proj/batch_evaluation.py)
+BATCH_AI_EVALUATION_CONCURRENCY = int(os.getenv('BATCH_AI_EVALUATION_CONCURRENCY', '4'))
+BATCH_AI_EVALUATION_RATE = float(os.getenv('BATCH_AI_EVALUATION_RATE', '1.0'))  # model calls per second
+# Upper bounds for the concurrency and rate a request may ask for.
+BATCH_AI_EVALUATION_MAX_CONCURRENCY = int(os.getenv('BATCH_AI_EVALUATION_MAX_CONCURRENCY', '16'))
+BATCH_AI_EVALUATION_MAX_RATE = float(os.getenv('BATCH_AI_EVALUATION_MAX_RATE', '10.0'))
+
+# Prompt construction for AI evaluation (ml_evaluator/preprocess.py). Token counts are estimates.
+ML_PROMPT_TOKEN_BUDGET = int(os.getenv('ML_PROMPT_TOKEN_BUDGET', '6000'))
+ML_SUMMARY_CHUNK_TOKENS = int(os.getenv('ML_SUMMARY_CHUNK_TOKENS', '4000'))
+ML_SUMMARY_MAX_WORDS = int(os.getenv('ML_SUMMARY_MAX_WORDS', '250'))
+# Chunks of a long report summarized at the same time (each is one model call).
+ML_SUMMARY_CONCURRENCY = int(os.getenv('ML_SUMMARY_CONCURRENCY', '4'))
+
+# Leaderboard and list pagination (?limit=, ?cursor=; the next cursor is returned in X-Next-Cursor).
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', '100'))
+SUBMISSIONS_PAGE_SIZE = int(os.getenv('SUBMISSIONS_PAGE_SIZE', '100'))
+PROJECTS_PAGE_SIZE = int(os.getenv('PROJECTS_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
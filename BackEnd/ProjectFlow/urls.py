@@ -4,10 +4,13 @@ from django.views.generic import TemplateView
 # NEW: Imports for serving media files locally during development
 from django.conf import settings
 from django.conf.urls.static import static
+from Proj.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('Proj.urls')),
+    # Prometheus scrape endpoint; must come before the React catch-all below.
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve the React app's index.html for all non-API routes.
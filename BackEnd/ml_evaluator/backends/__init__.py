@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .base import EvaluatorBackend, EvaluatorBackendError
+
+_backend = None
+
+
+def get_backend():
+    """Returns the evaluator backend configured by settings.ML_EVALUATOR_BACKEND."""
+    global _backend
+    if _backend is None:
+        backend_class = import_string(settings.ML_EVALUATOR_BACKEND)
+        _backend = backend_class(**settings.ML_EVALUATOR_OPTIONS)
+    return _backend
+
+
+def reset_backend():
+    """Drops the cached backend so the next get_backend() call re-reads settings."""
+    global _backend
+    _backend = None
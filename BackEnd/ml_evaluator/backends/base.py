@@ -0,0 +1,41 @@
+import asyncio
+
+
+class EvaluatorBackendError(Exception):
+    """Raised by a backend when the model call fails."""
+
+
+class EvaluatorBackend:
+    """
+    Interface for the language model used by ml_evaluator.
+
+    A backend turns a prompt into text. When `response_schema` (the JSON
+    properties the evaluation prompt asks for) is given, the text must be a
+    JSON object with those properties.
+    """
+    model_name = None
+
+    def check(self):
+        """Returns an error message if the backend cannot be used, otherwise None."""
+        return None
+
+    def generate(self, prompt, response_schema=None):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, response_schema=None):
+        """
+        Async `generate`. Backends with an async client override this; the
+        default runs `generate` in a worker thread.
+        """
+        return await asyncio.to_thread(self.generate, prompt, response_schema)
+
+    def generate_stream(self, prompt, response_schema=None):
+        """
+        Yields the answer in pieces as the model produces it. Backends without
+        a streaming API yield the whole answer at once.
+        """
+        yield self.generate(prompt, response_schema)
+
+    async def agenerate_stream(self, prompt, response_schema=None):
+        """Async `generate_stream`."""
+        yield await self.agenerate(prompt, response_schema)
@@ -0,0 +1,59 @@
+import threading
+
+import google.generativeai as genai
+from django.conf import settings
+
+from .base import EvaluatorBackend, EvaluatorBackendError
+
+
+class GeminiBackend(EvaluatorBackend):
+    """Google Gemini through the google-generativeai client."""
+
+    def __init__(self, api_key=None, model_name=None):
+        self.api_key = api_key or settings.GEMINI_API_KEY
+        self.model_name = model_name or settings.GEMINI_MODEL
+        self._model = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        if not self.api_key:
+            return "Gemini API key is not configured."
+        return None
+
+    @property
+    def model(self):
+        # Configure the client once per process instead of on every evaluation.
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt, response_schema=None):
+        try:
+            return self.model.generate_content(prompt).text
+        except Exception as e:
+            raise EvaluatorBackendError(str(e)) from e
+
+    async def agenerate(self, prompt, response_schema=None):
+        # The async client's channel belongs to the event loop it was first used on,
+        # which is the server's single loop under ASGI.
+        try:
+            return (await self.model.generate_content_async(prompt)).text
+        except Exception as e:
+            raise EvaluatorBackendError(str(e)) from e
+
+    def generate_stream(self, prompt, response_schema=None):
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                yield chunk.text
+        except Exception as e:
+            raise EvaluatorBackendError(str(e)) from e
+
+    async def agenerate_stream(self, prompt, response_schema=None):
+        try:
+            async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                yield chunk.text
+        except Exception as e:
+            raise EvaluatorBackendError(str(e)) from e
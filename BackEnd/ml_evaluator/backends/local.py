@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from .base import EvaluatorBackend, EvaluatorBackendError
+
+EXCERPT_RE = re.compile(r'---\n(.*?)\n\s*---', re.DOTALL)
+# Characters per piece when streaming; the call's latency is spread over the pieces.
+STREAM_CHUNK_CHARS = 24
+
+
+class LocalBackend(EvaluatorBackend):
+    """
+    Deterministic stand-in model for offline development, tests and benchmarks.
+
+    Scores are derived from a hash of the prompt, so the same report and
+    rubrics always get the same schema-valid result. Latency and failures can
+    be injected to exercise timeouts, retries and throughput.
+
+    Args:
+        latency (float): Seconds every call takes.
+        latency_jitter (float): Extra random delay of up to this many seconds.
+        failure_rate (float): Probability (0-1) that a call raises EvaluatorBackendError.
+        seed (int): Seed for scores, jitter and injected failures.
+    """
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, failure_rate=0.0, seed=0, model_name='local-deterministic'):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.model_name = model_name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _digest(self, *parts):
+        data = '\x00'.join([str(self.seed), *parts]).encode('utf-8')
+        return int.from_bytes(hashlib.sha256(data).digest()[:8], 'big')
+
+    def _draw(self):
+        """Returns (delay, fail) for the next call."""
+        with self._lock:
+            delay = self.latency + self._random.random() * self.latency_jitter
+            fail = self._random.random() < self.failure_rate
+        return delay, fail
+
+    def generate(self, prompt, response_schema=None):
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        return self._respond(prompt, response_schema, fail)
+
+    async def agenerate(self, prompt, response_schema=None):
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._respond(prompt, response_schema, fail)
+
+    def generate_stream(self, prompt, response_schema=None):
+        delay, fail = self._draw()
+        text = self._respond(prompt, response_schema, fail)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            if delay:
+                time.sleep(delay * STREAM_CHUNK_CHARS / len(text))
+            yield text[start:start + STREAM_CHUNK_CHARS]
+
+    async def agenerate_stream(self, prompt, response_schema=None):
+        delay, fail = self._draw()
+        text = self._respond(prompt, response_schema, fail)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            if delay:
+                await asyncio.sleep(delay * STREAM_CHUNK_CHARS / len(text))
+            yield text[start:start + STREAM_CHUNK_CHARS]
+
+    def _respond(self, prompt, response_schema, fail):
+        if fail:
+            raise EvaluatorBackendError("Injected failure from the local evaluator backend.")
+
+        if response_schema is None:
+            # Summarization request: return the start of the excerpt.
+            match = EXCERPT_RE.search(prompt)
+            words = (match.group(1) if match else prompt).split()
+            return ' '.join(words[:120])
+
+        result = {}
+        for key, spec in response_schema.items():
+            if key.endswith('_score'):
+                maximum = spec.get('maximum', 10)
+                result[key] = self._digest(prompt, key) % (int(maximum) + 1)
+            else:
+                criterion = key[:-len('_feedback')].replace('_', ' ')
+                result[key] = f"Deterministic feedback for {criterion}."
+        return json.dumps(result)
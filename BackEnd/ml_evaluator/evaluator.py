@@ -1,39 +1,54 @@
+import asyncio
 import os
-import google.generativeai as genai
 import json
+import logging
 from django.conf import settings
 
-def get_ai_evaluation(text_content, rubrics):
-    """
-    Evaluates project text content against a set of rubrics using the Gemini API.
+from .backends import get_backend
+from .preprocess import prepare_report, estimate_tokens
+from .streaming import CriterionStream
 
-    Args:
-        text_content (str): The summary or content of the project report.
-        rubrics (list of RubricModel): A list of PynamoDB rubric models for the project.
+logger = logging.getLogger(__name__)
 
-    Returns:
-        dict: A dictionary containing scores and feedback for each rubric criterion,
-              or an error message.
-    """
-    api_key = settings.GEMINI_API_KEY
-    if not api_key:
-        return {"error": "Gemini API key is not configured."}
+# Bump when the prompt changes in a way that should invalidate stored AI results.
+PROMPT_VERSION = 4
 
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-
-        # Dynamically build the rubric and JSON schema description for the prompt
-        rubric_details = ""
-        json_properties = {}
-        for rubric in rubrics:
-            criterion_key = rubric.criterion.lower().replace(" ", "_")
-            rubric_details += f"- **{rubric.criterion} (Max Points: {rubric.max_points})**: {rubric.description}\n"
-            json_properties[f"{criterion_key}_score"] = {"type": "number", "description": f"Score for {rubric.criterion} from 0 to {rubric.max_points}."}
-            json_properties[f"{criterion_key}_feedback"] = {"type": "string", "description": f"Constructive feedback for {rubric.criterion}."}
-
-        # Construct the detailed prompt
-        prompt = f"""
+def criterion_key(rubric):
+    """Key prefix used for a rubric's score and feedback in the AI response."""
+    return rubric.criterion.lower().replace(" ", "_")
+
+def build_rubric_details(rubrics):
+    """Builds the rubric description and the JSON properties the model must return."""
+    rubric_details = ""
+    json_properties = {}
+    for rubric in rubrics:
+        key = criterion_key(rubric)
+        rubric_details += f"- **{rubric.criterion} (Max Points: {rubric.max_points})**: {rubric.description}\n"
+        json_properties[f"{key}_score"] = {
+            "type": "number",
+            "minimum": 0,
+            "maximum": rubric.max_points,
+            "description": f"Score for {rubric.criterion} from 0 to {rubric.max_points}."
+        }
+        json_properties[f"{key}_feedback"] = {"type": "string", "description": f"Constructive feedback for {rubric.criterion}."}
+    return rubric_details, json_properties
+
+def build_summary_prompt(chunk, rubric_details):
+    return f"""
+        You are helping an academic evaluator read a long project report.
+        Summarize the following part of the report in at most {settings.ML_SUMMARY_MAX_WORDS} words.
+        Keep concrete facts (methods, results, numbers, tools, limitations) that matter for these criteria:
+        {rubric_details}
+        Do not evaluate or score anything.
+
+        **Report Excerpt:**
+        ---
+        {chunk}
+        ---
+        """
+
+def build_evaluation_prompt(text_content, rubric_details, json_properties):
+    return f"""
         As an expert academic evaluator, please assess the following project summary based on the provided rubrics.
         Provide a score and constructive feedback for each criterion.
         Your response MUST be a valid JSON object.
@@ -54,16 +69,152 @@ def get_ai_evaluation(text_content, rubrics):
         {json.dumps(json_properties, indent=2)}
         """
 
-        # Generate content using the Gemini API
-        response = model.generate_content(prompt)
-        
-        # Clean the response to extract only the JSON part
-        cleaned_response_text = response.text.strip().replace("```json", "").replace("```", "").strip()
-        
-        # Parse the JSON response
-        evaluation_result = json.loads(cleaned_response_text)
-        return evaluation_result
+def build_prompt(backend, text_content, rubrics):
+    """
+    Cleans the report (summarizing it with `backend` if it is over the token
+    budget) and builds the scoring prompt.
+
+    Returns:
+        tuple: (prompt, json_properties, token_usage)
+    """
+    # Dynamically build the rubric and JSON schema description for the prompt
+    rubric_details, json_properties = build_rubric_details(rubrics)
+
+    prepared = prepare_report(
+        text_content,
+        token_budget=settings.ML_PROMPT_TOKEN_BUDGET,
+        chunk_tokens=settings.ML_SUMMARY_CHUNK_TOKENS,
+        summarize=lambda chunk: backend.generate(build_summary_prompt(chunk, rubric_details)),
+        concurrency=settings.ML_SUMMARY_CONCURRENCY
+    )
+
+    # Construct the detailed prompt
+    prompt = build_evaluation_prompt(prepared.text, rubric_details, json_properties)
+    token_usage = dict(prepared.token_usage(), prompt_tokens=estimate_tokens(prompt))
+    return prompt, json_properties, token_usage
+
+def parse_evaluation(response_text, token_usage):
+    """Parses the model's JSON answer (dropping any Markdown code fence) and adds the token usage."""
+    # Clean the response to extract only the JSON part
+    cleaned_response_text = response_text.strip().replace("```json", "").replace("```", "").strip()
+
+    # Parse the JSON response
+    evaluation_result = json.loads(cleaned_response_text)
+    evaluation_result["token_usage"] = token_usage
+    return evaluation_result
+
+def get_ai_evaluation(text_content, rubrics):
+    """
+    Evaluates project text content against a set of rubrics using the
+    evaluator backend configured by settings.ML_EVALUATOR_BACKEND (Gemini by default).
+
+    The report is cleaned first (whitespace, pdfminer artifacts, table of
+    contents, references, repeated headers/footers). Reports that are still
+    over ML_PROMPT_TOKEN_BUDGET are summarized chunk by chunk before the
+    final scoring call.
+
+    Args:
+        text_content (str): The summary or content of the project report.
+        rubrics (list of RubricModel): A list of PynamoDB rubric models for the project.
+
+    Returns:
+        dict: A dictionary containing scores and feedback for each rubric criterion
+              plus a "token_usage" entry, or an error message.
+    """
+    backend = get_backend()
+    error = backend.check()
+    if error:
+        return {"error": error}
+
+    try:
+        prompt, json_properties, token_usage = build_prompt(backend, text_content, rubrics)
+        logger.info(f"AI evaluation prompt prepared: {token_usage}")
+
+        # Generate content using the configured backend
+        response_text = backend.generate(prompt, response_schema=json_properties)
+        return parse_evaluation(response_text, token_usage)
 
     except Exception as e:
         print(f"An error occurred during AI evaluation: {e}")
-        return {"error": f"Failed to get evaluation from AI model. Details: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Failed to get evaluation from AI model. Details: {str(e)}"}
+
+async def aget_ai_evaluation(text_content, rubrics, run_sync=None):
+    """
+    Async get_ai_evaluation. The scoring call is awaited through the backend's
+    `agenerate`, so no thread is held while the model works. Preparing the
+    prompt, which summarizes reports over the token budget with blocking model
+    calls, is awaited through `run_sync(func, *args)`; the caller passes its
+    bounded pool here, otherwise asyncio's default executor is used.
+    """
+    backend = get_backend()
+    error = backend.check()
+    if error:
+        return {"error": error}
+
+    try:
+        prompt, json_properties, token_usage = await (run_sync or asyncio.to_thread)(
+            build_prompt, backend, text_content, rubrics
+        )
+        logger.info(f"AI evaluation prompt prepared: {token_usage}")
+        response_text = await backend.agenerate(prompt, response_schema=json_properties)
+        return parse_evaluation(response_text, token_usage)
+
+    except Exception as e:
+        logger.error(f"An error occurred during AI evaluation: {e}")
+        return {"error": f"Failed to get evaluation from AI model. Details: {str(e)}"}
+
+def stream_ai_evaluation(text_content, rubrics):
+    """
+    Streaming get_ai_evaluation. Yields ('criterion', dict) as soon as a
+    criterion's score and feedback are complete in the model's answer (see
+    ml_evaluator/streaming.py), then ('result', evaluation_result) once the
+    whole answer is parsed and validated, or ('error', message) instead.
+    """
+    backend = get_backend()
+    error = backend.check()
+    if error:
+        yield 'error', error
+        return
+
+    stream = CriterionStream({criterion_key(rubric): rubric for rubric in rubrics})
+    try:
+        prompt, json_properties, token_usage = build_prompt(backend, text_content, rubrics)
+        logger.info(f"AI evaluation prompt prepared: {token_usage}")
+        for piece in backend.generate_stream(prompt, response_schema=json_properties):
+            for criterion in stream.feed(piece):
+                yield 'criterion', criterion
+        evaluation_result = stream.finish()
+    except Exception as e:
+        logger.error(f"An error occurred during streamed AI evaluation: {e}")
+        yield 'error', f"Failed to get evaluation from AI model. Details: {str(e)}"
+        return
+    evaluation_result["token_usage"] = token_usage
+    yield 'result', evaluation_result
+
+async def astream_ai_evaluation(text_content, rubrics, run_sync=None):
+    """
+    Async stream_ai_evaluation, reading the answer through the backend's
+    agenerate_stream. `run_sync` as for aget_ai_evaluation.
+    """
+    backend = get_backend()
+    error = backend.check()
+    if error:
+        yield 'error', error
+        return
+
+    stream = CriterionStream({criterion_key(rubric): rubric for rubric in rubrics})
+    try:
+        prompt, json_properties, token_usage = await (run_sync or asyncio.to_thread)(
+            build_prompt, backend, text_content, rubrics
+        )
+        logger.info(f"AI evaluation prompt prepared: {token_usage}")
+        async for piece in backend.agenerate_stream(prompt, response_schema=json_properties):
+            for criterion in stream.feed(piece):
+                yield 'criterion', criterion
+        evaluation_result = stream.finish()
+    except Exception as e:
+        logger.error(f"An error occurred during streamed AI evaluation: {e}")
+        yield 'error', f"Failed to get evaluation from AI model. Details: {str(e)}"
+        return
+    evaluation_result["token_usage"] = token_usage
+    yield 'result', evaluation_result
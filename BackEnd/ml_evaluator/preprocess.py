@@ -0,0 +1,191 @@
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# pdfminer separates pages with a form feed.
+PAGE_BREAK = '\x0c'
+
+LIGATURES = {'ﬀ': 'ff', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬃ': 'ffi', 'ﬄ': 'ffl'}
+CID_RE = re.compile(r'\(cid:\d+\)')
+HYPHENATED_BREAK_RE = re.compile(r'(\w)-\n(\w)')
+PAGE_NUMBER_RE = re.compile(r'^\s*(page\s+)?\d+(\s*(of|/)\s*\d+)?\s*$', re.IGNORECASE)
+TOC_HEADING_RE = re.compile(r'^\s*(table\s+of\s+contents|contents)\s*$', re.IGNORECASE)
+TOC_ENTRY_RE = re.compile(r'(\.{3,}|\s{2,}|\t)\s*\d+\s*$')
+REFERENCES_HEADING_RE = re.compile(
+    r'^\s*(\d+(\.\d+)*\.?\s+)?(references|bibliography|works\s+cited|citations)\s*$', re.IGNORECASE
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def _strip_repeated_lines(pages):
+    """Drops header/footer lines that repeat at the top or bottom of most pages."""
+    if len(pages) < 3:
+        return pages
+    edge_lines = Counter()
+    for lines in pages:
+        non_empty = [line.strip() for line in lines if line.strip()]
+        edge_lines.update(set(non_empty[:2] + non_empty[-2:]))
+    threshold = len(pages) / 2
+    repeated = {line for line, count in edge_lines.items() if count >= threshold}
+    return [[line for line in lines if line.strip() not in repeated] for lines in pages]
+
+
+def _strip_page_numbers(pages):
+    """
+    Drops number-only lines ("12", "Page 3 of 10") from the top or bottom edge of
+    the pages, but only when most pages carry one there. Elsewhere such lines are
+    kept: pdfminer puts every table cell on a line of its own.
+    """
+    if len(pages) < 3:
+        return pages
+    edges = {'top': [], 'bottom': []}
+    for lines in pages:
+        non_empty = [index for index, line in enumerate(lines) if line.strip()]
+        for edge, index in (('top', non_empty[:1]), ('bottom', non_empty[-1:])):
+            if index and PAGE_NUMBER_RE.match(lines[index[0]]):
+                edges[edge].append(index[0])
+            else:
+                edges[edge].append(None)
+    threshold = len(pages) / 2
+    drop = [set() for _ in pages]
+    for found in edges.values():
+        if sum(index is not None for index in found) >= threshold:
+            for page_drop, index in zip(drop, found):
+                if index is not None:
+                    page_drop.add(index)
+    return [[line for index, line in enumerate(lines) if index not in page_drop] for lines, page_drop in zip(pages, drop)]
+
+
+def _strip_table_of_contents(lines):
+    result = []
+    in_toc = False
+    for line in lines:
+        if TOC_HEADING_RE.match(line):
+            in_toc = True
+            continue
+        if in_toc:
+            if not line.strip() or TOC_ENTRY_RE.search(line):
+                continue
+            in_toc = False
+        if TOC_ENTRY_RE.search(line) and '.' * 3 in line:
+            # Dot-leader lines outside an explicit "Contents" section (lists of figures etc.).
+            continue
+        result.append(line)
+    return result
+
+
+def _strip_references(lines):
+    # Only cut at the last references heading, and only in the second half of
+    # the report, so a "References" mention in an outline does not drop the body.
+    for index in range(len(lines) - 1, len(lines) // 2 - 1, -1):
+        if REFERENCES_HEADING_RE.match(lines[index]):
+            return lines[:index]
+    return lines
+
+
+def normalize_text(text):
+    """Removes pdfminer artifacts and collapses whitespace, keeping paragraph breaks."""
+    for ligature, replacement in LIGATURES.items():
+        text = text.replace(ligature, replacement)
+    text = CID_RE.sub('', text)
+    text = HYPHENATED_BREAK_RE.sub(r'\1\2', text)
+    paragraphs = re.split(r'\n\s*\n', text)
+    cleaned = (' '.join(paragraph.split()) for paragraph in paragraphs)
+    return '\n\n'.join(p for p in cleaned if p)
+
+
+def clean_report(text):
+    """Normalizes extracted report text and drops boilerplate that does not help grading."""
+    pages = [page.split('\n') for page in (text or '').split(PAGE_BREAK)]
+    pages = _strip_page_numbers(_strip_repeated_lines(pages))
+    lines = [line for page in pages for line in page]
+    lines = _strip_table_of_contents(lines)
+    lines = _strip_references(lines)
+    return normalize_text('\n'.join(lines))
+
+
+def split_into_chunks(text, max_tokens):
+    """Splits text at paragraph boundaries into pieces of at most about `max_tokens`."""
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in text.split('\n\n'):
+        tokens = estimate_tokens(paragraph)
+        if tokens > max_tokens:
+            # A single oversized paragraph is cut on character boundaries.
+            step = max_tokens * 4
+            pieces = [paragraph[i:i + step] for i in range(0, len(paragraph), step)]
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append('\n\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+@dataclass
+class PreparedReport:
+    text: str
+    original_tokens: int
+    cleaned_tokens: int
+    final_tokens: int
+    summarized_chunks: int = 0
+    summary_rounds: int = 0
+
+    def token_usage(self):
+        return {
+            'original_tokens': self.original_tokens,
+            'cleaned_tokens': self.cleaned_tokens,
+            'final_tokens': self.final_tokens,
+            'summarized_chunks': self.summarized_chunks,
+            'summary_rounds': self.summary_rounds,
+        }
+
+
+def prepare_report(text, token_budget, chunk_tokens, summarize, max_rounds=3, concurrency=1):
+    """
+    Cleans a report and, if it is still over `token_budget`, compacts it by
+    summarizing chunks of `chunk_tokens` (map) and joining the summaries. The
+    joined summaries are summarized again until they fit or `max_rounds` is hit.
+
+    Args:
+        text (str): Extracted report text.
+        token_budget (int): Estimated tokens the report may use in the scoring prompt.
+        chunk_tokens (int): Estimated tokens per chunk sent for summarization.
+        summarize (callable): Takes a chunk of text and returns its summary.
+        concurrency (int, optional): Chunks summarized at the same time; the
+            summaries are joined in report order either way.
+    """
+    original_tokens = estimate_tokens(text or '')
+    cleaned = clean_report(text)
+    prepared = PreparedReport(
+        text=cleaned,
+        original_tokens=original_tokens,
+        cleaned_tokens=estimate_tokens(cleaned),
+        final_tokens=estimate_tokens(cleaned),
+    )
+    while prepared.final_tokens > token_budget and prepared.summary_rounds < max_rounds:
+        chunks = split_into_chunks(prepared.text, chunk_tokens)
+        if concurrency > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+                summaries = list(executor.map(summarize, chunks))
+        else:
+            summaries = [summarize(chunk) for chunk in chunks]
+        prepared.text = '\n\n'.join(s.strip() for s in summaries if s and s.strip())
+        prepared.final_tokens = estimate_tokens(prepared.text)
+        prepared.summarized_chunks += len(chunks)
+        prepared.summary_rounds += 1
+    if prepared.final_tokens > token_budget:
+        # Still too long after summarizing: keep what fits rather than overflow the context.
+        prepared.text = prepared.text[:token_budget * 4]
+        prepared.final_tokens = estimate_tokens(prepared.text)
+    return prepared
@@ -0,0 +1,126 @@
+"""
+Incremental parsing of a streamed evaluation answer.
+
+The model answers with one flat JSON object of `<criterion>_score` and
+`<criterion>_feedback` members. `CriterionStream` is fed the text as it
+arrives and reports each criterion as soon as both of its members are
+complete, then validates the whole answer once the stream ends.
+"""
+import json
+
+
+class JSONMemberStream:
+    """
+    Splits the text of a JSON object into its top-level members as they complete.
+    Anything before the opening brace (such as a Markdown code fence) is skipped.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._scanned = 0
+        self._member_start = None  # index after '{' or ',' at depth 1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.closed = False
+
+    def feed(self, text):
+        """Returns the (key, value) pairs completed by `text`."""
+        self._buffer += text
+        members = []
+        while self._scanned < len(self._buffer) and not self.closed:
+            char = self._buffer[self._scanned]
+            position = self._scanned
+            self._scanned += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._depth > 0
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = position + 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(position))
+                    self.closed = True
+            elif char == ',' and self._depth == 1:
+                members.extend(self._member(position))
+                self._member_start = position + 1
+        return members
+
+    def _member(self, end):
+        text = self._buffer[self._member_start:end].strip()
+        if not text:
+            return []
+        return list(json.loads('{' + text + '}').items())
+
+
+class CriterionStream:
+    """Turns streamed answer text into per-criterion results for `criteria` ({criterion key: rubric})."""
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self._members = JSONMemberStream()
+        self._values = {}
+        self._reported = set()
+        self.text = ''
+
+    def feed(self, text):
+        """Returns a dict per criterion completed by `text` (see `criterion`)."""
+        self.text += text
+        completed = []
+        for name, value in self._members.feed(text):
+            self._values[name] = value
+            key = name.rsplit('_', 1)[0]
+            if key in self._reported or key not in self.criteria:
+                continue
+            if f"{key}_score" in self._values and f"{key}_feedback" in self._values:
+                self._reported.add(key)
+                completed.append(self.criterion(
+                    key, self.criteria[key], self._values[f"{key}_score"], self._values[f"{key}_feedback"]
+                ))
+        return completed
+
+    @staticmethod
+    def criterion(key, rubric, score, feedback):
+        return {
+            'key': key,
+            'criterion': rubric.criterion,
+            'rubric_id': rubric.rubric_id,
+            'max_points': rubric.max_points,
+            'score': score,
+            'feedback': feedback,
+        }
+
+    def finish(self):
+        """
+        Parses the complete answer and checks that every criterion has a score
+        within its range and a feedback text.
+
+        Returns:
+            dict: The evaluation result, as get_ai_evaluation returns it.
+
+        Raises:
+            ValueError: The answer is not a complete, valid evaluation.
+        """
+        if not self._members.closed:
+            raise ValueError("The model's answer ended before the JSON object was complete.")
+        problems = []
+        for key, rubric in self.criteria.items():
+            score = self._values.get(f"{key}_score")
+            if not isinstance(score, (int, float)) or isinstance(score, bool):
+                problems.append(f"{rubric.criterion}: missing score")
+            elif not 0 <= score <= rubric.max_points:
+                problems.append(f"{rubric.criterion}: score {score} is outside 0-{rubric.max_points}")
+            if not isinstance(self._values.get(f"{key}_feedback"), str):
+                problems.append(f"{rubric.criterion}: missing feedback")
+        if problems:
+            raise ValueError("Invalid AI evaluation: " + "; ".join(problems))
+        return dict(self._values)
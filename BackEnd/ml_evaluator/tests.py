@@ -1,3 +1,103 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .preprocess import PAGE_BREAK, clean_report, prepare_report
+from .streaming import CriterionStream, JSONMemberStream
+
+
+class CleanReportTests(SimpleTestCase):
+    def test_page_numbers_are_dropped_but_table_cells_kept(self):
+        pages = [
+            f"Section {page} discusses run {page}.\nModel\nAccuracy\nCNN\n0.9{page}\nEpochs\n{page * 10}\n{page}"
+            for page in range(1, 5)
+        ]
+        cleaned = clean_report(PAGE_BREAK.join(pages))
+        for page in range(1, 5):
+            self.assertIn(f"0.9{page} Epochs {page * 10}", cleaned)
+            self.assertNotIn(f"{page * 10} {page}", cleaned)
+
+    def test_number_lines_are_kept_without_page_numbering(self):
+        self.assertEqual(clean_report("Results\n12\n0.5\n"), "Results 12 0.5")
+
+    def test_page_x_of_y_footers_are_dropped(self):
+        pages = [f"Body of page {page}.\nMore text {page}.\nPage {page} of 3" for page in range(1, 4)]
+        self.assertNotIn("Page", clean_report(PAGE_BREAK.join(pages)))
+
+
+class PrepareReportTests(SimpleTestCase):
+    def test_chunks_are_summarized_concurrently_in_order(self):
+        text = '\n\n'.join(f"Paragraph {index} " + 'word ' * 400 for index in range(6))
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def summarize(chunk):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return chunk.split()[1]
+
+        prepared = prepare_report(text, token_budget=100, chunk_tokens=600, summarize=summarize, concurrency=3)
+        self.assertEqual(prepared.text.split('\n\n'), [str(index) for index in range(6)])
+        self.assertEqual(prepared.summarized_chunks, 6)
+        self.assertEqual(peak[0], 3)
+
+
+class CriterionStreamTests(SimpleTestCase):
+    criteria = {
+        'design': SimpleNamespace(criterion='Design', rubric_id='r1', max_points=10),
+        'testing': SimpleNamespace(criterion='Testing', rubric_id='r2', max_points=5),
+    }
+    answer = (
+        '```json\n{"design_score": 8, "design_feedback": "Clear \\"layered\\" design, {mostly}, with C:\\\\ paths.",'
+        ' "testing_score": 3.5, "testing_feedback": "Covers [edge] cases\\nbut not all \\u00e9."}\n```'
+    )
+
+    def feed_in_pieces(self, pieces):
+        stream = CriterionStream(self.criteria)
+        completed = []
+        for piece in pieces:
+            completed.extend(stream.feed(piece))
+        return stream, completed
+
+    def test_every_split_point_gives_the_same_result(self):
+        expected = json.loads(self.answer[len('```json\n'):-len('\n```')])
+        for split in range(1, len(self.answer)):
+            stream, completed = self.feed_in_pieces([self.answer[:split], self.answer[split:]])
+            self.assertEqual([c['key'] for c in completed], ['design', 'testing'], split)
+            self.assertEqual(stream.finish(), expected, split)
+
+    def test_character_by_character(self):
+        stream, completed = self.feed_in_pieces(self.answer)
+        self.assertEqual(completed[0]['feedback'], 'Clear "layered" design, {mostly}, with C:\\ paths.')
+        self.assertEqual(completed[1]['score'], 3.5)
+        self.assertEqual(completed[1]['feedback'], 'Covers [edge] cases\nbut not all \u00e9.')
+
+    def test_criterion_is_reported_once_both_members_are_complete(self):
+        stream = CriterionStream(self.criteria)
+        self.assertEqual(stream.feed('{"design_score": 8, "design_feedback": "Goo'), [])
+        self.assertEqual([c['key'] for c in stream.feed('d.", "testing_sc')], ['design'])
+
+    def test_nested_values(self):
+        members = JSONMemberStream()
+        text = '{"a": {"value": 1, "list": [1, {"b": "}"}]}, "c": [[], {}]}'
+        pairs = [pair for char in text for pair in members.feed(char)]
+        self.assertEqual(pairs, [('a', {'value': 1, 'list': [1, {'b': '}'}]}), ('c', [[], {}])])
+        self.assertTrue(members.closed)
+
+    def test_truncated_stream_is_rejected(self):
+        stream, completed = self.feed_in_pieces([self.answer[:self.answer.index('"testing_feedback"') + 25]])
+        self.assertEqual([c['key'] for c in completed], ['design'])
+        with self.assertRaisesRegex(ValueError, 'ended before'):
+            stream.finish()
+
+    def test_out_of_range_score_is_rejected(self):
+        stream, _ = self.feed_in_pieces([self.answer.replace('"testing_score": 3.5', '"testing_score": 7')])
+        with self.assertRaisesRegex(ValueError, 'Testing: score 7 is outside 0-5'):
+            stream.finish()
@@ -65,4 +65,60 @@ api.interceptors.response.use(
   }
 );
 
+// Fetches every page of a paginated listing, following the cursor the backend
+// returns in the X-Next-Cursor header, and resolves to the combined list.
+export const getAllPages = async (path, params = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await api.get(path, {
+      params: cursor ? { ...params, cursor } : params,
+    });
+    items.push(...response.data);
+    cursor = response.headers["x-next-cursor"];
+  } while (cursor);
+  return items;
+};
+
+// Streams server-sent events from an endpoint (EventSource cannot POST or send
+// the Authorization header). Calls onEvent(event, data) as each event arrives.
+export const streamEvents = async (path, onEvent, { method = "POST", signal } = {}) => {
+  const { idToken } = (await fetchAuthSession()).tokens ?? {};
+  const response = await fetch(`${API_BASE_URL ?? ""}${path}`, {
+    method,
+    signal,
+    headers: {
+      Accept: "text/event-stream",
+      ...(idToken ? { Authorization: `Bearer ${idToken.toString()}` } : {}),
+    },
+  });
+
+  if (!response.headers.get("Content-Type")?.startsWith("text/event-stream")) {
+    // Not streamed (e.g. an older backend): deliver the JSON body as one event.
+    const data = await response.json().catch(() => ({}));
+    onEvent(response.ok ? "result" : "error", data);
+    return;
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      const dataLines = [];
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      }
+      if (dataLines.length) onEvent(event, JSON.parse(dataLines.join("\n")));
+    }
+  }
+};
+
 export default api;
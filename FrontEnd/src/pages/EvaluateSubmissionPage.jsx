@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useCallback } from "react";
 import { useParams } from "react-router-dom";
-import api from "../api/api";
+import api, { streamEvents } from "../api/api";
 
 const EvaluateSubmissionPage = () => {
   const { submissionId } = useParams();
@@ -41,13 +41,29 @@ const EvaluateSubmissionPage = () => {
   const handleTriggerAI = async () => {
     setAiLoading(true);
     setError("");
+    setAiScores(null);
     try {
-      const res = await api.post(
-        `/api/submissions/${submissionId}/trigger_ai_evaluation/`
+      // Criteria are shown one by one as the model produces them; the final
+      // "result" event replaces them with the validated, stored scores.
+      await streamEvents(
+        `/api/submissions/${submissionId}/trigger_ai_evaluation/`,
+        (event, data) => {
+          if (event === "criterion") {
+            setAiScores((prev) => ({
+              ...prev,
+              [`${data.key}_score`]: { value: data.score },
+              [`${data.key}_feedback`]: { value: data.feedback },
+            }));
+          } else if (event === "result") {
+            setAiScores(data);
+          } else if (event === "error") {
+            setAiScores(null);
+            setError(data.detail || "Failed to run AI evaluation.");
+          }
+        }
       );
-      setAiScores(res.data);
     } catch (err) {
-      setError(err.response?.data?.detail || "Failed to run AI evaluation.");
+      setError(err.message || "Failed to run AI evaluation.");
     } finally {
       setAiLoading(false);
     }
@@ -124,7 +140,16 @@ const EvaluateSubmissionPage = () => {
       ) : (
         <>
           <div className="card mb-4">
-            <div className="card-header">AI-Assisted Evaluation</div>
+            <div className="card-header">
+              AI-Assisted Evaluation
+              {aiLoading && aiScores && (
+                <span
+                  className="spinner-border spinner-border-sm ms-2"
+                  role="status"
+                  aria-hidden="true"
+                ></span>
+              )}
+            </div>
             <div className="card-body">
               {aiScores ? (
                 // MODIFICATION START
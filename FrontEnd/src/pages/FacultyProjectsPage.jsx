@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
-import api from "../api/api";
+import { getAllPages } from "../api/api";
 
 const FacultyProjectsPage = () => {
   const [projects, setProjects] = useState([]);
@@ -10,8 +10,7 @@ const FacultyProjectsPage = () => {
   useEffect(() => {
     const fetchProjects = async () => {
       try {
-        const response = await api.get("/api/projects/");
-        setProjects(response.data);
+        setProjects(await getAllPages("/api/projects/"));
       } catch (err) {
         setError("Failed to fetch your projects.");
       } finally {
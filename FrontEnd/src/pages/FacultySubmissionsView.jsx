@@ -1,7 +1,7 @@
 // FrontEnd/src/pages/FacultySubmissionsView.jsx
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
-import api from "../api/api";
+import { getAllPages } from "../api/api";
 
 const FacultySubmissionsView = () => {
   const [submissions, setSubmissions] = useState([]);
@@ -11,8 +11,8 @@ const FacultySubmissionsView = () => {
   useEffect(() => {
     const fetchSubmissions = async () => {
       try {
-        const response = await api.get("/api/submissions/my-submissions/"); // Endpoint returns all for faculty
-        setSubmissions(response.data);
+        // Every page of the submissions to the projects this faculty member owns
+        setSubmissions(await getAllPages("/api/submissions/my-submissions/"));
       } catch (err) {
         setError("Failed to load submissions.");
       } finally {
@@ -1,6 +1,6 @@
 // FrontEnd/src/pages/LeaderboardPage.jsx
 import React, { useState, useEffect } from "react";
-import api from "../api/api";
+import { getAllPages } from "../api/api";
 
 const LeaderboardPage = () => {
   const [leaderboard, setLeaderboard] = useState([]);
@@ -10,8 +10,7 @@ const LeaderboardPage = () => {
   useEffect(() => {
     const fetchLeaderboard = async () => {
       try {
-        const response = await api.get("/api/leaderboard/");
-        setLeaderboard(response.data);
+        setLeaderboard(await getAllPages("/api/leaderboard/"));
       } catch (err) {
         setError("Failed to load the leaderboard. Please try again later.");
         console.error(err);
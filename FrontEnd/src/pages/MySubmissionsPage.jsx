@@ -1,7 +1,7 @@
 // FrontEnd/src/pages/MySubmissionsPage.jsx
 import React, { useState, useEffect } from "react";
 import { Link } from "react-router-dom";
-import api from "../api/api";
+import { getAllPages } from "../api/api";
 
 const MySubmissionsPage = () => {
   const [submissions, setSubmissions] = useState([]);
@@ -11,8 +11,7 @@ const MySubmissionsPage = () => {
   useEffect(() => {
     const fetchMySubmissions = async () => {
       try {
-        const response = await api.get("/api/submissions/my-submissions/");
-        setSubmissions(response.data);
+        setSubmissions(await getAllPages("/api/submissions/my-submissions/"));
       } catch (err) {
         setError("Failed to fetch your submissions.");
       } finally {
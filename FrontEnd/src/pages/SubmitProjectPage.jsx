@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import api from "../api/api";
+import api, { getAllPages } from "../api/api";
 import { useNavigate } from "react-router-dom";
 import useAuth from "../hooks/useAuth";
 
@@ -23,8 +23,8 @@ const SubmitProjectPage = () => {
   useEffect(() => {
     const fetchProjects = async () => {
       try {
-        const response = await api.get("/api/projects/");
-        setProjects(response.data.filter((p) => p.is_active));
+        const projects = await getAllPages("/api/projects/");
+        setProjects(projects.filter((p) => p.is_active));
       } catch (error) {
         setIsError(true);
         setMessage("Failed to load available projects.");